@@ -12,6 +12,7 @@ from app.utils.common import attach_admin_fake_provider, detach_admin_fake_provi
     convert_utc_time_to_specific_timezone, convert_max_park_time_to_hour_minutes, default_connection_sg_admin
 from app.utils.common import convert_max_park_time_to_minutes
 from app.utils.parking_api import ParkingAPI
+from app.utils.parking_window import ParkingWindow
 from app.utils.security import verify_token
 
 logger = logging.getLogger(__name__)
@@ -57,6 +58,9 @@ def set_parking_timing(
 
         ParkingAPI.upsert_violation_config(connect_parkinglot, organization, parking_timing_schema)
 
+        ParkingWindow.compile_schedule(connect_parkinglot,
+                                       base.ParkingTime.get_records_order_by_id(db, connect_parkinglot.id))
+
         return api_response(
                 message="Successfully saved.",
                 status="success",
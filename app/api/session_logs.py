@@ -1,9 +1,10 @@
 import logging
 
 import pytz
-from datetime import datetime
+from datetime import datetime, timedelta
 from dateutil import parser, tz
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.dependencies.deps import get_db
 from app.service.session_manager import SessionManager
@@ -17,6 +18,18 @@ logger = logging.getLogger(__name__)
 
 audit_events_router = APIRouter()
 
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def default_audit_bound(round_up: bool = False) -> datetime:
+    """
+    Now in UTC widened to a whole minute, so the requests for a window with a missing bound share
+    one audit stats cache entry instead of one per microsecond.
+    """
+    now = datetime.now(pytz.utc)
+    minute = now.replace(second=0, microsecond=0)
+    return minute + timedelta(minutes=1) if round_up and minute < now else minute
+
 
 @audit_events_router.get("/v1/audit/events", response_model=dict)
 def get_event_sessions(start_date_time: str = None,
@@ -58,21 +71,23 @@ def get_event_sessions(start_date_time: str = None,
                        session_type: str = None,
                        provider: str = None,
                        plate_number_or_spot: str = None,
-                       timezone: str = None):
+                       timezone: str = None,
+                       cursor: str = None,
+                       similar_plates: bool = False):
 
     if start_date_time:
         start_date_time_naive = parser.parse(start_date_time)
         if start_date_time_naive.tzinfo is None:
             start_date_time_naive = pytz.utc.localize(start_date_time_naive)
     else:
-        start_date_time_naive = datetime.now(pytz.utc)
+        start_date_time_naive = default_audit_bound()
 
     if end_date_time:
         end_date_time_naive = parser.parse(end_date_time)
         if end_date_time_naive.tzinfo is None:
             end_date_time_naive = pytz.utc.localize(end_date_time_naive)
     else:
-        end_date_time_naive = datetime.now(pytz.utc)
+        end_date_time_naive = default_audit_bound(round_up=True)
 
     start_date_time = start_date_time_naive.astimezone(pytz.utc)
     end_date_time = end_date_time_naive.astimezone(pytz.utc)
@@ -86,10 +101,92 @@ def get_event_sessions(start_date_time: str = None,
                                            session_type,
                                            provider,
                                            plate_number_or_spot,
-                                           time_frame
+                                           time_frame,
+                                           cursor,
+                                           similar_plates
                                            ).dict()
 
 
+@audit_events_router.get("/v2/audit/stats", response_model=dict)
+def get_event_session_stats(start_date_time: str = None,
+                            end_date_time: str = None,
+                            parking_lot_id: int = None,
+                            db: Session = Depends(get_db),
+                            session_type: str = None,
+                            provider: str = None,
+                            plate_number_or_spot: str = None,
+                            similar_plates: bool = False):
+
+    if start_date_time:
+        start_date_time_naive = parser.parse(start_date_time)
+        if start_date_time_naive.tzinfo is None:
+            start_date_time_naive = pytz.utc.localize(start_date_time_naive)
+    else:
+        start_date_time_naive = default_audit_bound()
+
+    if end_date_time:
+        end_date_time_naive = parser.parse(end_date_time)
+        if end_date_time_naive.tzinfo is None:
+            end_date_time_naive = pytz.utc.localize(end_date_time_naive)
+    else:
+        end_date_time_naive = default_audit_bound(round_up=True)
+
+    start_date_time = start_date_time_naive.astimezone(pytz.utc)
+    end_date_time = end_date_time_naive.astimezone(pytz.utc)
+
+    return SessionManager.fetch_session_stats(db,
+                                              parking_lot_id,
+                                              start_date_time,
+                                              end_date_time,
+                                              session_type,
+                                              provider,
+                                              plate_number_or_spot,
+                                              similar_plates
+                                              ).dict()
+
+
+@audit_events_router.get("/v2/audit/events/export")
+def export_event_sessions(start_date_time: str = None,
+                          end_date_time: str = None,
+                          parking_lot_id: int = None,
+                          db: Session = Depends(get_db),
+                          session_type: str = None,
+                          provider: str = None,
+                          plate_number_or_spot: str = None,
+                          similar_plates: bool = False,
+                          export_format: str = Query("ndjson", alias="format")):
+
+    if start_date_time:
+        start_date_time_naive = parser.parse(start_date_time)
+        if start_date_time_naive.tzinfo is None:
+            start_date_time_naive = pytz.utc.localize(start_date_time_naive)
+    else:
+        start_date_time_naive = datetime.now(pytz.utc)
+
+    if end_date_time:
+        end_date_time_naive = parser.parse(end_date_time)
+        if end_date_time_naive.tzinfo is None:
+            end_date_time_naive = pytz.utc.localize(end_date_time_naive)
+    else:
+        end_date_time_naive = datetime.now(pytz.utc)
+
+    start_date_time = start_date_time_naive.astimezone(pytz.utc)
+    end_date_time = end_date_time_naive.astimezone(pytz.utc)
+
+    chunks = SessionManager.export_sessions_v3(db,
+                                               parking_lot_id,
+                                               start_date_time,
+                                               end_date_time,
+                                               session_type,
+                                               provider,
+                                               plate_number_or_spot,
+                                               export_format,
+                                               similar_plates)
+    return StreamingResponse(chunks,
+                             media_type=EXPORT_MEDIA_TYPES[export_format],
+                             headers={"Content-Disposition": f"attachment; filename=sessions_{parking_lot_id}.{export_format}"})
+
+
 @audit_events_router.get(
     '/v1/get-parking-lot-providers/{parking_lot_id}', 
     response_model=List[ProviderSchema]
@@ -1,7 +1,8 @@
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from fastapi.responses import Response, JSONResponse
+from redis.exceptions import RedisError
 from sqlalchemy import func, cast, Float
 from sqlalchemy.orm import Session, aliased
 from app.models import base
@@ -10,10 +11,10 @@ from app.schema.push_payment_schema import PushPaymentSchema
 from app.dependencies.deps import get_db
 from app.service.auth_service import AuthService
 from app.service import session_manager
+from app.service.event_ingest import EventIngest
 from app import schema, config
 from app.utils import enum
 import requests
-from app.utils.common import DateTimeUtils
 
 
 logger = logging.getLogger(__name__)
@@ -41,21 +42,22 @@ def subscribe_sg(
         return data['challenge_key']
 
     try:
-        if data.get('event_key') == enum.Event.parking_spot_updates.value:
-            sg_event_schema = schema.SgAnprEventSchema(**data)
-            logger.debug(f'Event received for spot {sg_event_schema.parking_spot_name}')
+        payload = dict(data)
+        sg_event_schema = EventIngest.parse(data)
+        if sg_event_schema.event_key == enum.Event.parking_spot_updates.value:
             logger.debug(f'Event: {sg_event_schema.event_key} / '
                          f'Spot: {sg_event_schema.parking_spot_name} - Event Received)')
         else:
-            data.update(event_key=enum.Event[data.get('event_key')].value)
-            sg_event_schema = schema.SgAnprEventSchema(**data)
-            logger.debug(f'Event received with plate number {sg_event_schema.license_plate}')
             logger.debug(f'Event: {sg_event_schema.event_key} / LPR: {sg_event_schema.license_plate} - Event Received)')
 
-        # Convert date time format for Plate Recognizer camera
-        sg_event_schema.entry_time = DateTimeUtils.parse_datetime_and_convert(sg_event_schema.entry_time, "%Y-%m-%dT%H:%M:%S")
-        sg_event_schema.exit_time = DateTimeUtils.parse_datetime_and_convert(sg_event_schema.exit_time, "%Y-%m-%dT%H:%M:%S")
-        sg_event_schema.timestamp = DateTimeUtils.parse_datetime_and_convert(sg_event_schema.timestamp, "%Y-%m-%dT%H:%M:%S")
+        if config.settings.SG_EVENT_INGEST_ASYNC:
+            # applied in order per parking lot by app.service.event_ingest consumers
+            try:
+                EventIngest.enqueue(payload, sg_event_schema.parking_lot_id)
+            except RedisError as e:
+                logger.critical(f"Event not queued: {str(e)}")
+                return JSONResponse(content={"message": "Event queue unavailable"}, status_code=503)
+            return JSONResponse(content={"message": "Event accepted"}, status_code=202)
 
         response_message = session_manager.SessionManager.create_session_audit(db, sg_event_schema)
         logger.debug(f"Event execute response: {response_message}")
@@ -65,6 +67,44 @@ def subscribe_sg(
         logger.critical(f"Request Error: {str(e)}")
 
 
+@subscribe_api.post("/v1/subscribe/sg/batch")
+def subscribe_sg_batch(
+    data: List[Dict],
+    db: Session = Depends(get_db)
+):
+    """
+    Receive a batch of Subscribed Events from SG-Admin, e.g. a replay or a backlog flush.
+    Returns the outcome of every event in the order received.
+    """
+    logger.debug(f"Batch of {len(data)} events received")
+
+    outcomes = [None] * len(data)
+    accepted = []
+    for index, event in enumerate(data):
+        payload = dict(event)
+        try:
+            accepted.append((index, payload, EventIngest.parse(event)))
+        except Exception as e:
+            outcomes[index] = {"status": "rejected", "message": f"Invalid event: {str(e)}"}
+
+    if config.settings.SG_EVENT_INGEST_ASYNC:
+        try:
+            EventIngest.enqueue_many([(payload, sg_event_schema.parking_lot_id)
+                                      for _, payload, sg_event_schema in accepted])
+        except RedisError as e:
+            logger.critical(f"Batch of {len(accepted)} events not queued: {str(e)}")
+            return JSONResponse(content={"message": "Event queue unavailable"}, status_code=503)
+        for index, _, _ in accepted:
+            outcomes[index] = {"status": "accepted"}
+        return JSONResponse(content={"events": outcomes}, status_code=202)
+
+    results = session_manager.SessionManager.create_session_audits(
+        db, [sg_event_schema for _, _, sg_event_schema in accepted])
+    for (index, _, _), result in zip(accepted, results):
+        outcomes[index] = result
+    return JSONResponse(content={"events": outcomes}, status_code=200)
+
+
 @subscribe_api.post("/v1/subscribe/arrive")
 def subscribe_arrive(data: Dict, db: Session = Depends(get_db),
                      auth_token: str = Depends(AuthService.verify_basic_auth)):
@@ -19,6 +19,17 @@ class Settings(BaseSettings):
     SMTP_USERNAME: str = os.getenv("SMTP_USERNAME", "")
     SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
     TASK_PICKING_LIMIT: int = os.getenv("TASK_PICKING_LIMIT", 10)
+    TASK_DISPATCHER_ENABLED: bool = os.getenv("TASK_DISPATCHER_ENABLED", "false").lower() in ("true", "1", "t")
+    TASK_DISPATCHER_WORKERS: int = int(os.getenv("TASK_DISPATCHER_WORKERS", 4))
+    TASK_EXECUTOR_WORKERS: int = int(os.getenv("TASK_EXECUTOR_WORKERS", 8))
+    TASK_CLAIM_TIMEOUT_SEC: int = int(os.getenv("TASK_CLAIM_TIMEOUT_SEC", 900))
+    TASK_RETRY_BACKOFF_SEC: int = int(os.getenv("TASK_RETRY_BACKOFF_SEC", 60))
+    TASK_DISPATCHER_POLL_INTERVAL_SEC: float = float(os.getenv("TASK_DISPATCHER_POLL_INTERVAL_SEC", 1))
+    SG_EVENT_INGEST_ASYNC: bool = os.getenv("SG_EVENT_INGEST_ASYNC", "false").lower() in ("true", "1", "t")
+    SG_EVENT_PARTITIONS: int = int(os.getenv("SG_EVENT_PARTITIONS", 8))
+    SG_EVENT_MAX_DELIVERIES: int = int(os.getenv("SG_EVENT_MAX_DELIVERIES", 5))
+    SG_EVENT_QUEUE_DEPTH_ALERT: int = int(os.getenv("SG_EVENT_QUEUE_DEPTH_ALERT", 10000))
+    SG_EVENT_CONSUMER_BLOCK_MS: int = int(os.getenv("SG_EVENT_CONSUMER_BLOCK_MS", 5000))
     TOKEN_FOR_CREATE_ALERT_API: str = os.getenv("TOKEN_FOR_CREATE_ALERT_API", "")
     SIMULATION_PAYMENT_STATUS: bool = os.getenv("SIMULATION_PAYMENT_STATUS", False)
     VIOLATION_GRACE_PERIOD: int = os.getenv("VIOLATION_GRACE_PERIOD", 20)
@@ -49,6 +60,9 @@ class Settings(BaseSettings):
     DATA_TICKET_API_KEY: str = os.getenv("DATA_TICKET_API_KEY", "")
     REQUEST_TIMEOUT: int = os.getenv("REQUEST_TIMEOUT", 30)
     SG_ADMIN_API_REQUEST_TIMEOUT: int = os.getenv("SG_ADMIN_API_REQUEST_TIMEOUT", 3)
+    SG_ADMIN_LOT_STATUS_CACHE_TTL_SEC: int = int(os.getenv("SG_ADMIN_LOT_STATUS_CACHE_TTL_SEC", 300))
+    SG_ADMIN_PRIVILEGE_PERMIT_CACHE_TTL_SEC: int = int(os.getenv("SG_ADMIN_PRIVILEGE_PERMIT_CACHE_TTL_SEC", 30))
+    SG_ADMIN_TOKEN_CACHE_TTL_SEC: int = int(os.getenv("SG_ADMIN_TOKEN_CACHE_TTL_SEC", 3600))
 
     SERVICE_NAME: str = os.getenv("SERVICE_NAME", "")
     ALLOW_OTEL_COLLECTOR: str = os.getenv("ALLOW_OTEL_COLLECTOR", "false")
@@ -64,6 +78,26 @@ class Settings(BaseSettings):
     DEFAULT_EXTERNAL_API_REQUEST_TIMEOUT_SEC: int = int(
         os.getenv("DEFAULT_EXTERNAL_API_REQUEST_TIMEOUT_SEC", 30)
     )
+    PROVIDER_LOOKUP_WORKERS: int = int(os.getenv("PROVIDER_LOOKUP_WORKERS", 8))
+    PAYMENT_SCHEDULE_CACHE_TTL_SEC: int = int(os.getenv("PAYMENT_SCHEDULE_CACHE_TTL_SEC", 3600))
+    RENDER_PLAN_CACHE_TTL_SEC: int = int(os.getenv("RENDER_PLAN_CACHE_TTL_SEC", 3600))
+    RESPONSE_EXTRACTOR_CACHE_TTL_SEC: int = int(os.getenv("RESPONSE_EXTRACTOR_CACHE_TTL_SEC", 3600))
+    PAYMENT_SNAPSHOT_ENABLED: bool = os.getenv("PAYMENT_SNAPSHOT_ENABLED", "false").lower() in ("true", "1", "t")
+    PAYMENT_SNAPSHOT_TTL_SEC: int = int(os.getenv("PAYMENT_SNAPSHOT_TTL_SEC", 60))
+    PUSH_PAYMENT_RETENTION_DAYS: int = int(os.getenv("PUSH_PAYMENT_RETENTION_DAYS", 30))
+    PUSH_PAYMENT_ARCHIVE_BATCH_SIZE: int = int(os.getenv("PUSH_PAYMENT_ARCHIVE_BATCH_SIZE", 1000))
+    AUDIT_STATS_CACHE_TTL_SEC: int = int(os.getenv("AUDIT_STATS_CACHE_TTL_SEC", 30))
+    AUDIT_LOG_BATCH_SIZE: int = int(os.getenv("AUDIT_LOG_BATCH_SIZE", 500))
+    AUDIT_EXPORT_YIELD_PER: int = int(os.getenv("AUDIT_EXPORT_YIELD_PER", 1000))
+    SESSION_ROLLUP_ENABLED: bool = os.getenv("SESSION_ROLLUP_ENABLED", "false").lower() in ("true", "1", "t")
+    SESSION_ROLLUP_BATCH_SIZE: int = int(os.getenv("SESSION_ROLLUP_BATCH_SIZE", 1000))
+    CATALOG_CACHE_TTL_SEC: int = int(os.getenv("CATALOG_CACHE_TTL_SEC", 600))
+    CATALOG_CACHE_VERSION_CHECK_SEC: int = int(os.getenv("CATALOG_CACHE_VERSION_CHECK_SEC", 5))
+    PROVIDER_ROUTING_INDEX_TTL_SEC: int = int(os.getenv("PROVIDER_ROUTING_INDEX_TTL_SEC", 86400))
+    HTTP_CLIENT_POOL_MAXSIZE: int = int(os.getenv("HTTP_CLIENT_POOL_MAXSIZE", 20))
+    # JSON objects keyed by host name, e.g. {"api.example.com": 10}
+    HTTP_CLIENT_HOST_POOL_SIZES: str = os.getenv("HTTP_CLIENT_HOST_POOL_SIZES", "{}")
+    HTTP_CLIENT_HOST_TIMEOUTS: str = os.getenv("HTTP_CLIENT_HOST_TIMEOUTS", "{}")
     VIOLATION_SERVICE_BASE_URL: str = os.getenv("VIOLATION_SERVICE_BASE_URL", "")
 
     IS_VIOLATION_SERVICE_ENABLED: bool = os.getenv(
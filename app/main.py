@@ -1,7 +1,7 @@
 import logging
 import time
 import coloredlogs
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from pathlib import Path
 from huey import crontab
@@ -12,12 +12,15 @@ from app.config import huey, settings
 from app.config import redis_client
 from app.exception_handler import custom_exception_handler
 from app.api.routes import api_router
-from app.models.context_session import get_db_session
+from app.models.catalog_cache import warm_up_catalog_cache
+from app.models.context_session import get_db_session, remove_db_session, get_pool_metrics
+from app.models.push_payment import PushPayment
+from app.service.session_rollup import SessionRollup
 from app.service.task_service import TaskService
 from app.utils.common import calculate_time_differece
 from app.utils.logging.otel_config import setup_telemetry
 from app.utils.logging.logging_config import setup_logging
-from app.utils.slack_utils import send_slack_notification, get_error_fingerprint
+from app.utils.slack_utils import notify_task_failure
 
 
 load_dotenv()
@@ -52,6 +55,11 @@ coloredlogs.install(level='debug', isatty=True, fmt=log_format,
                         'critical': {'color': 'red', 'bold': True}})
 
 
+@app.on_event("startup")
+def warm_up_caches():
+    warm_up_catalog_cache()
+
+
 @app.get("/")
 def read_root():
     return {
@@ -77,6 +85,10 @@ async def get_image(image_name: str):
 
 @huey.periodic_task(crontab(minute="*/1"))
 def process_task():
+    if settings.TASK_DISPATCHER_ENABLED:
+        # tasks are drained continuously by app.service.task_dispatcher
+        return
+
     start_time = time.time()
     logging.info("Huey process started.")
 
@@ -86,22 +98,37 @@ def process_task():
         TaskService.process_task(db_session)
     except Exception as e:
         logger.error(f"Error processing task: {e}")
+        notify_task_failure(e)
+    finally:
+        remove_db_session()
 
-        alert_key = get_error_fingerprint(e)
+    total_time = calculate_time_differece(start_time)
+    logging.info(f"Huey process completed in {total_time:.2f} seconds. DB pool: {get_pool_metrics()}")
 
-        alert_count = redis_client.incr(alert_key)
-        if alert_count == 1:
-            redis_client.expire(alert_key, settings.SLACK_ALERT_EXPIRY)
 
-        logger.critical(f"[Redis] Alert count for '{alert_key}': {alert_count}")
+@huey.periodic_task(crontab(minute="*/1"))
+def compact_session_rollup():
+    if not settings.SESSION_ROLLUP_ENABLED:
+        return
 
-        if alert_count <= settings.SLACK_ALERT_LIMIT:
-            send_slack_notification(
-                f"🚨 Huey Task Failure",
-                f"Task failed with error:\n```{str(e)}```"
-            )
-        else:
-            logger.critical(f"Alert for '{alert_key}' already sent {alert_count} times. Suppressing.")
+    try:
+        db_session = get_db_session()
+        compacted = SessionRollup.compact(db_session)
+        logger.info(f"Session rollup compacted for {compacted} changed sessions.")
+    except Exception as e:
+        logger.error(f"Error compacting session rollup: {e}")
+    finally:
+        remove_db_session()
 
-    total_time = calculate_time_differece(start_time)
-    logging.info(f"Huey process completed in {total_time:.2f} seconds.")
+
+@huey.periodic_task(crontab(hour="3", minute="15"))
+def archive_push_payments():
+    ended_before = datetime.utcnow() - timedelta(days=settings.PUSH_PAYMENT_RETENTION_DAYS)
+    try:
+        db_session = get_db_session()
+        archived = PushPayment.archive_checked(db_session, ended_before, settings.PUSH_PAYMENT_ARCHIVE_BATCH_SIZE)
+        logger.info(f"Archived {archived} checked push payments that ended before {ended_before}.")
+    except Exception as e:
+        logger.error(f"Error archiving push payments: {e}")
+    finally:
+        remove_db_session()
@@ -0,0 +1,62 @@
+"""62_push_payment_lookup_indexes
+
+Revision ID: 6fe72a1880fa
+Revises: 289b3d966239
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+from typing import Sequence, Union
+# revision identifiers, used by Alembic.
+revision: str = '6fe72a1880fa'
+down_revision: Union[str, None] = '289b3d966239'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # consumed push payments are moved here by the retention job
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS push_payment_archive
+        (LIKE push_payment INCLUDING DEFAULTS);
+    """)
+
+    op.execute("COMMIT")  # Ends the current transaction
+
+    op.execute("""
+        CREATE INDEX CONCURRENTLY idx_push_payment_plate_lookup
+        ON push_payment(fk_provider_id, lower(plate_number), location_id, is_checked, id DESC);
+    """)
+    op.execute("""
+        CREATE INDEX CONCURRENTLY idx_push_payment_spot_lookup
+        ON push_payment(fk_provider_id, lower(spot_id), location_id, is_checked, id DESC);
+    """)
+    op.execute("""
+        CREATE INDEX CONCURRENTLY idx_push_payment_location_end_date_time
+        ON push_payment(location_id, end_date_time);
+    """)
+    op.execute("""
+        CREATE INDEX CONCURRENTLY idx_push_payment_checked_end_date_time
+        ON push_payment(end_date_time)
+        WHERE is_checked = TRUE;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("COMMIT")  # Ends the current transaction
+
+    op.execute("""
+        DROP INDEX CONCURRENTLY IF EXISTS idx_push_payment_plate_lookup
+    """)
+    op.execute("""
+        DROP INDEX CONCURRENTLY IF EXISTS idx_push_payment_spot_lookup
+    """)
+    op.execute("""
+        DROP INDEX CONCURRENTLY IF EXISTS idx_push_payment_location_end_date_time
+    """)
+    op.execute("""
+        DROP INDEX CONCURRENTLY IF EXISTS idx_push_payment_checked_end_date_time
+    """)
+    op.execute("""
+        DROP TABLE IF EXISTS push_payment_archive
+    """)
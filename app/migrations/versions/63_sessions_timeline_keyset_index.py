@@ -0,0 +1,42 @@
+"""63_sessions_timeline_keyset_index
+
+Revision ID: 9c41d7e2b5a3
+Revises: 6fe72a1880fa
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+from typing import Sequence, Union
+# revision identifiers, used by Alembic.
+revision: str = '9c41d7e2b5a3'
+down_revision: Union[str, None] = '6fe72a1880fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # kept in sync by postgres, replaces json_typeof(entry_event) != 'null' in the audit queries
+    op.execute("""
+        ALTER TABLE sessions
+        ADD COLUMN IF NOT EXISTS has_entry_event BOOLEAN
+        GENERATED ALWAYS AS (json_typeof(entry_event) <> 'null') STORED;
+    """)
+
+    op.execute("COMMIT")  # Ends the current transaction
+
+    op.execute("""
+        CREATE INDEX CONCURRENTLY idx_sessions_parking_lot_id_start_time_id
+        ON sessions(parking_lot_id, session_start_time DESC, id DESC)
+        WHERE deleted_at IS NULL;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("COMMIT")  # Ends the current transaction
+
+    op.execute("""
+        DROP INDEX CONCURRENTLY IF EXISTS idx_sessions_parking_lot_id_start_time_id
+    """)
+    op.execute("""
+        ALTER TABLE sessions DROP COLUMN IF EXISTS has_entry_event
+    """)
@@ -0,0 +1,44 @@
+"""64_sessions_plate_spot_trigram_indexes
+
+Revision ID: 4b8e2f06c1d9
+Revises: 9c41d7e2b5a3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+from typing import Sequence, Union
+# revision identifiers, used by Alembic.
+revision: str = '4b8e2f06c1d9'
+down_revision: Union[str, None] = '9c41d7e2b5a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # pg_trgm serves ILIKE '%...%', fuzzystrmatch provides levenshtein_less_equal for similar plates
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS fuzzystrmatch")
+
+    op.execute("COMMIT")  # Ends the current transaction
+
+    op.execute("""
+        CREATE INDEX CONCURRENTLY idx_sessions_lpr_number_trgm
+        ON sessions USING gin (lpr_number gin_trgm_ops)
+        WHERE deleted_at IS NULL;
+    """)
+    op.execute("""
+        CREATE INDEX CONCURRENTLY idx_sessions_parking_spot_name_trgm
+        ON sessions USING gin (parking_spot_name gin_trgm_ops)
+        WHERE deleted_at IS NULL;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("COMMIT")  # Ends the current transaction
+
+    op.execute("""
+        DROP INDEX CONCURRENTLY IF EXISTS idx_sessions_lpr_number_trgm
+    """)
+    op.execute("""
+        DROP INDEX CONCURRENTLY IF EXISTS idx_sessions_parking_spot_name_trgm
+    """)
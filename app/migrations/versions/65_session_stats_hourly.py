@@ -0,0 +1,36 @@
+"""65_session_stats_hourly
+
+Revision ID: d27a5c9e83f1
+Revises: 4b8e2f06c1d9
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd27a5c9e83f1'
+down_revision: Union[str, None] = '4b8e2f06c1d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('session_stats_hourly',
+    sa.Column('parking_lot_id', sa.Integer(), nullable=False),
+    sa.Column('bucket_start', sa.TIMESTAMP(), nullable=False),
+    sa.Column('total_sessions', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('active_sessions', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('in_grace_period', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('violations', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('parking_lot_id', 'bucket_start')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('session_stats_hourly')
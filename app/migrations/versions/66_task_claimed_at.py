@@ -0,0 +1,40 @@
+"""66_task_claimed_at
+
+Revision ID: 5e1a7c3f9b20
+Revises: d27a5c9e83f1
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1a7c3f9b20'
+down_revision: Union[str, None] = 'd27a5c9e83f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('task', sa.Column('claimed_at', sa.TIMESTAMP(), nullable=True))
+
+    op.execute("COMMIT")  # Ends the current transaction
+
+    # claims left IN_PROGRESS by a worker that died are picked up again by the next claim
+    op.execute("""
+        CREATE INDEX CONCURRENTLY idx_task_in_progress_claimed_at
+        ON task(claimed_at)
+        WHERE status = 'IN_PROGRESS';
+    """)
+
+
+def downgrade() -> None:
+    op.execute("COMMIT")  # Ends the current transaction
+
+    op.execute("""
+        DROP INDEX CONCURRENTLY IF EXISTS idx_task_in_progress_claimed_at
+    """)
+    op.drop_column('task', 'claimed_at')
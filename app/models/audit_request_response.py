@@ -8,6 +8,7 @@ from sqlalchemy import (Column,
 from sqlalchemy.orm import Session
 from app.models.base import Base
 from app import schema
+from app.models.context_session import commit_or_flush
 
 
 class AuditRequestResponse(Base):
@@ -26,7 +27,7 @@ class AuditRequestResponse(Base):
     def create(cls, db: Session, audit_schema: schema.AuditReqRespCreateSchema):
         audit_request_response = cls(**audit_schema.model_dump())
         db.add(audit_request_response)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(audit_request_response)
         return audit_request_response
 
@@ -36,7 +37,7 @@ class AuditRequestResponse(Base):
         audit_obj = db.query(cls).get(id)
         audit_obj.response_json = json.dumps(schema)
         db.add(audit_obj)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(audit_obj)
         return audit_obj
 
@@ -44,6 +45,6 @@ class AuditRequestResponse(Base):
     def create_audit_req_resp(cls, db: Session, schema: List[schema.RegisterLotSchema]):
         request_schemas = AuditRequestResponse(request_schema=json.dumps(schema))
         db.add(request_schemas)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(request_schemas)
         return request_schemas
@@ -18,6 +18,7 @@ from .violation_configuration import ViolationConfiguration
 from .audit_request_response import AuditRequestResponse
 from .sessions import Sessions
 from .session_log import SessionLog
+from .session_stats_hourly import SessionStatsHourly
 from .sub_task import SubTask
 from .push_payment import PushPayment
 from .citation import Citation
@@ -0,0 +1,209 @@
+import copy
+import logging
+import threading
+import time
+from collections import defaultdict
+from itertools import chain
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.config import settings, redis_client
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CATALOG_TABLES = ("provider_types", "provider", "feature", "feature_url_path", "event_types")
+VERSION_KEY = "catalog_cache_version"
+INVALIDATION_CHANNEL = "catalog_cache_invalidate"
+
+
+class CatalogCache:
+    """
+    Read-through, process-local cache of the static catalog tables (provider types, providers,
+    features, feature url paths and event types) that are read on every event and task.
+
+    Rows are kept as column snapshots and handed out as instances merged into the caller's
+    session without a SELECT, so relationships and updates keep working as usual.
+    Any commit touching a catalog row bumps a Redis version and publishes the table names,
+    every worker drops the stale entries, the version is also polled in case a message is lost.
+    """
+
+    def __init__(self, ttl: float = None, version_check_interval: float = None):
+        self.ttl = ttl or settings.CATALOG_CACHE_TTL_SEC
+        self.version_check_interval = version_check_interval or settings.CATALOG_CACHE_VERSION_CHECK_SEC
+        self._tables = {table: TTLCache(ttl=self.ttl, maxsize=5000) for table in CATALOG_TABLES}
+        self._dependents = defaultdict(list)
+        self._version = None
+        self._version_checked_at = 0.0
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, model, ident):
+        """Catalog row by primary key."""
+        if ident is None:
+            return None
+        self._sync()
+        table = self._tables[model.__tablename__]
+
+        values = table.get(("id", ident))
+        if values is not None:
+            return self._attach(db, model, values)
+
+        instance = db.get(model, ident)
+        if instance is not None:
+            table.set(("id", ident), self._snapshot(instance))
+        return instance
+
+    def find_one(self, db: Session, model, lookup: tuple, query):
+        """
+        Catalog row by any other lookup, e.g. ("text_key", value). The lookup is resolved
+        to a primary key once with the given query callable, then served like get().
+        """
+        self._sync()
+        table = self._tables[model.__tablename__]
+
+        ident = table.get(lookup)
+        if ident is not None:
+            return self.get(db, model, ident)
+
+        instance = query()
+        if instance is not None:
+            table.set(lookup, instance.id)
+            table.set(("id", instance.id), self._snapshot(instance))
+        return instance
+
+    def warm_up(self, db: Session, models):
+        self._sync()
+        for model in models:
+            table = self._tables[model.__tablename__]
+            for instance in db.query(model).all():
+                table.set(("id", instance.id), self._snapshot(instance))
+        logger.info("Catalog cache warmed up.")
+
+    def register(self, tables, cache: TTLCache):
+        """Clears a cache derived from other tables whenever one of them changes, in every worker."""
+        for table in tables:
+            self._dependents[table].append(cache)
+
+    def watches(self, table) -> bool:
+        return table in self._tables or table in self._dependents
+
+    def clear(self, tables=None):
+        if tables is None:
+            tables = self._tables.keys() | self._dependents.keys()
+        for table in tables:
+            if table in self._tables:
+                self._tables[table].invalidate()
+            for cache in self._dependents.get(table, ()):
+                cache.invalidate()
+
+    def invalidate(self, tables):
+        """Drops the tables locally and tells every other worker to do the same."""
+        self.clear(tables)
+        try:
+            self._version = str(redis_client.incr(VERSION_KEY))
+            redis_client.publish(INVALIDATION_CHANNEL, ",".join(sorted(tables)))
+        except Exception as e:
+            logger.warning(f"Catalog cache invalidation could not be published: {str(e)}")
+
+    @staticmethod
+    def _snapshot(instance) -> dict:
+        mapper = inspect(instance).mapper
+        return {attr.key: copy.deepcopy(getattr(instance, attr.key)) for attr in mapper.column_attrs}
+
+    @staticmethod
+    def _attach(db: Session, model, values: dict):
+        identity_key = inspect(model).identity_key_from_primary_key([values["id"]])
+        existing = db.identity_map.get(identity_key)
+        if existing is not None:
+            return existing
+
+        instance = model(**copy.deepcopy(values))
+        make_transient_to_detached(instance)
+        return db.merge(instance, load=False)
+
+    def _sync(self):
+        self._start_listener()
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_interval:
+            return
+        self._version_checked_at = now
+
+        try:
+            version = redis_client.get(VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Catalog cache version unavailable: {str(e)}")
+            return
+
+        if version != self._version:
+            if self._version is not None:
+                self.clear()
+            self._version = version
+
+    def _start_listener(self):
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="catalog-cache-listener", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    tables = (message.get("data") or "").split(",")
+                    self.clear([table for table in tables if table])
+            except Exception as e:
+                logger.warning(f"Catalog cache listener disconnected: {str(e)}")
+                time.sleep(5)
+
+
+catalog_cache = CatalogCache()
+
+
+def warm_up_catalog_cache():
+    from app.models import base
+    from app.models.context_session import get_db_session, remove_db_session
+
+    try:
+        catalog_cache.warm_up(get_db_session(), [base.ProviderTypes, base.Provider, base.Feature,
+                                                 base.FeatureUrlPath, base.EventTypes])
+    except Exception as e:
+        logger.warning(f"Catalog cache warm up failed: {str(e)}")
+    finally:
+        remove_db_session()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_catalog_changes(session, flush_context):
+    touched = {
+        instance.__tablename__
+        for instance in chain(session.new, session.dirty, session.deleted)
+        if catalog_cache.watches(getattr(instance, "__tablename__", None))
+    }
+    if touched:
+        session.info.setdefault("catalog_tables_changed", set()).update(touched)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_catalog_bulk_changes(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and orm_execute_state.bind_mapper is not None:
+        table = orm_execute_state.bind_mapper.class_.__tablename__
+        if catalog_cache.watches(table):
+            orm_execute_state.session.info.setdefault("catalog_tables_changed", set()).add(table)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog_changes(session):
+    tables = session.info.pop("catalog_tables_changed", None)
+    if tables:
+        catalog_cache.invalidate(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session):
+    session.info.pop("catalog_tables_changed", None)
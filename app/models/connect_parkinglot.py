@@ -9,6 +9,7 @@ from app.schema import CreateParkinglotSchema
 from app.utils.enum import ParkingOperations, TimeUnits 
 from app.models import base
 from app.utils.enum import ProviderTypes
+from app.models.context_session import commit_or_flush
 
 
 logger = logging.getLogger(__name__)
@@ -36,7 +37,7 @@ class ConnectParkinglot(Base):
     def create(cls, db, create_parkinglot_schema: CreateParkinglotSchema):
         connect_parkinglot = cls(**create_parkinglot_schema.model_dump())
         db.add(connect_parkinglot)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(connect_parkinglot)
         return connect_parkinglot
 
@@ -85,7 +86,7 @@ class ConnectParkinglot(Base):
             if parking_lot:
                 for key, value in to_update.dict(exclude_unset=True).items():
                     setattr(parking_lot, key, value)
-                db.commit()
+                commit_or_flush(db)
                 return parking_lot
             else:
                 return JSONResponse(content={"message": f'parking lot is not register with id {parking_lot_id}'},
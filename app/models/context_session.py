@@ -1,11 +1,134 @@
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+import logging
+import threading
+from contextlib import contextmanager
+
+from opentelemetry import metrics
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, scoped_session
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# One engine per worker process, the pool is shared by the huey tasks, the task dispatcher,
+# scripts and model helpers instead of building a new pool on every call.
+engine = create_engine(settings.SQLALCHEMY_DATABASE_URI,
+                       pool_pre_ping=True,
+                       pool_size=settings.SQLALCHEMY_POOL_SIZE,
+                       max_overflow=settings.SQLALCHEMY_POOL_MAX_OVERFLOW
+                       )
+
+SessionFactory = sessionmaker(bind=engine)
+ScopedSession = scoped_session(SessionFactory)
+
+_pool_counters = {"connects": 0, "checkouts": 0}
+_pool_counters_lock = threading.Lock()
+
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    with _pool_counters_lock:
+        _pool_counters["connects"] += 1
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    with _pool_counters_lock:
+        _pool_counters["checkouts"] += 1
+
 
 def get_db_session():
-    # Create a SQLAlchemy engine
-    engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
-    Session = sessionmaker(bind=engine)
-    db_session = Session()
-    return db_session
+    """Returns the session bound to the current thread, backed by the process-wide engine."""
+    return ScopedSession()
+
+
+def remove_db_session():
+    """Closes the current thread's session and returns its connection to the pool."""
+    ScopedSession.remove()
+
+
+@contextmanager
+def unit_of_work(db):
+    """
+    Runs the block in a single transaction that commits once when the block exits. Model helpers
+    save with commit_or_flush(), which only flushes inside the block. Calls registered with
+    after_commit() run once the block has committed, e.g. requests to SG-Admin, and are dropped
+    when it rolls back. Any exception rolls the whole block back and is re-raised. A nested block
+    runs in a savepoint, so a failure caught by its caller only undoes the nested writes.
+    """
+    if db.info.get("unit_of_work"):
+        callbacks = db.info["after_commit"]
+        registered = len(callbacks)
+        try:
+            with db.begin_nested():
+                yield db
+        except Exception:
+            del callbacks[registered:]
+            raise
+        return
+
+    if not db.in_transaction():
+        db.begin()
+    db.info["unit_of_work"] = True
+    db.info["after_commit"] = callbacks = []
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.info.pop("unit_of_work", None)
+        db.info.pop("after_commit", None)
+
+    for callback, args in callbacks:
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"After commit call {callback.__qualname__} failed: {str(e)}")
+
+
+def commit_or_flush(db):
+    """Commits, or only flushes inside unit_of_work, which commits once for the whole block."""
+    if db.info.get("unit_of_work"):
+        db.flush()
+    else:
+        db.commit()
+
+
+def after_commit(db, callback, *args):
+    """Calls callback(*args) once the current unit_of_work has committed, right away outside one."""
+    if db.info.get("unit_of_work"):
+        db.info["after_commit"].append((callback, args))
+    else:
+        callback(*args)
+
+
+def get_pool_metrics() -> dict:
+    pool = engine.pool
+    with _pool_counters_lock:
+        counters = dict(_pool_counters)
+    return {
+        "pool_size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "connects": counters["connects"],
+        "checkouts": counters["checkouts"],
+    }
+
+
+def _observe_pool(metric_name: str):
+    def callback(options):
+        yield metrics.Observation(get_pool_metrics()[metric_name])
+    return callback
+
+
+_meter = metrics.get_meter(__name__)
+_meter.create_observable_gauge("db.pool.checked_out", callbacks=[_observe_pool("checked_out")],
+                               description="Connections currently checked out of the worker pool")
+_meter.create_observable_gauge("db.pool.overflow", callbacks=[_observe_pool("overflow")],
+                               description="Connections opened beyond the configured pool size")
+_meter.create_observable_counter("db.pool.connects", callbacks=[_observe_pool("connects")],
+                                 description="Physical connections opened by the worker pool")
+_meter.create_observable_counter("db.pool.checkouts", callbacks=[_observe_pool("checkouts")],
+                                 description="Connections checked out of the worker pool")
@@ -4,6 +4,7 @@ from sqlalchemy import (Integer, Column, JSON, ForeignKey, String, Text)
 from sqlalchemy.orm import relationship
 
 from app.schema import Session
+from app.models.context_session import commit_or_flush
 
 
 class EnforcementResponseStore(Base):
@@ -18,7 +19,7 @@ class EnforcementResponseStore(Base):
         try:
             new_entry = cls(response=response_data)
             db.add(new_entry)
-            db.commit()
+            commit_or_flush(db)
             return new_entry
         except Exception as e:
             db.rollback()
@@ -4,6 +4,7 @@ from sqlalchemy import (Column,
                         )
 from app.models.base import Base
 from sqlalchemy.orm import Session
+from app.models.catalog_cache import catalog_cache
 
 
 class EventTypes(Base):
@@ -14,7 +15,7 @@ class EventTypes(Base):
 
     @classmethod
     def get_by_id(cls, db: Session, event_id: int):
-        event_obj = db.query(cls).get(event_id)
+        event_obj = catalog_cache.get(db, cls, event_id)
         return event_obj
 
     @classmethod
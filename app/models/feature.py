@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session, aliased
 
 from app.utils.enum import FeatureType
 from app.models import base
+from app.models.catalog_cache import catalog_cache
 
 
 class Feature(Base):
@@ -20,11 +21,14 @@ class Feature(Base):
 
     @classmethod
     def get(cls, db: Session, id: int):
-        return db.query(cls).get(id)
+        return catalog_cache.get(db, cls, id)
     
     @classmethod
     def get_by_text_key(cls, db: Session, key: str):
-        return db.query(cls).filter(cls.text_key == key).first()
+        return catalog_cache.find_one(
+            db, cls, ("text_key", key),
+            lambda: db.query(cls).filter(cls.text_key == key).first()
+        )
 
     @classmethod
     def get_all_features(cls, db: Session):
@@ -8,6 +8,7 @@ from app.models import base
 from app.models.base import Base
 from sqlalchemy.dialects.postgresql import UUID
 from app import schema
+from app.models.context_session import commit_or_flush
 
 
 class FeatureEventType(Base):
@@ -41,7 +42,7 @@ class FeatureEventType(Base):
     def create_feature_event_type(cls, db: Session, create_feature_event_type_schema: schema.CreateFeatureEventType):
         feature_event = cls(**create_feature_event_type_schema.model_dump())
         db.add(feature_event)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(feature_event)
         return feature_event
 
@@ -103,7 +104,7 @@ class FeatureEventType(Base):
     @classmethod
     def delete(cls, db: Session, feature_event_type_id: int):
         db.query(cls).filter(cls.id == feature_event_type_id).delete()
-        db.commit()
+        commit_or_flush(db)
 
     @classmethod
     def delete_attached_feature_event_type(cls, db: Session,
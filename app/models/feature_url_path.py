@@ -4,9 +4,11 @@ from sqlalchemy import (Column,
                         Integer, Text,
                         Enum, JSON
                         )
+from app.models import base
 from app.models.base import Base
 from sqlalchemy.orm import Session
 from app.utils.enum import FeatureRequestType
+from app.models.catalog_cache import catalog_cache
 
 
 class FeatureUrlPath(Base):
@@ -24,7 +26,7 @@ class FeatureUrlPath(Base):
 
     @classmethod
     def get_feature_url_path_by_id(cls, db: Session, feature_url_path_id: int):
-        return db.query(cls).get(feature_url_path_id)
+        return catalog_cache.get(db, cls, feature_url_path_id)
 
     @classmethod
     def get_feature_by_provider_id(cls, db: Session, provider_id: int):
@@ -32,6 +34,15 @@ class FeatureUrlPath(Base):
 
         return provider_feature
 
+    @classmethod
+    def get_by_provider_and_feature(cls, db: Session, provider_id: int, feature_text_key: str):
+        return (db.query(cls)
+                .join(base.ProviderFeature, base.ProviderFeature.id == cls.provider_feature_id)
+                .join(base.Feature, base.Feature.id == base.ProviderFeature.feature_id)
+                .filter(cls.provider_id == provider_id, base.Feature.text_key == feature_text_key,
+                        base.Feature.is_enabled == True)
+                .first())
+
     @classmethod
     def get_by_provider_feature_id(cls, db, provider_feature_id: int):
         provider_feature = db.query(cls).filter(cls.provider_feature_id == provider_feature_id).first()
@@ -2,6 +2,7 @@ from sqlalchemy import Column, Integer, String
 from sqlalchemy.orm import Session, relationship
 from app.models.base import Base
 from app.schema import CreateOrganizationSchema, UpdateOrganizationSchema
+from app.models.context_session import commit_or_flush
 
 
 class Organization(Base):
@@ -17,7 +18,7 @@ class Organization(Base):
     def create(cls, db: Session, create_organization_schema: CreateOrganizationSchema):
         organization = cls(**create_organization_schema.model_dump())
         db.add(organization)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(organization)
         return organization
 
@@ -34,6 +35,6 @@ class Organization(Base):
         organization = db.query(cls).filter(cls.id == organization_id).first()
         organization.contact_name = update_organization_schema.contact_name
         organization.contact_email = update_organization_schema.contact_email
-        db.commit()
+        commit_or_flush(db)
         db.refresh(organization)
         return organization
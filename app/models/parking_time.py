@@ -2,6 +2,7 @@ from sqlalchemy.orm import relationship, Session
 from app.models.base import Base
 from sqlalchemy import Column, Time, Integer, ForeignKey
 from app import schema
+from app.models.context_session import commit_or_flush
 
 
 class ParkingTime(Base):
@@ -18,7 +19,7 @@ class ParkingTime(Base):
     def create(cls, db: Session, parking_time_schema: schema.ParkingTimeSchema):
         parking_time = cls(**parking_time_schema.model_dump())
         db.add(parking_time)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(parking_time)
         return parking_time
 
@@ -28,7 +29,7 @@ class ParkingTime(Base):
         parking_time.start_time = update_parking_time.start_time
         parking_time.end_time = update_parking_time.end_time
         parking_time.parking_lot_id = update_parking_time.parking_lot_id
-        db.commit()
+        commit_or_flush(db)
         return parking_time
 
     @classmethod
@@ -37,7 +38,7 @@ class ParkingTime(Base):
             cls.parking_lot_id == parking_lot_id,
             cls.id.notin_(exclude_delete_time_records)
         ).delete(synchronize_session=False)
-        db.commit()
+        commit_or_flush(db)
 
     @classmethod
     def get_records_order_by_id(cls, db: Session, parking_lot_id: int):
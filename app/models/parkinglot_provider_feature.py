@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session, aliased
 from app.models.base import Base
 from app import schema
 from app.models import base
+from app.models.context_session import commit_or_flush
 
 
 class ParkinglotProviderFeature(Base):
@@ -32,7 +33,7 @@ class ParkinglotProviderFeature(Base):
     def create_parkinglot_provider_feature(cls, db: Session, schema: schema.ParkinglotProviderFeatureCreateSchema):
         parkinglot_provider_feature = cls(**schema.model_dump())
         db.add(parkinglot_provider_feature)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(parkinglot_provider_feature)
         return parkinglot_provider_feature
 
@@ -53,13 +54,13 @@ class ParkinglotProviderFeature(Base):
         parkinglot_provider_feature = db.query(cls).filter(cls.provider_connect_id == provider_connect_id,
                                                            cls.feature_id == feature_id).first()
         db.delete(parkinglot_provider_feature)
-        db.commit()
+        commit_or_flush(db)
         return parkinglot_provider_feature
 
     @classmethod
     def delete(cls, db: Session, parkinglot_provider_feature_id: int):
         db.query(cls).filter(cls.id == parkinglot_provider_feature_id).delete()
-        db.commit()
+        commit_or_flush(db)
 
     @classmethod
     def get_by_feature_id(cls, db: Session, feature_id: int):
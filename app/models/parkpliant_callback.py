@@ -2,6 +2,7 @@ import json
 
 from app.models.base import Base
 from sqlalchemy import Column, Integer, Text
+from app.models.context_session import commit_or_flush
 
 
 class ParkPliantCallback(Base):
@@ -15,5 +16,5 @@ class ParkPliantCallback(Base):
         insert_record = ParkPliantCallback(response=response_str,
                                            callback_type=callback_type)
         db.add(insert_record)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(insert_record)
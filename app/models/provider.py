@@ -13,6 +13,8 @@ from app.utils.enum import AuthLevel
 from app.models.provider_types import ProviderTypes
 from app.models.provider_creds import ProviderCreds
 from app.models.provider_connect import ProviderConnect
+from app.models.catalog_cache import catalog_cache
+from app.models.context_session import commit_or_flush
 
 
 class Provider(Base):
@@ -34,7 +36,7 @@ class Provider(Base):
 
     @classmethod
     def get_provider_by_id(cls, db: Session, provider_id: int):
-        return db.query(cls).get(provider_id)
+        return catalog_cache.get(db, cls, provider_id)
 
     @classmethod
     def get_by_name(cls, db: Session, provider_name: str):
@@ -52,7 +54,7 @@ class Provider(Base):
     @classmethod
     def get_by_id(cls, db: Session, provider_id: int):
         if provider_id is not None:
-            provider = db.query(cls).get(provider_id)
+            provider = catalog_cache.get(db, cls, provider_id)
             if provider:
                 return provider
         return None
@@ -74,7 +76,7 @@ class Provider(Base):
             provider_obj.access_token = update_token.access_token
             provider_obj.expire_time = update_token.expire_time
             db.add(provider_obj)
-            db.commit()
+            commit_or_flush(db)
             db.refresh(provider_obj)
         return provider_obj
 
@@ -82,7 +84,7 @@ class Provider(Base):
     def create(cls, db: Session, schema: schema.CreateProviderSchema):
         provider = cls(**schema.model_dump())
         db.add(provider)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(provider)
         return provider
 
@@ -8,6 +8,8 @@ from app import schema
 from app.models import base
 from app.utils import enum
 from app.config import settings
+from app.models.provider_routing import provider_routing_index
+from app.models.context_session import commit_or_flush
 
 
 class ProviderConnect(Base):
@@ -32,7 +34,7 @@ class ProviderConnect(Base):
     def create(cls, db: Session, create_provider_connect_schema: schema.CreateProviderConnectSchema):
         provider_connect = cls(**create_provider_connect_schema.model_dump())
         db.add(provider_connect)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(provider_connect)
         return provider_connect
 
@@ -82,12 +84,17 @@ class ProviderConnect(Base):
 
         provider_connect_obj = ProviderConnect(**schema.model_dump())
         db.add(provider_connect_obj)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(provider_connect_obj)
         return provider_connect_obj
 
     @classmethod
     def find_providers_by_event_type_and_lot(cls, db: Session, event, parking_lot_id):
+        return provider_routing_index.lookup(db, event.event_key, parking_lot_id)
+
+    @classmethod
+    def build_routing(cls, db: Session, parking_lot_id) -> dict:
+        """Providers of every event type wired to the lot, grouped by event key and feature text_key."""
 
         parkinglot_provider_feature = aliased(base.ParkinglotProviderFeature)
         event_types_alias = aliased(base.EventTypes)
@@ -102,7 +109,6 @@ class ProviderConnect(Base):
                   parkinglot_provider_feature.id == feature_event_type_alias.parkinglot_provider_feature_id)
             .join(event_types_alias,
                   feature_event_type_alias.event_type_id == event_types_alias.id)  # Added join with event_types_alias
-            .filter(event_types_alias.text_key == event.event_key)
             .filter(cls.connect_id == parking_lot_id)
         )
 
@@ -110,15 +116,17 @@ class ProviderConnect(Base):
             feature_event_type_alias.parkinglot_provider_feature_id,
             feature_event_type_alias.feature_url_path_id,
             cls.provider_creds_id,
-            feature_alias.text_key
+            feature_alias.text_key,
+            event_types_alias.text_key
         )
 
         query = query.distinct()
 
         results = query.all()
 
-        grouped_results = {}
+        routing = {}
         for result in results:
+            grouped_results = routing.setdefault(result[5], {})
             key = result[4]
             if key not in grouped_results:
                 grouped_results[key] = []
@@ -130,7 +138,7 @@ class ProviderConnect(Base):
                 'text_key': result[4],
             })
 
-        return grouped_results
+        return routing
 
     @classmethod
     def get_provider_feature(cls, db: Session, parking_lot_id: int) -> List[schema.ProviderFeatureSchema]:
@@ -239,7 +247,7 @@ class ProviderConnect(Base):
             cls.id.in_(provider_connect_ids)
         ).delete(synchronize_session=False)
 
-        db.commit()
+        commit_or_flush(db)
         return 'Deleted successfully'
 
     @classmethod
@@ -413,12 +421,12 @@ class ProviderConnect(Base):
             ProviderConnect.provider_creds_id.in_(provider_creds_ids)
         )
         db.execute(stmt)
-        db.commit()
+        commit_or_flush(db)
 
     @classmethod
     def delete(cls, db: Session, provider_connect_id: int):
         db.query(cls).filter(cls.id == provider_connect_id).delete()
-        db.commit()
+        commit_or_flush(db)
 
     @classmethod
     def update_facility_id(cls, db: Session, provider_connect_id: int, facility_id: int):
@@ -8,6 +8,7 @@ from app.models.base_class import Base
 from sqlalchemy.orm import Session
 from app import schema
 import datetime
+from app.models.context_session import commit_or_flush
 
 
 
@@ -50,6 +51,10 @@ class ProviderCreds(Base):
         if get_by_id:
             return get_by_id
 
+    @classmethod
+    def get_by_ids(cls, db: Session, cls_ids: list):
+        return db.query(cls).filter(cls.id.in_(cls_ids)).all() if cls_ids else []
+
     @classmethod
     def get_provider_creds(cls, db, provider_creds_id: int):
         provider_creds = db.query(cls).filter(cls.id == provider_creds_id).first()
@@ -66,7 +71,7 @@ class ProviderCreds(Base):
             provider_creds.access_token = update_token.access_token
             provider_creds.expire_time = update_token.expire_time
             db.add(provider_creds)
-            db.commit()
+            commit_or_flush(db)
             db.refresh(provider_creds)
         return provider_creds
 
@@ -80,7 +85,7 @@ class ProviderCreds(Base):
         if provider_creds:
             for key, value in data_to_update.model_dump().items():
                 setattr(provider_creds, key, value)
-            db.commit()
+            commit_or_flush(db)
             return provider_creds
         else:
             return None
@@ -95,7 +100,7 @@ class ProviderCreds(Base):
         if provider_creds:
             provider_creds.access_token = token
             db.add(provider_creds)
-            db.commit()
+            commit_or_flush(db)
             db.refresh(provider_creds)
         return provider_creds
 
@@ -105,6 +110,6 @@ class ProviderCreds(Base):
         provider_cred = db.query(ProviderCreds).filter(ProviderCreds.id == cred_id).first()
         if provider_cred:
             provider_cred.deleted_at = datetime.datetime.utcnow()  # Mark as deleted
-            db.commit()
+            commit_or_flush(db)
             db.refresh(provider_cred)
         return provider_cred
\ No newline at end of file
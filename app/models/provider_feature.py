@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from app.models import base
 from app import schema
 from app.utils import enum
+from app.models.context_session import commit_or_flush
 
 
 class ProviderFeature(base.Base):
@@ -17,7 +18,7 @@ class ProviderFeature(base.Base):
     def create(cls, db: Session, provider_feature_create_schema: schema.ProviderFeatureCreateSchema):
         provider_feature = cls(**provider_feature_create_schema.model_dump())
         db.add(provider_feature)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(provider_feature)
         return provider_feature
 
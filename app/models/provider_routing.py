@@ -0,0 +1,168 @@
+import json
+import logging
+from itertools import chain
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.config import settings, redis_client
+
+logger = logging.getLogger(__name__)
+
+WIRING_TABLES = ("provider_connect", "parkinglot_provider_feature", "feature_event_type")
+GLOBAL_GENERATION_KEY = "provider_routing:generation"
+BUILT_FIELD = "__built__"
+
+
+class ProviderRoutingIndex:
+    """
+    Per lot routing index stored in Redis: event_key -> providers grouped by feature text_key,
+    the same shape ProviderConnect.find_providers_by_event_type_and_lot always returned.
+
+    A lot's index is built with one query on first use and served with a hash lookup afterwards.
+    Commits that touch provider_connect, parkinglot_provider_feature or feature_event_type bump the
+    generation of the affected lots, so the next event rebuilds only those lots. Bulk statements
+    that cannot be traced back to a lot bump the global generation instead.
+    Index keys carry both generations, an index built from a snapshot older than a change is written
+    under a stale key and never read.
+    """
+
+    def __init__(self, ttl: int = None):
+        self.ttl = ttl or settings.PROVIDER_ROUTING_INDEX_TTL_SEC
+
+    @staticmethod
+    def _lot_generation_key(parking_lot_id: int) -> str:
+        return f"provider_routing:generation:{parking_lot_id}"
+
+    def _index_key(self, parking_lot_id: int) -> str:
+        global_generation, lot_generation = redis_client.mget(GLOBAL_GENERATION_KEY,
+                                                              self._lot_generation_key(parking_lot_id))
+        return f"provider_routing:{global_generation or 0}:{lot_generation or 0}:{parking_lot_id}"
+
+    def lookup(self, db: Session, event_key: str, parking_lot_id: int) -> dict:
+        from app.models.provider_connect import ProviderConnect
+
+        try:
+            index_key = self._index_key(parking_lot_id)
+            pipe = redis_client.pipeline()
+            pipe.hget(index_key, event_key)
+            pipe.hexists(index_key, BUILT_FIELD)
+            routing, built = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Provider routing index unavailable: {str(e)}")
+            return ProviderConnect.build_routing(db, parking_lot_id).get(event_key, {})
+
+        if built:
+            return json.loads(routing) if routing else {}
+
+        lot_routing = ProviderConnect.build_routing(db, parking_lot_id)
+        self._store(index_key, lot_routing)
+        return lot_routing.get(event_key, {})
+
+    def _store(self, index_key: str, lot_routing: dict):
+        mapping = {event_key: json.dumps(grouped) for event_key, grouped in lot_routing.items()}
+        mapping[BUILT_FIELD] = "1"
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hset(index_key, mapping=mapping)
+            pipe.expire(index_key, self.ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Provider routing index could not be stored: {str(e)}")
+
+    def invalidate(self, parking_lot_ids=None):
+        """Rebuild the given lots on next use, every lot when no ids are given."""
+        try:
+            if parking_lot_ids is None:
+                redis_client.incr(GLOBAL_GENERATION_KEY)
+                return
+            pipe = redis_client.pipeline()
+            for parking_lot_id in parking_lot_ids:
+                pipe.incr(self._lot_generation_key(parking_lot_id))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Provider routing index could not be invalidated: {str(e)}")
+
+
+provider_routing_index = ProviderRoutingIndex()
+
+
+def _changed_parking_lot_ids(session, instances) -> set:
+    from app.models import base
+
+    parking_lot_ids = set()
+    provider_connect_ids = set()
+    lot_provider_feature_ids = set()
+
+    for instance in instances:
+        if isinstance(instance, base.ProviderConnect):
+            parking_lot_ids.add(instance.connect_id)
+        elif isinstance(instance, base.ParkinglotProviderFeature):
+            provider_connect_ids.add(instance.provider_connect_id)
+        elif isinstance(instance, base.FeatureEventType):
+            lot_provider_feature_ids.add(instance.parkinglot_provider_feature_id)
+
+    # a deleted row is already gone from the table, fall back to the instance in the session
+    for instance in chain(session.deleted, session.identity_map.values()):
+        if isinstance(instance, base.ParkinglotProviderFeature) and instance.id in lot_provider_feature_ids:
+            provider_connect_ids.add(instance.provider_connect_id)
+            lot_provider_feature_ids.discard(instance.id)
+
+    lot_provider_feature_ids.discard(None)
+    if lot_provider_feature_ids:
+        provider_connect_ids.update(session.execute(
+            select(base.ParkinglotProviderFeature.provider_connect_id)
+            .where(base.ParkinglotProviderFeature.id.in_(lot_provider_feature_ids))
+        ).scalars())
+
+    provider_connect_ids.discard(None)
+    if provider_connect_ids:
+        parking_lot_ids.update(session.execute(
+            select(base.ProviderConnect.connect_id).where(base.ProviderConnect.id.in_(provider_connect_ids))
+        ).scalars())
+        for instance in session.deleted:
+            if isinstance(instance, base.ProviderConnect) and instance.id in provider_connect_ids:
+                parking_lot_ids.add(instance.connect_id)
+
+    parking_lot_ids.discard(None)
+    return parking_lot_ids
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_routing_changes(session, flush_context):
+    instances = [
+        instance for instance in chain(session.new, session.dirty, session.deleted)
+        if getattr(instance, "__tablename__", None) in WIRING_TABLES
+    ]
+    if not instances:
+        return
+
+    changes = session.info.setdefault("routing_lots_changed", set())
+    try:
+        changes.update(_changed_parking_lot_ids(session, instances))
+    except Exception as e:
+        logger.warning(f"Provider routing change could not be traced to a lot: {str(e)}")
+        session.info["routing_rebuild_all"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_routing_bulk_changes(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and orm_execute_state.bind_mapper is not None:
+        if orm_execute_state.bind_mapper.class_.__tablename__ in WIRING_TABLES:
+            orm_execute_state.session.info["routing_rebuild_all"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_routing_changes(session):
+    rebuild_all = session.info.pop("routing_rebuild_all", False)
+    parking_lot_ids = session.info.pop("routing_lots_changed", None)
+    if rebuild_all:
+        provider_routing_index.invalidate()
+    elif parking_lot_ids:
+        provider_routing_index.invalidate(parking_lot_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_routing_changes(session):
+    session.info.pop("routing_rebuild_all", None)
+    session.info.pop("routing_lots_changed", None)
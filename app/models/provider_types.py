@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session, relationship
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.utils import enum
+from app.models.catalog_cache import catalog_cache
 
 
 class ProviderTypes(Base):
@@ -20,12 +21,21 @@ class ProviderTypes(Base):
 
     @classmethod
     def get_by_id(cls, db: Session, provider_id: int):
-        return db.query(cls).get(provider_id)
+        return catalog_cache.get(db, cls, provider_id)
 
     @classmethod
     def get_by_text_key(cls, db: Session, text_key: str):
-        provider_type = db.query(ProviderTypes).filter(ProviderTypes.text_key == text_key).one()
-        return provider_type
+        return catalog_cache.find_one(
+            db, cls, ("text_key", text_key),
+            lambda: db.query(cls).filter(cls.text_key == text_key).one()
+        )
+
+    @classmethod
+    def get_by_name_prefix(cls, db: Session, prefix: str):
+        return catalog_cache.find_one(
+            db, cls, ("name_prefix", prefix.lower()),
+            lambda: db.query(cls).filter(cls.name.ilike(f'{prefix}%')).first()
+        )
 
     @classmethod
     def get_all_provider_types(cls, db: Session):
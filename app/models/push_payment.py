@@ -7,8 +7,9 @@ from sqlalchemy import (Column,
                         )
 from app.models.base import Base
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from sqlalchemy import and_, desc, func, text
 from datetime import datetime, timedelta
+from app.models.context_session import commit_or_flush
 
 
 class PushPayment(Base):
@@ -29,7 +30,7 @@ class PushPayment(Base):
     def create(cls, db, schema):
         push_payment = PushPayment(**schema.model_dump())
         db.add(push_payment)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(push_payment)
         return push_payment
 
@@ -55,7 +56,11 @@ class PushPayment(Base):
                       is_in_out: bool = None
                       ):
 
-        filters = [cls.plate_number.ilike(plate_number), cls.provider_id == provider_id]
+        if plate_number is None:
+            return None
+
+        # lower() equality matches idx_push_payment_plate_lookup, ilike cannot use a btree index
+        filters = [func.lower(cls.plate_number) == plate_number.lower(), cls.provider_id == provider_id]
 
         if location_id is not None:
             filters.append(cls.location_id == location_id)
@@ -70,8 +75,11 @@ class PushPayment(Base):
     @classmethod
     def check_payment_by_spot(cls, db: Session, spot_id: str, provider_id: int, location_id: int = None,is_in_out: bool = None):
 
+        if spot_id is None:
+            return None
+
         filters = [
-            cls.spot_id.ilike(spot_id),
+            func.lower(cls.spot_id) == spot_id.lower(),
             cls.provider_id == provider_id
         ]
 
@@ -93,7 +101,7 @@ class PushPayment(Base):
         payment_record = db.query(cls).get(push_payment_id)
         if payment_record:
             payment_record.is_checked = True
-            db.commit()
+            commit_or_flush(db)
 
     @classmethod
     def fetch_arrive_payments(cls, db: Session, location_id: int):
@@ -107,9 +115,35 @@ class PushPayment(Base):
 
         return  result
 
+    @classmethod
+    def archive_checked(cls, db: Session, ended_before: datetime, batch_size: int) -> int:
+        """
+        Moves consumed payments that ended before ended_before to push_payment_archive, batch by batch,
+        and returns how many were moved. Unchecked payments are kept, they may still be matched.
+        """
+        # explicit on both sides, the archive table may not list its columns in the same order
+        columns = ", ".join(column.name for column in cls.__table__.columns)
+        archive_batch = text(f"""
+            WITH moved AS (
+                DELETE FROM push_payment
+                WHERE id IN (
+                    SELECT id FROM push_payment
+                    WHERE is_checked = TRUE AND end_date_time < :ended_before
+                    ORDER BY end_date_time
+                    LIMIT :batch_size
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING {columns}
+            )
+            INSERT INTO push_payment_archive ({columns})
+            SELECT {columns} FROM moved
+        """)
+
+        archived = 0
+        while True:
+            moved = db.execute(archive_batch, {"ended_before": ended_before, "batch_size": batch_size}).rowcount
+            db.commit()
 
-
-
-
-
-
+            archived += moved
+            if moved < batch_size:
+                return archived
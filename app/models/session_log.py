@@ -4,9 +4,12 @@ from sqlalchemy import (Column,
                         JSON,
                         ForeignKey, func, desc, or_, DateTime
                         )
+from collections import defaultdict
+
 from sqlalchemy.orm import Session
 from app.models.base import Base
 from app.schema import SgSessionLog
+from app.models.context_session import commit_or_flush
 
 
 class SessionLog(Base):
@@ -49,11 +52,28 @@ class SessionLog(Base):
         # Create new records for other action types, including "Paid"
         sg_session = cls(**sg_session.model_dump())
         db.add(sg_session)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(sg_session)
 
         return sg_session
 
+    @classmethod
+    def iter_logs_by_session(cls, db: Session, sessions: list, batch_size: int):
+        """
+        Yields (session, logs) in the order of sessions, the logs of each batch of sessions read with
+        one IN query, in the order get_session_logs returns them.
+        """
+        for start in range(0, len(sessions), batch_size):
+            batch = sessions[start:start + batch_size]
+            logs_by_session = defaultdict(list)
+            for log in (db.query(cls)
+                        .filter(cls.session_id.in_([session.id for session in batch]))
+                        .order_by(cls.session_id, cls.id)):
+                logs_by_session[log.session_id].append(log)
+
+            for session in batch:
+                yield session, logs_by_session.get(session.id, [])
+
     @classmethod
     def get_session_logs(cls, db: Session, session_id: int):
         session_logs = db.query(cls).filter(cls.session_id == session_id).order_by(cls.id).all()
@@ -0,0 +1,159 @@
+import logging
+from datetime import datetime
+from itertools import chain
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import Column, Integer, TIMESTAMP, event, func, text
+from sqlalchemy.orm import Session
+
+from app.config import settings, redis_client
+from app.models.base_class import Base
+
+logger = logging.getLogger(__name__)
+
+DIRTY_SESSIONS_KEY = "session_rollup:dirty_sessions"
+DIRTY_LOTS_KEY = "session_rollup:dirty_lots"
+ROLLUP_SOURCE_TABLES = ("sessions", "session_log", "violation")
+
+# recomputes whole buckets from the raw tables, with the filters of an unfiltered audit window
+REFRESH_BUCKETS = text("""
+    INSERT INTO session_stats_hourly (parking_lot_id, bucket_start, total_sessions, active_sessions,
+                                      in_grace_period, violations, created_at, updated_at)
+    SELECT b.parking_lot_id,
+           b.bucket_start,
+           count(s.id) FILTER (WHERE s.has_entry_event),
+           count(s.id) FILTER (WHERE s.has_entry_event AND s.is_active),
+           count(s.id) FILTER (WHERE s.is_waiting_for_payment),
+           coalesce(sum(v.violations), 0),
+           LOCALTIMESTAMP(0),
+           LOCALTIMESTAMP(0)
+    FROM unnest(CAST(:parking_lot_ids AS integer[]), CAST(:bucket_starts AS timestamp[]))
+         AS b(parking_lot_id, bucket_start)
+    LEFT JOIN sessions s
+           ON s.parking_lot_id = b.parking_lot_id
+          AND s.session_start_time >= b.bucket_start
+          AND s.session_start_time < b.bucket_start + INTERVAL '1 hour'
+          AND s.deleted_at IS NULL
+          AND EXISTS (SELECT 1 FROM session_log sl WHERE sl.fk_sessions = s.id)
+    LEFT JOIN LATERAL (SELECT count(*) AS violations FROM violation WHERE violation.session_id = s.id) v ON TRUE
+    GROUP BY b.parking_lot_id, b.bucket_start
+    ON CONFLICT (parking_lot_id, bucket_start) DO UPDATE
+    SET total_sessions = EXCLUDED.total_sessions,
+        active_sessions = EXCLUDED.active_sessions,
+        in_grace_period = EXCLUDED.in_grace_period,
+        violations = EXCLUDED.violations,
+        updated_at = EXCLUDED.updated_at
+""")
+
+
+class SessionStatsHourly(Base):
+    """
+    Audit dashboard counts per lot and hour of session_start_time, see app.service.session_rollup.
+
+    While SESSION_ROLLUP_ENABLED is on, commits that touch sessions, session_log or violation rows
+    record the affected session ids in Redis, the rollup job recomputes the buckets of those sessions
+    from the raw tables. Nothing is recorded while it is off.
+    """
+    parking_lot_id = Column(Integer, primary_key=True)
+    bucket_start = Column(TIMESTAMP, primary_key=True)
+    total_sessions = Column(Integer, nullable=False, default=0)
+    active_sessions = Column(Integer, nullable=False, default=0)
+    in_grace_period = Column(Integer, nullable=False, default=0)
+    violations = Column(Integer, nullable=False, default=0)
+
+    @classmethod
+    def refresh(cls, db: Session, buckets: Iterable[Tuple[int, datetime]]):
+        # a bucket listed twice would be counted twice
+        buckets = list(set(map(tuple, buckets)))
+        if not buckets:
+            return
+        db.execute(REFRESH_BUCKETS, {
+            "parking_lot_ids": [parking_lot_id for parking_lot_id, _ in buckets],
+            "bucket_starts": [bucket_start for _, bucket_start in buckets],
+        })
+        db.commit()
+
+    @classmethod
+    def buckets_of_sessions(cls, db: Session, session_ids: List[int]) -> List[Tuple[int, datetime]]:
+        return db.execute(text("""
+            SELECT DISTINCT parking_lot_id, date_trunc('hour', session_start_time)
+            FROM sessions
+            WHERE id = ANY(:session_ids)
+        """), {"session_ids": session_ids}).all()
+
+    @classmethod
+    def buckets_of_lots(cls, db: Session, parking_lot_ids: List[int]) -> List[Tuple[int, datetime]]:
+        return db.query(cls.parking_lot_id, cls.bucket_start).filter(cls.parking_lot_id.in_(parking_lot_ids)).all()
+
+    @classmethod
+    def buckets_between(cls, db: Session, from_hour: datetime, to_hour: datetime) -> List[Tuple[int, datetime]]:
+        """Every bucket holding sessions that started in [from_hour, to_hour)."""
+        return db.execute(text("""
+            SELECT DISTINCT parking_lot_id, date_trunc('hour', session_start_time)
+            FROM sessions
+            WHERE session_start_time >= :from_hour AND session_start_time < :to_hour
+        """), {"from_hour": from_hour, "to_hour": to_hour}).all()
+
+    @classmethod
+    def sum_range(cls, db: Session, parking_lot_id: int, from_hour: datetime, to_hour: datetime) -> dict:
+        """Counts of the buckets in [from_hour, to_hour)."""
+        row = db.query(
+            func.coalesce(func.sum(cls.total_sessions), 0).label("total_sessions"),
+            func.coalesce(func.sum(cls.active_sessions), 0).label("active_sessions"),
+            func.coalesce(func.sum(cls.in_grace_period), 0).label("in_grace_period"),
+            func.coalesce(func.sum(cls.violations), 0).label("violations"),
+        ).filter(
+            cls.parking_lot_id == parking_lot_id,
+            cls.bucket_start >= from_hour,
+            cls.bucket_start < to_hour,
+        ).one()
+        return {key: int(value) for key, value in row._mapping.items()}
+
+    @staticmethod
+    def mark_lots_dirty(parking_lot_ids: Iterable[int]):
+        """For bulk statements, every existing bucket of the lots is recomputed by the next rollup run."""
+        if not settings.SESSION_ROLLUP_ENABLED:
+            return
+        try:
+            redis_client.sadd(DIRTY_LOTS_KEY, *parking_lot_ids)
+        except Exception as e:
+            logger.warning(f"Session rollup lots could not be marked: {str(e)}")
+
+
+def _changed_session_ids(instances) -> set:
+    session_ids = set()
+    for instance in instances:
+        if instance.__tablename__ == "sessions":
+            session_ids.add(instance.id)
+        else:
+            session_ids.add(instance.session_id)
+    session_ids.discard(None)
+    return session_ids
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_rollup_changes(session, flush_context):
+    # nothing would compact the changes
+    if not settings.SESSION_ROLLUP_ENABLED:
+        return
+    instances = [
+        instance for instance in chain(session.new, session.dirty, session.deleted)
+        if getattr(instance, "__tablename__", None) in ROLLUP_SOURCE_TABLES
+    ]
+    if instances:
+        session.info.setdefault("rollup_sessions_changed", set()).update(_changed_session_ids(instances))
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_rollup_changes(session):
+    session_ids = session.info.pop("rollup_sessions_changed", None)
+    if session_ids:
+        try:
+            redis_client.sadd(DIRTY_SESSIONS_KEY, *session_ids)
+        except Exception as e:
+            logger.warning(f"Session rollup changes could not be marked: {str(e)}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rollup_changes(session):
+    session.info.pop("rollup_sessions_changed", None)
@@ -1,13 +1,14 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime
 from email.policy import default
 from math import ceil
-from typing import cast
+from typing import cast, Tuple
 
 from sqlalchemy import (Column,
                         String,
                         Integer,
                         DateTime,
-                        TIMESTAMP, JSON, Boolean, desc, exists, or_, Float, ARRAY, select
+                        TIMESTAMP, JSON, Boolean, desc, exists, or_, Float, ARRAY, select, Computed, tuple_
                         )
 from sqlalchemy.dialects.postgresql import JSONB
 
@@ -18,6 +19,7 @@ from app.schema import SgSessionAudit
 from sqlalchemy import func, and_, case
 from sqlalchemy.dialects import postgresql
 from app.utils import enum
+from app.models.context_session import commit_or_flush
 
 
 class Sessions(Base):
@@ -39,13 +41,14 @@ class Sessions(Base):
     has_nph_task = Column(Boolean, nullable=False, default=False)
     deleted_at = Column(DateTime, nullable=True)
     is_lpr_to_spot = Column(Boolean, nullable=True)
+    has_entry_event = Column(Boolean, Computed("json_typeof(entry_event) <> 'null'", persisted=True))
 
     @classmethod
     def insert_sg_admin_events(cls, db: Session, sg_event: SgSessionAudit):
 
         session_audit = cls(**sg_event.model_dump())
         db.add(session_audit)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(session_audit)
         return session_audit
 
@@ -96,7 +99,7 @@ class Sessions(Base):
             for key, value in to_update.items():
                 if hasattr(session, key):
                     setattr(session, key, value)
-                    db.commit()
+            commit_or_flush(db)
             return session
         return None
 
@@ -109,9 +112,12 @@ class Sessions(Base):
                                        cls.created_at.between(from_date, to_date),
                                        func.json_typeof(cls.entry_event) != 'null',
                                        subquery).order_by(desc(cls.created_at)).all()
-        violation_counts = db.query(func.count(base.Violation.session_id),
-                                    base.Violation.session_id).group_by(
-            base.Violation.session_id).all()
+        # violations of the window only, not of every session ever recorded
+        violation_counts = (db.query(func.count(base.Violation.session_id), base.Violation.session_id)
+                            .join(cls, base.Violation.session_id == cls.id)
+                            .filter(cls.parking_lot_id == parking_lot_id,
+                                    cls.created_at.between(from_date, to_date))
+                            .group_by(base.Violation.session_id).all())
         violation_dict = {session_id: count for count, session_id in violation_counts}
         compliant_count = db.query(func.count(cls.id)).filter(
             cls.parking_lot_id == parking_lot_id,  # Added parking lot condition
@@ -214,17 +220,23 @@ class Sessions(Base):
 
     @classmethod
     def get_by_date_v3(cls, db: Session, parking_lot_id: int, from_date: datetime, to_date: datetime,
-                       page_number: int, page_size: int, session_type: str, provider: str, plate_number_or_spot: str):
+                       page_number: int, page_size: int, session_type: str, provider: str, plate_number_or_spot: str,
+                       stats: dict = None, after: Tuple[datetime, int] = None, plate_max_distance: int = None):
+        """
+        One page of the audit timeline, newest first. With after, the (session_start_time, id) of the
+        last session already shown, the page starts right after it through the timeline index whatever
+        its depth, otherwise page_number is applied as an offset.
+        """
 
         # Aliases for tables
         sl = aliased(base.SessionLog)
         s = aliased(cls)
         v = aliased(base.Violation)
 
-        plate_spot_filter = or_(
-            s.lpr_number.ilike(f"%{plate_number_or_spot}%"),
-            s.parking_spot_name.ilike(f"%{plate_number_or_spot}%")
-        ) if plate_number_or_spot else True
+        plate_spot_filter = cls.plate_or_spot_filter(s, plate_number_or_spot, plate_max_distance) \
+            if plate_number_or_spot else True
+
+        keyset_filter = tuple_(s.session_start_time, s.id) < tuple_(*after) if after else True
 
         # Create a subquery to first limit the sessions table
         limited_sessions = (
@@ -232,11 +244,11 @@ class Sessions(Base):
             .filter(
                 s.parking_lot_id == parking_lot_id,
                 s.session_start_time.between(from_date, to_date),
-                func.json_typeof(s.entry_event) != "null",
+                s.has_entry_event == True,
                 s.deleted_at.is_(None),
-                plate_spot_filter
+                plate_spot_filter,
+                keyset_filter
             )
-            .order_by(desc(s.session_start_time))
             .subquery()
         )
 
@@ -252,9 +264,9 @@ class Sessions(Base):
                 (db.query(sl.id).filter(sl.session_id == s_limited.id, sl.provider.in_(provider.split(","))).exists() if provider else True),
                 db.query(sl.id).filter(sl.session_id == s_limited.id).exists()
             )
-            .order_by(desc(s_limited.session_start_time))
+            .order_by(desc(s_limited.session_start_time), desc(s_limited.id))
             .limit(page_size)
-            .offset((page_number - 1) * page_size)
+            .offset(0 if after else (page_number - 1) * page_size)
             .subquery()
         )
 
@@ -289,6 +301,7 @@ class Sessions(Base):
             .select_from(s_final)
             .outerjoin(sl, sl.session_id == s_final.id)
             .order_by(desc(s_final.session_start_time),
+                      desc(s_final.id),
                       case((sl.action_type == enum.EventsForSessionLog.exit.value, 1), else_=0),
                       sl.id)
         )
@@ -298,118 +311,165 @@ class Sessions(Base):
 
         session_audit = query2.all()
 
-        # filters for count of records
-        if provider:
-            provider_filter_count = (
-                    exists().where(
-                        and_(
-                            sl.session_id == s.id,
-                            sl.provider.in_(provider.split(","))
-                        )
-                    )
-                )
-        else:
-            provider_filter_count = exists().where(sl.session_id == s.id)
-
-        # Violation filter logic
-        if session_type == "with_alert":
-            violation_filter_count = exists(
-                select(v.session_id).where(v.session_id == s.id).correlate(s)
-            )
-        elif session_type == "without_alert":
-            violation_filter_count = ~exists(
-                select(v.session_id).where(v.session_id == s.id).correlate(s)
-            )
-        else:
-            violation_filter_count = None
-
-        ''' Total violation session '''
-        total_violation_count_query = (
-            db.query(func.count(v.session_id))
-            .join(s, v.session_id == s.id)
-            .filter(
-                s.parking_lot_id == parking_lot_id,
-                s.session_start_time.between(from_date, to_date),
-                s.deleted_at.is_(None),
-                provider_filter_count,
-                plate_spot_filter
-            )
-        )
+        if stats is None:
+            stats = cls.get_audit_stats(db, parking_lot_id, from_date, to_date,
+                                        session_type, provider, plate_number_or_spot, plate_max_distance)
+        total_records = stats["total_sessions"]
+        total_pages = ceil(total_records / page_size)
 
-        if violation_filter_count is not None:
-            total_violation_count_query = total_violation_count_query.filter(violation_filter_count)
-        total_violation_count = total_violation_count_query.scalar()
+        # a full page may be followed by more sessions, resume after its last one
+        next_cursor = None
+        if session_audit and len({row.session_id for row in session_audit}) == page_size:
+            next_cursor = cls.encode_timeline_cursor(session_audit[-1].session_start_time,
+                                                     session_audit[-1].session_id)
 
-        ''' Query to get active session count '''
-        active_session_count_query = (
-            db.query(func.count(s.id))
-            .filter(
-                s.parking_lot_id == parking_lot_id,
-                s.is_active == True,
-                func.json_typeof(s.entry_event) != 'null',
-                s.session_start_time.between(from_date, to_date),
-                s.deleted_at.is_(None),
-                provider_filter_count,
-                plate_spot_filter
-            )
-        )
+        metadata = {
+            "total_records": total_records,
+            "total_pages": total_pages,
+            "current_page": page_number or 1,
+            "page_size": page_size,
+            "next_cursor": next_cursor
+        }
 
-        if violation_filter_count is not None:
-            active_session_count_query = active_session_count_query.filter(violation_filter_count)
-        active_session_count = active_session_count_query.scalar()
+        return session_audit, stats, metadata
 
-        ''' Query to get awaiting payment count '''
-        awaiting_payment_count_query = (
-            db.query(func.count(s.id))
-            .filter(
-                s.parking_lot_id == parking_lot_id,
-                s.is_waiting_for_payment == True,
-                s.session_start_time.between(from_date, to_date),
-                s.deleted_at.is_(None),
-                provider_filter_count,
-                plate_spot_filter
-            )
-        )
 
-        if violation_filter_count is not None:
-            awaiting_payment_count_query = awaiting_payment_count_query.filter(violation_filter_count)
-        awaiting_payment_count = awaiting_payment_count_query.scalar()
+    @staticmethod
+    def plate_or_spot_filter(s, plate_number_or_spot: str, plate_max_distance: int = None):
+        """
+        Partial plate or spot name, answered by the trigram indexes on both columns. With
+        plate_max_distance, plates within that many edits of the text match as well, the same bound
+        DataFilter applies to provider plates.
+        """
+        conditions = [
+            s.lpr_number.ilike(f"%{plate_number_or_spot}%"),
+            s.parking_spot_name.ilike(f"%{plate_number_or_spot}%")
+        ]
+        if plate_max_distance:
+            conditions.append(func.levenshtein_less_equal(func.upper(s.lpr_number), plate_number_or_spot.upper(),
+                                                          plate_max_distance) <= plate_max_distance)
+        return or_(*conditions)
+
+    @staticmethod
+    def encode_timeline_cursor(session_start_time: datetime, session_id: int) -> str:
+        return urlsafe_b64encode(f"{session_start_time.isoformat()}|{session_id}".encode()).decode()
+
+    @staticmethod
+    def decode_timeline_cursor(cursor: str) -> Tuple[datetime, int]:
+        """Raises ValueError when the cursor was not made by encode_timeline_cursor."""
+        try:
+            session_start_time, session_id = urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return datetime.fromisoformat(session_start_time), int(session_id)
+        except ValueError as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
 
+    @classmethod
+    def audit_filters(cls, s, parking_lot_id: int, from_date: datetime, to_date: datetime,
+                      session_type: str, provider: str, plate_number_or_spot: str,
+                      plate_max_distance: int = None) -> list:
+        """Conditions on the sessions alias s selecting the sessions of an audit window."""
+        sl = aliased(base.SessionLog)
+        v = aliased(base.Violation)
 
-        total_records_query = db.query(func.count(s.id)).filter(
+        filters = [
             s.parking_lot_id == parking_lot_id,
-            func.json_typeof(s.entry_event) != 'null',
             s.session_start_time.between(from_date, to_date),
             s.deleted_at.is_(None),
-            provider_filter_count,
-            plate_spot_filter
-        )
-
-        if violation_filter_count is not None:
-            total_records_query = total_records_query.filter(violation_filter_count)
-        total_records = total_records_query.scalar()
-
-        # print(total_records.statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        ]
+        if plate_number_or_spot:
+            filters.append(cls.plate_or_spot_filter(s, plate_number_or_spot, plate_max_distance))
+        if provider:
+            filters.append(exists().where(sl.session_id == s.id, sl.provider.in_(provider.split(","))))
+        else:
+            filters.append(exists().where(sl.session_id == s.id))
+        if session_type == "with_alert":
+            filters.append(exists().where(v.session_id == s.id))
+        elif session_type == "without_alert":
+            filters.append(~exists().where(v.session_id == s.id))
+        return filters
 
-        total_pages = ceil(total_records / page_size)
+    @classmethod
+    def get_audit_stats(cls, db: Session, parking_lot_id: int, from_date: datetime, to_date: datetime,
+                        session_type: str, provider: str, plate_number_or_spot: str,
+                        plate_max_distance: int = None) -> dict:
+        """
+        Dashboard counts of the audit window in one statement: the sessions matching the filters are
+        selected once and every count is a FILTER over them.
+        """
+        s = aliased(cls)
+        v = aliased(base.Violation)
+        filters = cls.audit_filters(s, parking_lot_id, from_date, to_date, session_type, provider,
+                                    plate_number_or_spot, plate_max_distance)
+
+        # violations counts violation rows, not sessions
+        violation_count = select(func.count(v.id)).where(v.session_id == s.id).scalar_subquery()
+        scoped = (
+            select(
+                s.is_active,
+                s.is_waiting_for_payment,
+                s.has_entry_event.label("has_entry"),
+                violation_count.label("violation_count"),
+            )
+            .where(*filters)
+            .cte("scoped_sessions")
+        )
 
-        stats = {
-            "total_sessions": total_records,
-            "active_sessions": active_session_count,
-            "in_grace_period": awaiting_payment_count,
-            "violations": total_violation_count,
-            # "compliant": compliant_count.scalar()
-        }
+        row = db.execute(
+            select(
+                func.count().filter(scoped.c.has_entry).label("total_sessions"),
+                func.count().filter(and_(scoped.c.has_entry, scoped.c.is_active)).label("active_sessions"),
+                func.count().filter(scoped.c.is_waiting_for_payment).label("in_grace_period"),
+                func.coalesce(func.sum(scoped.c.violation_count), 0).label("violations"),
+            )
+        ).one()
 
-        metadata = {
-            "total_records": total_records,
-            "total_pages": total_pages,
-            "current_page": page_number,
-            "page_size": page_size
+        return {
+            "total_sessions": row.total_sessions,
+            "active_sessions": row.active_sessions,
+            "in_grace_period": row.in_grace_period,
+            "violations": int(row.violations),
         }
 
-        return session_audit, stats, metadata
+    @classmethod
+    def iter_audit_timeline(cls, db: Session, parking_lot_id: int, from_date: datetime, to_date: datetime,
+                            session_type: str, provider: str, plate_number_or_spot: str,
+                            plate_max_distance: int = None, yield_per: int = 1000):
+        """
+        Every log row of the sessions of an audit window, in the timeline order of get_by_date_v3, the
+        rows of a session next to each other. Rows are fetched yield_per at a time from a server side
+        cursor, so the caller can stream any window with flat memory.
+        """
+        sl = aliased(base.SessionLog)
+        s = aliased(cls)
+        filters = cls.audit_filters(s, parking_lot_id, from_date, to_date, session_type, provider,
+                                    plate_number_or_spot, plate_max_distance)
 
+        return (
+            db.query(
+                s.id.label("session_id"),
+                s.lpr_number,
+                s.spot_id,
+                s.parking_spot_name,
+                s.lpr_record_id,
+                s.is_active,
+                s.session_start_time,
+                s.session_end_time,
+                s.total_paid_amount,
+                s.is_waiting_for_payment,
+                sl.action_type,
+                sl.description,
+                sl.provider,
+                sl.meta_info,
+                sl.created_at.label("log_created_at"),
+            )
+            .join(sl, sl.session_id == s.id)
+            .filter(s.has_entry_event == True, *filters)
+            .order_by(desc(s.session_start_time),
+                      desc(s.id),
+                      case((sl.action_type == enum.EventsForSessionLog.exit.value, 1), else_=0),
+                      sl.id)
+            .yield_per(yield_per)
+        )
 
     @classmethod
     def get_today_session_with_plate(cls, db: Session, lpr: str, parking_lot_id: int):
@@ -448,7 +508,7 @@ class Sessions(Base):
     @classmethod
     def update_is_waiting_for_payment(cls, db: Session, session):
         session.is_waiting_for_payment = False
-        db.commit()
+        commit_or_flush(db)
 
     @classmethod
     def soft_delete_sessions(cls, db: Session, parking_lot_id, delete_upto_datetime=None):
@@ -460,4 +520,5 @@ class Sessions(Base):
         else:
             db.query(cls).filter(cls.parking_lot_id == parking_lot_id).update(
                 {cls.deleted_at: current_time}, synchronize_session=False)
-        db.commit()
+        commit_or_flush(db)
+        base.SessionStatsHourly.mark_lots_dirty([parking_lot_id])
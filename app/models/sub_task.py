@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 from app import schema
 from app.utils import enum
 import datetime
+from app.models.context_session import commit_or_flush
 
 
 class SubTask(Base):
@@ -28,22 +29,31 @@ class SubTask(Base):
         """Creates a new sub task."""
         sub_task = SubTask(**sub_task_create_schema.model_dump())
         db.add(sub_task)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(sub_task)
         return sub_task
 
+    @classmethod
+    def create_sub_tasks(cls, db: Session, sub_task_create_schemas: List[schema.SubTaskCreateSchema]):
+        """Creates the sub tasks of a task in one batched insert."""
+        sub_tasks = [SubTask(**sub_task_create_schema.model_dump())
+                     for sub_task_create_schema in sub_task_create_schemas]
+        db.add_all(sub_tasks)
+        commit_or_flush(db)
+        return sub_tasks
+
     @classmethod
     def get_sub_task_to_process(cls, db: Session, task_id: int):
         all_sub_task = db.query(cls).filter(and_(cls.task_id == task_id))
         all_sub_task.update({cls.status: enum.SubTaskStatus.IN_PROGRESS.value}, synchronize_session=False)
-        db.commit()
+        commit_or_flush(db)
         return all_sub_task.all()
 
     @classmethod
     def close_sub_task(cls, db: Session, sub_task_id: int):
         db.query(cls).filter(cls.id == sub_task_id).update({cls.status: enum.SubTaskStatus.CLOSED.value},
                                                            synchronize_session=False)
-        db.commit()
+        commit_or_flush(db)
 
     @classmethod
     def close_sub_task_on_paid(cls, db: Session, sub_task_id: int, task_id: int):
@@ -51,7 +61,7 @@ class SubTask(Base):
         sub_tasks.update({cls.status: enum.SubTaskStatus.CLOSED.value}, synchronize_session=False)
         db.query(cls).filter(cls.id == sub_task_id).update({cls.status: enum.SubTaskStatus.COMPLETED.value},
                                                            synchronize_session=False)
-        db.commit()
+        commit_or_flush(db)
 
     @classmethod
     def get_by_id(cls, db: Session, sub_task_id: int):
@@ -79,4 +89,4 @@ class SubTask(Base):
             {cls.deleted_at: current_time}, synchronize_session=False
         )
 
-        db.commit()
\ No newline at end of file
+        commit_or_flush(db)
\ No newline at end of file
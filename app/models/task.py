@@ -1,5 +1,5 @@
 import logging
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import List, Union
 
 from sqlalchemy import (Column,
@@ -9,7 +9,7 @@ from sqlalchemy import (Column,
                         TIMESTAMP,
                         ARRAY,
                         JSON,
-                        or_,
+                        or_, and_,
                         case, update, func, cast,
                         select, asc
                         )
@@ -22,10 +22,17 @@ from app.models.feature import Feature
 from app.config import settings
 from app.utils import enum
 from app.models import base
-from app.models.context_session import get_db_session
+from app.models.context_session import get_db_session, commit_or_flush
 
 logger = logging.getLogger(__name__)
 
+# execution order of the tasks that belong to the same session
+FEATURE_EXECUTION_PRIORITY = {
+    enum.Feature.NOTIFY_SG_ADMIN.value: 1,
+    enum.Feature.RESERVATION_CHECK_LPR.value: 2,
+    enum.Feature.PAYMENT_CHECK_LPR.value: 3,
+}
+
 
 class Task(Base):
     id = Column(Integer, primary_key=True, nullable=False, autoincrement=True)
@@ -43,13 +50,14 @@ class Task(Base):
     session_id = Column(Integer, nullable=True)
     provider_type = Column(Integer, ForeignKey("provider_types.id"), name="fk_provider_type", nullable=False)
     alert_status = Column(String, nullable=True)
+    claimed_at = Column(TIMESTAMP, nullable=True)
 
     @classmethod
     def create_task(cls, db: Session, task_create_schema: schema.TaskCreateSchema):
         """Creates a new task."""
         task = cls(**task_create_schema.model_dump())
         db.add(task)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(task)
 
         if task.event_type == enum.Event.lpr_exit.value:
@@ -86,46 +94,71 @@ class Task(Base):
         return task
 
     @classmethod
-    def get_task_to_execute(cls, db: Session):
-
+    def get_task_to_execute(cls, db: Session, limit: int = None) -> List["Task"]:
+        """
+        Claims due tasks for this worker in a single round-trip and returns exactly the claimed rows.
+
+        UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED) RETURNING * flips the rows to
+        IN_PROGRESS, so tasks locked or claimed by other workers are never returned here. Tasks
+        claimed more than TASK_CLAIM_TIMEOUT_SEC ago and still IN_PROGRESS were left by a worker
+        that died, they are claimed again by the same statement.
+        """
+        stale_claim = func.coalesce(cls.claimed_at, cls.updated_at) < func.now() - timedelta(
+            seconds=settings.TASK_CLAIM_TIMEOUT_SEC)
         # event timestamp is not used in task, so for that reason we are picking up by id
-        tasks = (
-            db.query(Task)
-            .filter(
-                Task.status == enum.TaskStatus.PENDING.value,
-                Task.next_at < datetime.now(timezone.utc)
+        due_task_ids = (
+            select(cls.id)
+            .where(
+                or_(
+                    and_(cls.status == enum.TaskStatus.PENDING.value,
+                         cls.next_at < datetime.now(timezone.utc)),
+                    and_(cls.status == enum.TaskStatus.IN_PROGRESS.value, stale_claim)
+                )
             )
-            .order_by(Task.id)
-            .limit(settings.TASK_PICKING_LIMIT)
+            .order_by(cls.id)
+            .limit(limit or settings.TASK_PICKING_LIMIT)
             .with_for_update(skip_locked=True)
-            .all()
         )
+        claim_stmt = (
+            update(cls)
+            .where(cls.id.in_(due_task_ids))
+            .values(status=enum.TaskStatus.IN_PROGRESS.value, claimed_at=func.now())
+            .returning(cls)
+        )
+        tasks = db.scalars(claim_stmt, execution_options={"populate_existing": True}).all()
 
-        if not tasks:
-            return []
+        # the RETURNING rows are already loaded, keep them on commit instead of re-selecting each task
+        expire_on_commit = db.expire_on_commit
+        db.expire_on_commit = False
+        try:
+            db.commit()
+        finally:
+            db.expire_on_commit = expire_on_commit
 
-        task_ids = [task.id for task in tasks]
+        return cls.order_by_execution_priority(tasks)
 
-        db.query(Task).filter(Task.id.in_(task_ids)).update(
-            {Task.status: enum.TaskStatus.IN_PROGRESS.value},
-            synchronize_session=False
+    @classmethod
+    def release_tasks(cls, db: Session, task_ids: List[int], next_at: datetime):
+        """Puts claimed tasks that are still IN_PROGRESS back to PENDING, due again at next_at."""
+        db.execute(
+            update(cls)
+            .where(cls.id.in_(task_ids), cls.status == enum.TaskStatus.IN_PROGRESS.value)
+            .values(status=enum.TaskStatus.PENDING.value, next_at=next_at, claimed_at=None)
         )
         db.commit()
-        return Task.get_in_progress_task(db)
 
-    @classmethod
-    def get_in_progress_task(cls, db: Session):
-        query = db.query(Task).filter(
-            Task.status == enum.TaskStatus.IN_PROGRESS.value,
-            Task.next_at < datetime.utcnow()
-        ).order_by(
-            Task.session_id,  # Group by session ID
-            case((Task.feature_text_key == enum.Feature.NOTIFY_SG_ADMIN.value, 1),
-                 (Task.feature_text_key == enum.Feature.RESERVATION_CHECK_LPR.value, 2),
-                 (Task.feature_text_key == enum.Feature.PAYMENT_CHECK_LPR.value, 3),
-                 else_=4), asc(base.Task.id)
-        ).limit(settings.TASK_PICKING_LIMIT)
-        return query
+    @staticmethod
+    def order_by_execution_priority(tasks: List["Task"]) -> List["Task"]:
+        """Groups tasks by session and runs notify -> reservation -> payment inside a session."""
+        return sorted(
+            tasks,
+            key=lambda task: (
+                task.session_id is None,  # NULL session ids last, as in ORDER BY session_id
+                task.session_id or 0,
+                FEATURE_EXECUTION_PRIORITY.get(task.feature_text_key, 4),
+                task.id
+            )
+        )
 
     @classmethod
     def get_feature_url(cls, db: Session, task_id: int):
@@ -147,7 +180,7 @@ class Task(Base):
             synchronize_session=False
         )
 
-        db.commit()
+        commit_or_flush(db)
 
     @classmethod
     def close_task_with_plate_number(cls, db: Session, lot_id: int,
@@ -198,7 +231,7 @@ class Task(Base):
                     cls.feature_text_key != enum.Feature.ENFORCEMENT_NOTIFICATION.value
                 ).update({cls.status: enum.TaskStatus.CLOSED.value})
         task.status = enum.TaskStatus.CLOSED.value
-        db.commit()
+        commit_or_flush(db)
 
     @classmethod
     def get_task_car_exit(cls, db: Session, plate_number, parking_lot_id):
@@ -243,7 +276,7 @@ class Task(Base):
 
         result = db.execute(update_stmt)
         task_ids = [row.id for row in result]
-        db.commit()
+        commit_or_flush(db)
         logger.info(f" closed task IDs: {task_ids}")
         return task_ids
 
@@ -281,6 +314,7 @@ class Task(Base):
 
     @classmethod
     def validate_secondary_lprs(cls, plate_numbers, parking_lot_id):
+        # thread-scoped session, reuses the connection of the task being processed
         db = get_db_session()
 
         return db.query(cls).filter(
@@ -295,7 +329,7 @@ class Task(Base):
         try:
             task.sgadmin_alerts_ids = alert_ids  # Directly modify the instance's attribute
 
-            db.commit()  # Commit the transaction
+            commit_or_flush(db)  # Commit the transaction
             return task  # Optionally return the updated task
         except Exception as e:
             db.rollback()  # Rollback the session in case of error
@@ -339,7 +373,7 @@ class Task(Base):
     @classmethod
     def update_alert_status(cls, db, opened_violation_task, status):
         opened_violation_task.alert_status = status
-        db.commit()
+        commit_or_flush(db)
 
     @classmethod
     def update_task_by_session_id(cls, db, session_id: int, spot_id: int, parking_spot_name: str):
@@ -355,7 +389,7 @@ class Task(Base):
             },
             synchronize_session=False
         ))
-        db.commit()  # Commit the changes to the database
+        commit_or_flush(db)  # Commit the changes to the database
         if update_spot_id:
 
             return update_spot_id
@@ -385,7 +419,7 @@ class Task(Base):
 
         # Execute the statement and commit the changes
         db.execute(stmt)
-        db.commit()
+        commit_or_flush(db)
 
     @classmethod
     def fetch_spot_details_by_session_id(cls, db, session_id: int):
@@ -417,7 +451,7 @@ class Task(Base):
                 task_ids=[enforcement_task.id]
             )
 
-            db.commit()
+            commit_or_flush(db)
 
         return enforcement_task
 
@@ -9,6 +9,7 @@ from typing import Optional
 from sqlalchemy.orm import Session
 from app import schema
 from app.utils.security import get_hashed_oauth_client_secret
+from app.models.context_session import commit_or_flush
 
 
 class User(Base):
@@ -32,7 +33,7 @@ class User(Base):
                       client_secret=get_hashed_oauth_client_secret(client_secret),
                       )
         db.add(client)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(client)
 
         return client
@@ -11,6 +11,7 @@ from sqlalchemy.orm import Session
 from app import schema
 from app.utils import enum
 from sqlalchemy import select
+from app.models.context_session import commit_or_flush
 
 
 class Violation(base.Base):
@@ -38,7 +39,7 @@ class Violation(base.Base):
 
         violation = Violation(**violation_details.model_dump())
         db.add(violation)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(violation)
         return violation
 
@@ -54,7 +55,7 @@ class Violation(base.Base):
         if update_violation is not None:
             update_violation.amount_due = update_violation.amount_due + 10
             db.add(update_violation)
-            db.commit()
+            commit_or_flush(db)
             db.refresh(update_violation)
             return update_violation
         return None
@@ -64,7 +65,7 @@ class Violation(base.Base):
         update_status = db.query(cls).get(violation_id)
         update_status.status = status
         db.add(update_status)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(update_status)
         return update_status
 
@@ -74,7 +75,7 @@ class Violation(base.Base):
         if update_status:
             update_status.session = session_status
             db.add(update_status)
-            db.commit()
+            commit_or_flush(db)
             db.refresh(update_status)
         return update_status
 
@@ -85,7 +86,7 @@ class Violation(base.Base):
         if update_status:
             update_status.session = session_status
             db.add(update_status)
-            db.commit()
+            commit_or_flush(db)
             db.refresh(update_status)
         return update_status
 
@@ -97,7 +98,7 @@ class Violation(base.Base):
                 for key, value in to_update.items():
                     if hasattr(session, key):
                         setattr(session, key, value)
-                db.commit()
+                commit_or_flush(db)
                 return session
             except Exception as e:
                 db.rollback()
@@ -128,7 +129,7 @@ class Violation(base.Base):
                 for key, value in to_update.items():
                     if hasattr(session, key):
                         setattr(session, key, value)
-                db.commit()
+                commit_or_flush(db)
                 return session
             except Exception as e:
                 db.rollback()
@@ -145,7 +146,7 @@ class Violation(base.Base):
                 for key, value in to_update.items():
                     if hasattr(session, key):
                         setattr(session, key, value)
-                db.commit()
+                commit_or_flush(db)
                 return session
             except Exception as e:
                 db.rollback()
@@ -7,6 +7,7 @@ from app.models.base import Base
 from sqlalchemy.orm import Session
 
 from app import schema
+from app.models.context_session import commit_or_flush
 
 
 class ViolationConfiguration(Base):
@@ -32,14 +33,14 @@ class ViolationConfiguration(Base):
             # Update existing record
             for key, value in request.model_dump().items():
                 setattr(existing_vc, key, value)
-            db.commit()
+            commit_or_flush(db)
             db.refresh(existing_vc)
             return existing_vc
         else:
             # Create a new record
             new_vc = cls(**request.model_dump())
             db.add(new_vc)
-            db.commit()
+            commit_or_flush(db)
             db.refresh(new_vc)
             return new_vc
 
@@ -47,6 +48,6 @@ class ViolationConfiguration(Base):
     def create(cls, db, violation_configuration_schema: schema.ViolationConfigurationSchema):
         violation_configuration = cls(**violation_configuration_schema.model_dump())
         db.add(violation_configuration)
-        db.commit()
+        commit_or_flush(db)
         db.refresh(violation_configuration)
         return violation_configuration
\ No newline at end of file
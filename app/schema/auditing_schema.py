@@ -51,6 +51,7 @@ class Metadata(BaseModel):
     total_pages: int
     current_page: int
     page_size: int
+    next_cursor: Optional[str] = None
 
 
 class AuditingSchema(BaseModel):
@@ -0,0 +1,37 @@
+"""
+Fills session_stats_hourly from the raw sessions, see app.service.session_rollup.
+
+Run it right after SESSION_ROLLUP_ENABLED is turned on, from /workspace:
+    python -m app.scripts.rebuild_session_rollup --since 2024-01-01 [--until 2024-06-01]
+
+Buckets are recomputed a day at a time and the run can be repeated, e.g. after a failure.
+"""
+import argparse
+import logging
+
+from dateutil import parser as date_parser
+
+from app.config import settings
+from app.models.context_session import get_db_session, remove_db_session
+from app.service.session_rollup import SessionRollup
+
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL,
+                        format="%(asctime)s : %(levelname).4s - %(message)s - [%(name)s]")
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--since", required=True, type=date_parser.parse,
+                            help="first hour to rebuild, UTC unless an offset is given")
+    arg_parser.add_argument("--until", type=date_parser.parse, help="end of the rebuild, now by default")
+    args = arg_parser.parse_args()
+
+    if not settings.SESSION_ROLLUP_ENABLED:
+        logger.warning("SESSION_ROLLUP_ENABLED is off, changes made after this run will not be compacted.")
+
+    db_session = get_db_session()
+    try:
+        SessionRollup.rebuild(db_session, args.since, args.until)
+    finally:
+        remove_db_session()
@@ -1,6 +1,6 @@
 import logging
 import os
-import requests
+from app.utils.http_client import http_client
 
 from app.schema import session_schema
 from app.schema.alert_schema import AlertCreateSchema
@@ -9,6 +9,7 @@ from app.utils.image_utils import ImageUtils
 from app.config import settings
 from app.utils import enum
 from app.utils.common import car_identification_log
+from app.models.context_session import commit_or_flush
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +27,7 @@ class AlertSgadmin:
         }
         response = None
         try:
-            response = requests.post(
+            response = http_client.post(
                 os.getenv("SPOT_GENIUS_API_BASE_URL") + "/api/external/v1/create_alert",
                 json=create_alert_schema.model_dump(),
                 headers=headers,
@@ -48,7 +49,7 @@ class AlertSgadmin:
             "Content-Type": "application/json",
         }
 
-        response = requests.get(
+        response = http_client.get(
             os.getenv("SPOT_GENIUS_API_BASE_URL") + f"/api/external/v1/get_alert/{alert_id}",
             headers=headers,
         )
@@ -64,7 +65,7 @@ class AlertSgadmin:
         response = None
 
         try:
-            response = requests.put(
+            response = http_client.put(
                 os.getenv("SPOT_GENIUS_API_BASE_URL") + f"/api/external/v1/update_alert",
                 json=alert_update_schema.model_dump(),
                 headers=headers,
@@ -127,7 +128,7 @@ class AlertSgadmin:
             else:
                 sg_admin_alert_list.append(sg_admin_alert['id'])
                 task.sgadmin_alerts_ids = sg_admin_alert_list
-                db.commit()
+                commit_or_flush(db)
                 db.refresh(task)
 
         return sg_admin_alert_list
@@ -1,8 +1,8 @@
 import logging
 from app.utils.schema_mapping import SchemaMapping
 from app.utils.request_handler import RequestHandler
+from app.utils.http_client import http_client
 from app.utils.security import encrypt_value
-import requests
 
 logger = logging.getLogger(__name__)
 
@@ -20,8 +20,8 @@ class JCookie:
         request_output_schema = SchemaMapping.replace_json_placeholder_with_mapped_pointers(provider.meta_data,
                                                                                             model_data)
         request_data = RequestHandler.make_request_data(request_output_schema)
-        response = requests.request(method=request_data['method'], url=request_data['url'], data=request_data['body'],
-                                    headers=request_data['headers'])
+        response = http_client.request(method=request_data['method'], url=request_data['url'],
+                                       data=request_data['body'], headers=request_data['headers'])
 
         if response.status_code == 200:
             if response.cookies:
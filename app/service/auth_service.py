@@ -7,6 +7,7 @@ from app.models import base
 from app.models.provider_creds import ProviderCreds
 from app.utils import enum
 from app.utils.common import format_body
+from app.utils.http_client import http_client
 from app.utils.schema_mapping import SchemaMapping
 from app.utils.security import create_jwt_token
 from datetime import datetime, timedelta
@@ -42,7 +43,7 @@ class AuthService:
             "client_id": provider_obj.client_id,
             "client_secret": provider_obj.client_secret
         }
-        response = requests.post(provider_obj.oauth_path, json=body)
+        response = http_client.post(provider_obj.oauth_path, json=body)
         return response
 
     @staticmethod
@@ -159,7 +160,7 @@ class AuthService:
         logger.debug(f'Requesting URL {url} with body {formatted_body}')
 
         try:
-            response = requests.post(url, json=formatted_body)  # Use `json=pointers` for a JSON body
+            response = http_client.post(url, json=formatted_body)  # Use `json=pointers` for a JSON body
             response.raise_for_status()  # Raises HTTPError for bad responses
 
             logger.debug(f'Response from URL {url}: {response.text}')
@@ -188,7 +189,7 @@ class AuthService:
         logger.debug(f'Requesting URL {url} with body {mapped_body}')
 
         try:
-            response = requests.post(url, data=mapped_body)
+            response = http_client.post(url, data=mapped_body)
             response.raise_for_status()
             logger.debug(f'Response from URL {url}: {response.text}')
             response_data = response.json()
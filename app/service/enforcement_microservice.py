@@ -1,7 +1,7 @@
 import logging
 import time
 
-import requests
+from app.utils.http_client import http_client
 from app.config import settings
 from app.schema.citation_schema import EnforcementServiceSchema
 from app.service.auth_service import decrypt_encrypted_value
@@ -47,7 +47,7 @@ class EnforcementMicroService:
                     f"Request Body: {schema}"
                 )
 
-                enforcement_response = requests.post(
+                enforcement_response = http_client.post(
                     url=f'{api_request_endpoint}/api/v1/connect/violation/sg-connect',
                     headers=headers,
                     data=schema.json(),
@@ -0,0 +1,285 @@
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+import zlib
+
+from opentelemetry import metrics
+from sqlalchemy.exc import InterfaceError, OperationalError
+from redis.exceptions import RedisError
+
+from app import schema
+from app.config import settings, redis_client
+from app.models.context_session import get_db_session, remove_db_session, unit_of_work
+from app.utils import enum
+from app.utils.common import DateTimeUtils
+from app.utils.slack_utils import send_slack_notification
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = "sg_events:{partition}"
+DEAD_LETTER_KEY = "sg_events:dead"
+LEASE_KEY = "sg_events:lease:{partition}"
+QUEUE_DEPTH_ALERT_KEY = "sg_events:queue_depth_alert"
+CONSUMER_GROUP = "sg_event_consumers"
+LEASE_TTL_SEC = 30
+# extends the lease only while this owner still holds it
+RENEW_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+# lost connections and Redis outages, anything else fails the same way when retried
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, RedisError)
+
+
+class EventIngest:
+    """
+    Durable inbox for SG-Admin events, backed by one Redis stream per partition.
+
+    Events are partitioned by parking lot, and every partition is applied by a single consumer
+    thread, so events of one lot (and therefore of one plate or spot) are applied in the order
+    they were received. Streams are never trimmed, an entry is deleted once it is acknowledged,
+    so the stream length is the backlog.
+    """
+
+    @staticmethod
+    def parse(data: dict) -> schema.SgAnprEventSchema:
+        """Validates an SG-Admin payload, raises on anything the event chain cannot handle."""
+        if data.get('event_key') == enum.Event.parking_spot_updates.value:
+            sg_event_schema = schema.SgAnprEventSchema(**data)
+        else:
+            data.update(event_key=enum.Event[data.get('event_key')].value)
+            sg_event_schema = schema.SgAnprEventSchema(**data)
+
+        # Convert date time format for Plate Recognizer camera
+        sg_event_schema.entry_time = DateTimeUtils.parse_datetime_and_convert(sg_event_schema.entry_time, "%Y-%m-%dT%H:%M:%S")
+        sg_event_schema.exit_time = DateTimeUtils.parse_datetime_and_convert(sg_event_schema.exit_time, "%Y-%m-%dT%H:%M:%S")
+        sg_event_schema.timestamp = DateTimeUtils.parse_datetime_and_convert(sg_event_schema.timestamp, "%Y-%m-%dT%H:%M:%S")
+        return sg_event_schema
+
+    @staticmethod
+    def partition_for(parking_lot_id) -> int:
+        return zlib.crc32(str(parking_lot_id).encode()) % settings.SG_EVENT_PARTITIONS
+
+    @staticmethod
+    def enqueue(data: dict, parking_lot_id) -> str:
+        return EventIngest.enqueue_many([(data, parking_lot_id)])[0]
+
+    @staticmethod
+    def enqueue_many(events: list) -> list:
+        """Appends (payload, parking_lot_id) pairs in one round trip, keeping their order per lot."""
+        pipe = redis_client.pipeline()
+        for data, parking_lot_id in events:
+            stream = STREAM_KEY.format(partition=EventIngest.partition_for(parking_lot_id))
+            pipe.xadd(stream, {"payload": json.dumps(data, default=str)})
+        return pipe.execute()
+
+    @staticmethod
+    def queue_depth() -> int:
+        pipe = redis_client.pipeline()
+        for partition in range(settings.SG_EVENT_PARTITIONS):
+            pipe.xlen(STREAM_KEY.format(partition=partition))
+        return sum(pipe.execute())
+
+    @staticmethod
+    def alert_queue_depth(depth: int):
+        """Sends a Slack alert while the backlog is above SG_EVENT_QUEUE_DEPTH_ALERT, repeats are suppressed."""
+        if depth < settings.SG_EVENT_QUEUE_DEPTH_ALERT:
+            redis_client.delete(QUEUE_DEPTH_ALERT_KEY)
+            return
+
+        alert_count = redis_client.incr(QUEUE_DEPTH_ALERT_KEY)
+        if alert_count == 1:
+            redis_client.expire(QUEUE_DEPTH_ALERT_KEY, settings.SLACK_ALERT_EXPIRY)
+        if alert_count <= settings.SLACK_ALERT_LIMIT:
+            send_slack_notification("🚨 SG Event Queue Alert",
+                                    f"{depth} SG-Admin events are waiting to be applied. "
+                                    f"Check that the event consumers are running and keeping up.")
+        else:
+            logger.warning(f"SG event queue alert already sent {alert_count} times. Suppressing.")
+
+
+def _observe_queue_depth(options):
+    try:
+        yield metrics.Observation(EventIngest.queue_depth())
+    except RedisError as e:
+        logger.warning(f"SG event queue depth unavailable: {str(e)}")
+
+
+renew_lease = redis_client.register_script(RENEW_LEASE)
+
+_meter = metrics.get_meter(__name__)
+_meter.create_observable_gauge("sg_events.queue_depth", callbacks=[_observe_queue_depth],
+                               description="SG-Admin events received but not applied yet")
+
+
+class EventConsumer:
+    """
+    Applies queued SG-Admin events, one thread per partition.
+
+    A partition is leased in Redis before it is consumed, so when several consumer processes run
+    only one of them applies a given partition. The lease is renewed before every event and the
+    partition is left as soon as a renewal fails. Every process reads as its own group consumer,
+    entries left pending by a process that is gone are claimed once they have been idle for the
+    lease TTL, and nothing new is read while older entries are pending. An event that fails with a transient error is
+    retried in place, which holds back the rest of its partition, until it has been delivered
+    SG_EVENT_MAX_DELIVERIES times. It is then moved to the sg_events:dead stream, as is an event
+    that fails with any other error.
+    """
+
+    def __init__(self, block_ms: int = None):
+        self.block_ms = block_ms or settings.SG_EVENT_CONSUMER_BLOCK_MS
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for partition in range(settings.SG_EVENT_PARTITIONS):
+            thread = threading.Thread(target=self._partition_loop, args=(partition,),
+                                      name=f"sg-event-consumer-{partition}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"SG event consumer started for {settings.SG_EVENT_PARTITIONS} partitions.")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+        logger.info("SG event consumer stopped.")
+
+    def run_forever(self):
+        signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        signal.signal(signal.SIGINT, lambda *_: self.stop())
+        self.start()
+        while not self._stop_event.is_set():
+            self._stop_event.wait(LEASE_TTL_SEC / 3)
+            try:
+                EventIngest.alert_queue_depth(EventIngest.queue_depth())
+            except Exception as e:
+                logger.warning(f"SG event queue depth not checked: {str(e)}")
+        self.join()
+
+    def _acquire_lease(self, partition: int) -> bool:
+        if redis_client.set(LEASE_KEY.format(partition=partition), self.owner, nx=True, ex=LEASE_TTL_SEC):
+            return True
+        return self._renew_lease(partition)
+
+    def _renew_lease(self, partition: int) -> bool:
+        return bool(renew_lease(keys=[LEASE_KEY.format(partition=partition)], args=[self.owner, LEASE_TTL_SEC]))
+
+    def _partition_loop(self, partition: int):
+        stream = STREAM_KEY.format(partition=partition)
+        consumer = self.owner
+        leased = False
+
+        while not self._stop_event.is_set():
+            try:
+                if not self._acquire_lease(partition):
+                    leased = False
+                    self._stop_event.wait(LEASE_TTL_SEC / 3)
+                    continue
+                if not leased:
+                    try:
+                        redis_client.xgroup_create(stream, CONSUMER_GROUP, id="0", mkstream=True)
+                    except RedisError as e:
+                        if "BUSYGROUP" not in str(e):
+                            raise
+                    self._prune_consumers(stream, consumer)
+                    leased = True
+
+                for message_id, fields in self._read(stream, consumer):
+                    if self._stop_event.is_set():
+                        return
+                    if not self._renew_lease(partition):
+                        logger.warning(f"Partition {partition}: lease lost, leaving the partition.")
+                        leased = False
+                        break
+                    # deleted from the stream while still pending
+                    if fields:
+                        self._handle(stream, consumer, partition, message_id, fields)
+                    redis_client.xack(stream, CONSUMER_GROUP, message_id)
+                    redis_client.xdel(stream, message_id)
+            except TRANSIENT_ERRORS as e:
+                logger.error(f"Partition {partition}: event not applied, retrying: {str(e)}")
+                self._stop_event.wait(1)
+
+    def _read(self, stream: str, consumer: str) -> list:
+        # entries of this consumer first, they were delivered before a failed apply
+        entries = redis_client.xreadgroup(CONSUMER_GROUP, consumer, {stream: "0"}, count=10)
+        if entries and entries[0][1]:
+            return entries[0][1]
+
+        # then entries left by a consumer that is gone, e.g. a restarted process
+        claimed = redis_client.xautoclaim(stream, CONSUMER_GROUP, consumer, LEASE_TTL_SEC * 1000, count=10)[1]
+        if claimed:
+            return claimed
+
+        # entries a previous lease holder may still be applying come before anything new
+        if redis_client.xpending(stream, CONSUMER_GROUP)["pending"]:
+            self._stop_event.wait(1)
+            return []
+
+        entries = redis_client.xreadgroup(CONSUMER_GROUP, consumer, {stream: ">"}, count=10, block=self.block_ms)
+        return entries[0][1] if entries else []
+
+    @staticmethod
+    def _prune_consumers(stream: str, consumer: str):
+        """Deletes the consumers of previous processes once nothing is pending for them."""
+        for info in redis_client.xinfo_consumers(stream, CONSUMER_GROUP):
+            if info["name"] != consumer and not info["pending"]:
+                redis_client.xgroup_delconsumer(stream, CONSUMER_GROUP, info["name"])
+
+    def _handle(self, stream: str, consumer: str, partition: int, message_id: str, fields: dict):
+        deliveries = self._deliveries(stream, message_id)
+        if deliveries > settings.SG_EVENT_MAX_DELIVERIES:
+            self._dead_letter(partition, message_id, fields, f"not applied after {deliveries - 1} deliveries")
+            return
+        try:
+            self._apply(fields)
+        except TRANSIENT_ERRORS:
+            # claiming the entry again counts the failed attempt in its delivery count
+            redis_client.xclaim(stream, CONSUMER_GROUP, consumer, 0, [message_id])
+            raise
+        except Exception as e:
+            self._dead_letter(partition, message_id, fields, str(e))
+
+    @staticmethod
+    def _deliveries(stream: str, message_id: str) -> int:
+        pending = redis_client.xpending_range(stream, CONSUMER_GROUP, min=message_id, max=message_id, count=1)
+        return pending[0]["times_delivered"] if pending else 1
+
+    @staticmethod
+    def _dead_letter(partition: int, message_id: str, fields: dict, error: str):
+        logger.critical(f"Partition {partition}: event {message_id} moved to {DEAD_LETTER_KEY}: {error}")
+        redis_client.xadd(DEAD_LETTER_KEY, {**fields, "partition": partition, "message_id": message_id,
+                                            "error": error})
+
+    @staticmethod
+    def _apply(fields: dict):
+        from app.service.session_manager import SessionManager
+
+        db = get_db_session()
+        try:
+            sg_event_schema = EventIngest.parse(json.loads(fields["payload"]))
+            prefetched = SessionManager.prefetch_event_lookups(db, sg_event_schema)
+            with unit_of_work(db):
+                response_message = SessionManager.handle_session_event(db, sg_event_schema, prefetched)
+            logger.debug(f"Event execute response: {response_message}")
+        finally:
+            remove_db_session()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL,
+                        format="%(asctime)s : %(levelname).4s - %(message)s - [%(name)s]")
+    if not settings.SG_EVENT_INGEST_ASYNC:
+        # /v1/subscribe/sg applies events inline
+        logger.info("SG event consumer disabled, SG_EVENT_INGEST_ASYNC is off.")
+    else:
+        EventConsumer().run_forever()
@@ -1,5 +1,8 @@
+import copy
 import json
 import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime, timedelta
 from collections import defaultdict
 from typing import Optional
@@ -8,6 +11,7 @@ from sqlalchemy.orm import Session
 from app.models.base import ProviderConnect
 from app.models.base import ConnectParkinglot
 from app.models import base
+from app.models.context_session import unit_of_work, commit_or_flush, after_commit
 from app.schema import TaskSchema, TaskCreateSchema
 from app import schema
 from app.utils import enum
@@ -15,6 +19,9 @@ from sqlalchemy import case, or_
 
 logger = logging.getLogger(__name__)
 
+# per lot payment window and routing shared by the events of one batch, see EventService.batch_scope
+batch_lot_cache: ContextVar[Optional[dict]] = ContextVar("batch_lot_cache", default=None)
+
 
 def custom_encoder(obj):
     if isinstance(obj, datetime):
@@ -27,6 +34,14 @@ class EventService:
 
     @staticmethod
     def execute_event(events, db: Session, timestamp: Optional[datetime] = None):
+        """
+        Creates the tasks, sub tasks and session logs of the events in one transaction.
+        """
+        with unit_of_work(db):
+            return EventService.create_event_tasks(events, db, timestamp)
+
+    @staticmethod
+    def create_event_tasks(events, db: Session, timestamp: Optional[datetime] = None):
         """
         function to create new event instances populating the details received via API request data
         """
@@ -49,12 +64,10 @@ class EventService:
             if parking_connect_obj:
                 result_dict = {'task': []}
 
-                from app.utils.parking_window import ParkingWindow
-                payment_window = ParkingWindow.check_payment_window(parking_connect_obj)
+                payment_window = EventService.payment_window_for_lot(parking_connect_obj)
 
                 for event in events:
-                    providers_connects = ProviderConnect.find_providers_by_event_type_and_lot(db, event,
-                                                                                              parking_connect_obj.id)
+                    providers_connects = EventService.providers_for_event(db, event, parking_connect_obj.id)
 
 
                     if not providers_connects and event.event_key not in enum.SpotLprEventsMapping.EXIT.value:
@@ -75,8 +88,7 @@ class EventService:
 
                     for feature_key, providers in providers_connects.items():
                         split_feature = feature_key.split('.')[0].strip()
-                        get_provider_type = db.query(base.ProviderTypes).filter(base.ProviderTypes.name.ilike(
-                            f'{split_feature}%')).first()
+                        get_provider_type = base.ProviderTypes.get_by_name_prefix(db, split_feature)
 
                         json_data = json.dumps(event.__dict__, default=custom_encoder)
                         sg_event_response_data = json.loads(json_data)
@@ -176,6 +188,38 @@ class EventService:
 
         return response_message
 
+    @staticmethod
+    @contextmanager
+    def batch_scope():
+        """Within the block, every lot's payment window and event routing are resolved once."""
+        token = batch_lot_cache.set({})
+        try:
+            yield
+        finally:
+            batch_lot_cache.reset(token)
+
+    @staticmethod
+    def payment_window_for_lot(parking_connect_obj):
+        from app.utils.parking_window import ParkingWindow
+
+        cache = batch_lot_cache.get()
+        if cache is None:
+            return ParkingWindow.check_payment_window(parking_connect_obj)
+        key = ("payment_window", parking_connect_obj.id)
+        if key not in cache:
+            cache[key] = ParkingWindow.check_payment_window(parking_connect_obj)
+        return copy.deepcopy(cache[key])
+
+    @staticmethod
+    def providers_for_event(db, event, connect_parking_lot_id):
+        cache = batch_lot_cache.get()
+        if cache is None:
+            return ProviderConnect.find_providers_by_event_type_and_lot(db, event, connect_parking_lot_id)
+        key = ("providers", connect_parking_lot_id, event.event_key)
+        if key not in cache:
+            cache[key] = ProviderConnect.find_providers_by_event_type_and_lot(db, event, connect_parking_lot_id)
+        return copy.deepcopy(cache[key])
+
     @staticmethod
     def handle_unavailable_provider_exit(db, event, reason, description):
         success_events = []
@@ -238,7 +282,7 @@ class EventService:
     def close_alert(db, task, reason):
         from app.service.session_manager import SessionManager
 
-        provider_type = db.query(base.ProviderTypes).filter(base.ProviderTypes.text_key == enum.ProviderTypes.PROVIDER_VIOLATION.value).first()
+        provider_type = base.ProviderTypes.get_by_text_key(db, enum.ProviderTypes.PROVIDER_VIOLATION.value)
         opened_violation_task = db.query(base.Task).filter(
             base.Task.session_id == task.session_id,
             or_(base.Task.alert_status != enum.ViolationStatus.CLOSED.value, base.Task.alert_status.is_(None)),
@@ -258,7 +302,8 @@ class EventService:
                                                                        inactive_reason=reason)
                         from app.service.alert_service import AlertSgadmin
 
-                        AlertSgadmin.update_alert(alert_update_schema)
+                        # SG-Admin is told once the closing is committed
+                        after_commit(db, AlertSgadmin.update_alert, alert_update_schema)
 
                         action_type = enum.EventsForSessionLog.PAYMENT_ALERT_CLOSED.value
                         if violation_task.event_type == enum.EventTypes.OVERSTAY_VIOLATION.value:
@@ -335,4 +380,4 @@ class EventService:
             if check_for_inactivation_feature:
                 EventService.execute_event_for_inactivation_task(db, task)
 
-            db.commit()
+            commit_or_flush(db)
@@ -1,9 +1,13 @@
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Any
+from app.config import settings
+from app.models.context_session import get_db_session, remove_db_session
 from app.models.provider_creds import ProviderCreds
 from app.utils import enum
 from app.wrapper.process_request import ProcessRequest
-from app.utils.response_handler import ResponseHandler
+from app.utils.response_extractor import ResponseExtractor
 from app.schema.response_integration_schema import ResponseIntegrationSchema
 from app.service.payment_service import PaymentService
 from app.models.base import (FeatureUrlPath, Violation,
@@ -19,9 +23,36 @@ from datetime import datetime, timedelta
 from app.models import base
 from app.utils.sg_admin_apis import SGAdminApis
 from app.service.payment_microservice import PaymentMicroService
+from app.service.payment_snapshot import PaymentSnapshot
 
 logger = logging.getLogger(__name__)
 
+# separate from the task executor, a task thread waits on these lookups
+provider_lookup_executor = ThreadPoolExecutor(max_workers=settings.PROVIDER_LOOKUP_WORKERS,
+                                              thread_name_prefix="provider-lookup")
+
+
+class ProviderLookup(NamedTuple):
+    sub_task: Any
+    feature: Any
+    provider_creds: Any
+    provider: Any
+    response_schema: dict
+
+
+class DeferredLookup:
+    """Future-like wrapper that runs the lookup only when its result is read."""
+
+    def __init__(self, fn, *args):
+        self._fn = fn
+        self._args = args
+
+    def result(self):
+        return self._fn(*self._args)
+
+    def cancel(self):
+        return True
+
 
 class CheckPaymentByLPR:
 
@@ -54,108 +85,23 @@ class CheckPaymentByLPR:
             reason = enum.AlertInactiveReason.FREE_TO_PAYMENT_WINDOW.value
             ViolationRule.close_overstay_violation(db, task, reason)
 
-            lpr_matching_threshold_distance = 0
             with SGAdminApis() as sgadmin:
-                lot_status = sgadmin.lot_status(db, task.parking_lot_id)
-                if lot_status:
-                    lpr_matching_threshold_distance = lot_status['lpr_number_plate_text_matching_distance_thresh']
-
-            for sub_task in sub_tasks:
-                feature_by_id = FeatureUrlPath.get_feature_url_path_by_id(db, sub_task.feature_url_path)
-                provider_creds_obj = ProviderCreds.get_by_id(db, sub_task.provider_creds_id)
-                provider_obj = Provider.get_provider_by_id(db, provider_creds_obj.provider_id)
-
-                json_response_schema = json.loads(feature_by_id.response_schema)
-
-                results = None
-                if provider_obj.provider_api_request_type != enum.ProviderApiRequestType.Connect.value:
-                    results = PaymentMicroService.check_payment(
-                        db=db,
-                        provider_cred=provider_creds_obj,
-                        parking_lot_id=task.parking_lot_id,
-                        grace_period=connect_parkinglot.grace_period,
-                        api_request_endpoint=provider_obj.api_request_endpoint,
-                        lpr_matching_threshold_distance=lpr_matching_threshold_distance,
-                        feature=enum.PaymentServiceFeature.LPR.value,
-                        task=task,
-                        provider_text_key=provider_obj.text_key
-                    )
-
-                    valid_permit = enum.EventsForSessionLog.Valid_PERMIT.value
-
-                    if not results and json_response_schema.get('action_type') == valid_permit:
-                        is_permit = True
-
-                        is_valid_to_show_permit_expired = base.SessionLog.check_last_session_by_action_type(
-                            db,
-                            task.session_id,
-                            [valid_permit]
-                        )
-
-                        if is_permit and is_valid_to_show_permit_expired:
-                            payment_window['action_type'] = enum.EventsForSessionLog.PERMIT_EXPIRED.value
-
-                else:
-                    provider_json_response = ProcessRequest.process(db=db,
-                                                task=task,
-                                                sub_task=sub_task,
-                                                feature=feature_by_id,
-                                                provider_creds=provider_creds_obj,
-                                                connect_parkinglot=connect_parkinglot)
-
-                    if provider_json_response:
-                        replaced_response = ResponseHandler.replace_json_values_v2(provider_json_response, json_response_schema)
-                        if replaced_response is not None:
-                            results = DataFilter.filter(provider_creds_obj.text_key, task, replaced_response, lpr_matching_threshold_distance)
-
-                if results is not None:
-                    if provider_obj.text_key == enum.ProviderTextKey.Arrive.value:
-                        base.PushPayment.update_payment_status(db, results['push_payment_id'])
-
-                    # amount, start_timestamp, end_timestamp and match_lpr getting from payment service
-                    response_schema = ResponseIntegrationSchema(
-                        price_paid=results.get("price_paid", results.get("amount")),
-                        paid_date=results.get("paid_date", results.get("start_timestamp")),
-                        expiry_date=results.get("expiry_date", results.get("end_timestamp")),
-                        provider=results.get("provider"),
-                        station_price=results.get("station_price"),
-                        station_name=results.get("station_name"),
-                        plate_number=task.plate_number,
-                        matched_plate_number=results.get("match_lpr"),
-                        lpr_match_number=lpr_matching_threshold_distance,
-                        action_type=json_response_schema['action_type'] if 'action_type' in json_response_schema else ""
-                    )
-
-                    is_payment_found = task.sg_event_response.get(
-                        "entry_time") and task.sg_event_response.get(
-                        "entry_time") > response_schema.paid_date
-                    session_exists = Sessions.get_today_session_with_plate(db, task.plate_number,
-                                                                            task.parking_lot_id)
-                    if response_schema and (response_schema.expiry_date or response_schema.price_paid):
-
-                        timestamp = response_schema.expiry_date
-
-                        if connect_parkinglot.is_in_out_policy:
-                            return CheckPaymentByLPR.process_payment(db, task, sub_task, provider_obj, timestamp,
-                                                    response_schema)
-
-                        elif is_payment_found and session_exists:
-                            logger.info(
-                                f"Task: {task.id} / LPR: {task.plate_number} - Payment not found for {provider_obj.name}")
-                        else:
-                            return CheckPaymentByLPR.process_payment(db, task, sub_task, provider_obj, timestamp,
-                                                    response_schema)
-                    else:
-                        logger.info(
-                            f"Task: {task.id} / LPR: {task.plate_number} - Payment not found for {provider_obj.name}")
-                # elif "expiry_date" in results and results["expiry_date"] is not None:
-                #     logger.info(
-                #         f"Task: {task.id} / LPR: {task.plate_number} - Payment found for {provider_obj.name} but expired on {results.get('expiry_date')}")
-                else:
-                    logger.info(
-                        f"Task: {task.id} / LPR: {task.plate_number} - Payment not found for {provider_obj.name}")
-
-                SubTask.close_sub_task(db, sub_task.id)
+                lpr_matching_threshold_distance = sgadmin.lpr_matching_threshold(db, task.parking_lot_id)
+
+            lookups = CheckPaymentByLPR.build_provider_lookups(db, sub_tasks)
+            pending_lookups = CheckPaymentByLPR.submit_provider_lookups(db, task, connect_parkinglot, lookups,
+                                                                        lpr_matching_threshold_distance)
+            try:
+                for lookup, pending_lookup in zip(lookups, pending_lookups):
+                    payment_response = CheckPaymentByLPR.evaluate_provider_lookup(
+                        db, task, connect_parkinglot, payment_window, lookup,
+                        pending_lookup.result(), lpr_matching_threshold_distance)
+                    if payment_response is not None:
+                        return payment_response
+            finally:
+                # a payment was found or the task failed, the slower providers are no longer needed
+                for pending_lookup in pending_lookups:
+                    pending_lookup.cancel()
 
         elif "status" in payment_window and not payment_window["status"]:
             # close payment violation, window is switching from payment to non-payment
@@ -171,6 +117,173 @@ class CheckPaymentByLPR:
 
         ViolationRule.manage_free_window_and_not_paid_task(db, task, connect_parkinglot, session, payment_window)
 
+    @staticmethod
+    def build_provider_lookups(db, sub_tasks) -> List[ProviderLookup]:
+        lookups = []
+        for sub_task in sub_tasks:
+            feature_by_id = FeatureUrlPath.get_feature_url_path_by_id(db, sub_task.feature_url_path)
+            provider_creds_obj = ProviderCreds.get_by_id(db, sub_task.provider_creds_id)
+            provider_obj = Provider.get_provider_by_id(db, provider_creds_obj.provider_id)
+
+            lookups.append(ProviderLookup(sub_task=sub_task,
+                                          feature=feature_by_id,
+                                          provider_creds=provider_creds_obj,
+                                          provider=provider_obj,
+                                          response_schema=json.loads(feature_by_id.response_schema)))
+        return lookups
+
+    @staticmethod
+    def submit_provider_lookups(db, task, connect_parkinglot, lookups, lpr_matching_threshold_distance):
+        """
+        Starts the provider lookups of all sub-tasks at once, so the task waits for the slowest
+        provider instead of the sum of all of them. Results are still read in sub-task order.
+        A single lookup runs lazily on the caller's session, exactly like the serial loop did.
+        """
+        if len(lookups) <= 1 or settings.PROVIDER_LOOKUP_WORKERS <= 1:
+            return [DeferredLookup(CheckPaymentByLPR.lookup_provider, db, task, connect_parkinglot, lookup,
+                                   lpr_matching_threshold_distance) for lookup in lookups]
+
+        # sessions are not thread safe, the lookup threads load the rows by id on their own session.
+        # Those rows were committed before the task was claimed, the task's own transaction is left open.
+        task_id, connect_parkinglot_id = task.id, connect_parkinglot.id
+        lookup_ids = [(lookup.sub_task.id, lookup.feature.id, lookup.provider_creds.id, lookup.provider.id,
+                       lookup.response_schema) for lookup in lookups]
+
+        return [provider_lookup_executor.submit(CheckPaymentByLPR.lookup_provider_in_thread,
+                                                task_id, connect_parkinglot_id, ids,
+                                                lpr_matching_threshold_distance) for ids in lookup_ids]
+
+    @staticmethod
+    def lookup_provider_in_thread(task_id, connect_parkinglot_id, lookup_ids, lpr_matching_threshold_distance):
+        sub_task_id, feature_id, provider_creds_id, provider_id, response_schema = lookup_ids
+        thread_db = get_db_session()
+        try:
+            thread_lookup = ProviderLookup(
+                sub_task=thread_db.get(SubTask, sub_task_id),
+                feature=thread_db.get(FeatureUrlPath, feature_id),
+                provider_creds=thread_db.get(ProviderCreds, provider_creds_id),
+                provider=thread_db.get(Provider, provider_id),
+                response_schema=response_schema
+            )
+            return CheckPaymentByLPR.lookup_provider(thread_db,
+                                                     thread_db.get(base.Task, task_id),
+                                                     thread_db.get(ConnectParkinglot, connect_parkinglot_id),
+                                                     thread_lookup,
+                                                     lpr_matching_threshold_distance)
+        finally:
+            remove_db_session()
+
+    @staticmethod
+    def lookup_provider(db, task, connect_parkinglot, lookup, lpr_matching_threshold_distance):
+        if lookup.provider.provider_api_request_type != enum.ProviderApiRequestType.Connect.value:
+            return PaymentMicroService.check_payment(
+                db=db,
+                provider_cred=lookup.provider_creds,
+                parking_lot_id=task.parking_lot_id,
+                grace_period=connect_parkinglot.grace_period,
+                api_request_endpoint=lookup.provider.api_request_endpoint,
+                lpr_matching_threshold_distance=lpr_matching_threshold_distance,
+                feature=enum.PaymentServiceFeature.LPR.value,
+                task=task,
+                provider_text_key=lookup.provider.text_key
+            )
+
+        snapshot_records = PaymentSnapshot.lookup(db, task, connect_parkinglot, lookup)
+        if snapshot_records:
+            return snapshot_records
+
+        provider_response = ProcessRequest.process(db=db,
+                                                   task=task,
+                                                   sub_task=lookup.sub_task,
+                                                   feature=lookup.feature,
+                                                   provider_creds=lookup.provider_creds,
+                                                   connect_parkinglot=connect_parkinglot,
+                                                   stop_when=DataFilter.stop_at_exact_match(task, lookup.feature))
+        if not provider_response:
+            return None
+        # mapped here, in the lookup thread
+        return ResponseExtractor.for_feature(lookup.feature).extract(provider_response)
+
+    @staticmethod
+    def evaluate_provider_lookup(db, task, connect_parkinglot, payment_window, lookup,
+                                 provider_response, lpr_matching_threshold_distance):
+        """Applies one provider's response, returns the response schema when the task is paid."""
+        sub_task, provider_obj = lookup.sub_task, lookup.provider
+        provider_creds_obj, json_response_schema = lookup.provider_creds, lookup.response_schema
+
+        results = None
+        if provider_obj.provider_api_request_type != enum.ProviderApiRequestType.Connect.value:
+            results = provider_response
+
+            valid_permit = enum.EventsForSessionLog.Valid_PERMIT.value
+
+            if not results and json_response_schema.get('action_type') == valid_permit:
+                is_permit = True
+
+                is_valid_to_show_permit_expired = base.SessionLog.check_last_session_by_action_type(
+                    db,
+                    task.session_id,
+                    [valid_permit]
+                )
+
+                if is_permit and is_valid_to_show_permit_expired:
+                    payment_window['action_type'] = enum.EventsForSessionLog.PERMIT_EXPIRED.value
+
+        elif provider_response:
+            # records mapped with the feature's response_schema, see lookup_provider
+            results = DataFilter.filter(provider_creds_obj.text_key, task, provider_response, lpr_matching_threshold_distance)
+
+        if results is not None:
+            if provider_obj.text_key == enum.ProviderTextKey.Arrive.value:
+                base.PushPayment.update_payment_status(db, results['push_payment_id'])
+
+            # amount, start_timestamp, end_timestamp and match_lpr getting from payment service
+            response_schema = ResponseIntegrationSchema(
+                price_paid=results.get("price_paid", results.get("amount")),
+                paid_date=results.get("paid_date", results.get("start_timestamp")),
+                expiry_date=results.get("expiry_date", results.get("end_timestamp")),
+                provider=results.get("provider"),
+                station_price=results.get("station_price"),
+                station_name=results.get("station_name"),
+                plate_number=task.plate_number,
+                matched_plate_number=results.get("match_lpr"),
+                lpr_match_number=lpr_matching_threshold_distance,
+                action_type=json_response_schema['action_type'] if 'action_type' in json_response_schema else ""
+            )
+
+            is_payment_found = task.sg_event_response.get(
+                "entry_time") and task.sg_event_response.get(
+                "entry_time") > response_schema.paid_date
+            session_exists = Sessions.get_today_session_with_plate(db, task.plate_number,
+                                                                    task.parking_lot_id)
+            if response_schema and (response_schema.expiry_date or response_schema.price_paid):
+
+                timestamp = response_schema.expiry_date
+
+                if connect_parkinglot.is_in_out_policy:
+                    return CheckPaymentByLPR.process_payment(db, task, sub_task, provider_obj, timestamp,
+                                            response_schema)
+
+                elif is_payment_found and session_exists:
+                    logger.info(
+                        f"Task: {task.id} / LPR: {task.plate_number} - Payment not found for {provider_obj.name}")
+                else:
+                    return CheckPaymentByLPR.process_payment(db, task, sub_task, provider_obj, timestamp,
+                                            response_schema)
+            else:
+                logger.info(
+                    f"Task: {task.id} / LPR: {task.plate_number} - Payment not found for {provider_obj.name}")
+        # elif "expiry_date" in results and results["expiry_date"] is not None:
+        #     logger.info(
+        #         f"Task: {task.id} / LPR: {task.plate_number} - Payment found for {provider_obj.name} but expired on {results.get('expiry_date')}")
+        else:
+            logger.info(
+                f"Task: {task.id} / LPR: {task.plate_number} - Payment not found for {provider_obj.name}")
+
+        SubTask.close_sub_task(db, sub_task.id)
+
+        return None
+
     @staticmethod
     def process_payment(db, task, sub_task, provider_obj, timestamp, response_schema):
         logger.info(
@@ -10,7 +10,7 @@ from app.service import TaskService, session_manager
 from app.service.event_service import EventService
 from app.utils import enum
 from app.wrapper.process_request import ProcessRequest
-from app.utils.response_handler import ResponseHandler
+from app.utils.response_extractor import ResponseExtractor
 from app.schema.response_integration_schema import ResponseIntegrationSchema
 from app.service.payment_service import PaymentService
 from app.models.base import (FeatureUrlPath,
@@ -63,11 +63,12 @@ class CheckReservationByLPR:
                                         sub_task=sub_task,
                                         feature=feature_by_id,
                                         provider_creds=provider_creds_obj,
-                                        connect_parkinglot=connect_parkinglot)
+                                        connect_parkinglot=connect_parkinglot,
+                                        stop_when=DataFilter.stop_at_exact_match(task, feature_by_id))
 
             json_response_schema = json.loads(feature_by_id.response_schema)
 
-            data = ResponseHandler.replace_json_values_v2(data, json_response_schema)
+            data = ResponseExtractor.for_feature(feature_by_id).extract(data)
             if data is not None:
                 results = DataFilter.filter(provider_creds_obj.text_key, task, data, lpr_matching_threshold_distance)
                 if results is not None:
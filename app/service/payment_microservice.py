@@ -1,4 +1,4 @@
-import requests
+from app.utils.http_client import http_client
 import logging
 from app.config import settings
 from app.models.provider_connect import ProviderConnect
@@ -70,7 +70,7 @@ class PaymentMicroService:
                     f"Request Params: {params}"
                 )
 
-                payment_info = requests.get(
+                payment_info = http_client.get(
                     url = f'{api_request_endpoint}/api/v1/connect/payments/sg-connect',
                     headers=headers,
                     params=params,
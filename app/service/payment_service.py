@@ -29,7 +29,7 @@ class PaymentService:
     @staticmethod
     def paid(db, task, sub_task, response_schema, timestamp):
         # alert_id_list = task.sgadmin_alerts_ids
-        provider_type = db.query(base.ProviderTypes).filter(base.ProviderTypes.text_key == enum.ProviderTypes.PROVIDER_VIOLATION.value).first()
+        provider_type = base.ProviderTypes.get_by_text_key(db, enum.ProviderTypes.PROVIDER_VIOLATION.value)
 
         provider_creds_by_id = base.ProviderCreds.get_by_id(db, sub_task.provider_creds_id)
         provider = base.Provider.get_by_id(db, provider_creds_by_id.provider_id)
@@ -0,0 +1,94 @@
+import copy
+import logging
+from typing import NamedTuple, Dict, List, Optional
+
+from app.config import settings
+from app.models.base import FeatureUrlPath, ProviderConnect
+from app.models.catalog_cache import catalog_cache
+from app.utils import enum
+from app.utils.data_filter import DataFilter
+from app.utils.response_extractor import ResponseExtractor
+from app.utils.ttl_cache import TTLCache
+from app.wrapper.process_request import ProcessRequest
+
+logger = logging.getLogger(__name__)
+
+# active payments per (provider creds, facility), pulled again once an entry expires
+payment_snapshots = TTLCache(ttl=settings.PAYMENT_SNAPSHOT_TTL_SEC, maxsize=10000)
+catalog_cache.register(("feature_url_path", "provider_connect", "provider_creds"), payment_snapshots)
+
+
+class Snapshot(NamedTuple):
+    records_by_plate: Dict[str, List[dict]]  # mapped records, keyed by upper cased plate
+    size: int
+
+
+class PaymentSnapshot:
+    """
+    Optional local answer to per-plate payment checks of pull based providers.
+
+    A provider takes part when it has a payment.snapshot.lpr feature, the URL of its list of active
+    payments. The list is pulled at most once per PAYMENT_SNAPSHOT_TTL_SEC for each provider creds and
+    facility, mapped with the feature's response_schema and indexed by plate. Only a valid payment of
+    the exact plate is answered from the snapshot, anything else (no payment, a fuzzy match, a payment
+    made after the last pull) is left to the live per-plate call.
+    """
+
+    @staticmethod
+    def lookup(db, task, connect_parkinglot, lookup) -> Optional[List[dict]]:
+        """Mapped records holding a valid payment of the task's plate, None when the live call has to answer."""
+        if not settings.PAYMENT_SNAPSHOT_ENABLED or not task.plate_number:
+            return None
+
+        provider_connect = ProviderConnect.get_provider_connect(db, connect_parkinglot.id, lookup.provider_creds.id)
+        if provider_connect is None:
+            return None
+
+        try:
+            snapshot = payment_snapshots.get_or_load(
+                (lookup.provider_creds.id, provider_connect.facility_id),
+                lambda: PaymentSnapshot.pull(db, task, connect_parkinglot, lookup))
+        except Exception as e:
+            logger.warning(f"Task: {task.id} / LPR: {task.plate_number} - payment snapshot unavailable: {str(e)}")
+            return None
+
+        records = snapshot.records_by_plate.get(task.plate_number.upper())
+        if not records:
+            return None
+
+        closest_match = DataFilter.find_closest_match(copy.deepcopy(records), task)
+        if closest_match["closest_match_record"] is None:
+            return None
+
+        logger.info(f"Task: {task.id} / LPR: {task.plate_number} - payment found in the snapshot of "
+                    f"{lookup.provider.name}")
+        return [closest_match["closest_match_record"]]
+
+    @staticmethod
+    def pull(db, task, connect_parkinglot, lookup) -> Snapshot:
+        feature = FeatureUrlPath.get_by_provider_and_feature(db, lookup.provider.id,
+                                                             enum.Feature.PAYMENT_SNAPSHOT_LPR.value)
+        if feature is None:
+            # per-plate lookups only, the provider is checked again when the entry expires
+            return Snapshot(records_by_plate={}, size=0)
+
+        response = ProcessRequest.process(db=db,
+                                          task=task,
+                                          sub_task=lookup.sub_task,
+                                          feature=feature,
+                                          provider_creds=lookup.provider_creds,
+                                          connect_parkinglot=connect_parkinglot)
+        records = (ResponseExtractor.for_feature(feature).extract(response) if response else None) or []
+
+        records_by_plate = {}
+        for record in records:
+            plate_numbers = record.get("plate_number")
+            if isinstance(plate_numbers, str):
+                plate_numbers = [plate_numbers]
+            for plate in plate_numbers or []:
+                if isinstance(plate, str):
+                    records_by_plate.setdefault(plate.upper(), []).append(record)
+
+        logger.info(f"Payment snapshot of {lookup.provider.name} for provider creds {lookup.provider_creds.id} "
+                    f"pulled with {len(records)} records.")
+        return Snapshot(records_by_plate=records_by_plate, size=len(records))
@@ -1,6 +1,10 @@
+import csv
+import io
 import json
 from datetime import datetime
 import logging
+from itertools import groupby
+from operator import attrgetter
 from typing import Any, Optional
 
 import pytz
@@ -8,271 +12,349 @@ from fastapi import HTTPException
 from app import schema
 from sqlalchemy.orm import Session
 from app.models import base
+from app.models.context_session import unit_of_work
+from app.models.session import SessionLocal
 from app.models.task import Task
 from app.models.violation import Violation
+from app.config import settings
 from app.service.event_service import EventService
+from app.service.session_rollup import SessionRollup
 from app.utils import enum
 from app.utils.common import set_text_for_session_ui, fetch_violation_amount
+from app.utils.sg_admin_apis import SGAdminApis
+from app.utils.ttl_cache import TTLCache
 from collections import defaultdict
 
 logger = logging.getLogger(__name__)
 
+# audit dashboard counts per filter set, so paging through a window does not count it again
+audit_stats = TTLCache(ttl=settings.AUDIT_STATS_CACHE_TTL_SEC, maxsize=1024)
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_CSV_COLUMNS = ["session_id", "session_start", "title", "record_id", "spot_id", "parking_spot_name",
+                      "is_active", "is_waiting_for_payment", "total_paid_price", "event_type",
+                      "event_description", "event_timestamp", "provider", "amount"]
+
 
 class SessionManager:
 
     @staticmethod
     def create_session_audit(db: Session, events: schema.SgAnprEventSchema):
-
+        """Handles an SG-Admin event, its session and the tasks it creates are committed together."""
         try:
-            # Check if parking lot exists
-            parking_lot = base.ConnectParkinglot.get_connect_parking_lot_id(db, events.parking_lot_id)
-            if not parking_lot:
-                return f"No parking lot found with ID {events.parking_lot_id}"
-
-            session_audit = schema.SgSessionAudit(
-                parking_lot_id=events.parking_lot_id,
-                lpr_number=events.license_plate,
-                spot_id=events.parking_spot_id,
-                parking_spot_name=events.parking_spot_name,
-                session_start_time=events.timestamp
-            )
-
-            # Handle car entry event
-            if events.event_key == enum.Event.lpr_entry.value:
-                session_audit.lpr_record_id = events.lpr_record_id
-                session_exist = SessionManager.check_session_on_car_entry(db,
-                                                                          session_audit.lpr_number,
-                                                                          session_audit.parking_lot_id)
+            prefetched = SessionManager.prefetch_event_lookups(db, events)
+            with unit_of_work(db):
+                return SessionManager.handle_session_event(db, events, prefetched)
+        except Exception as e:
+            return {"message": f"An error occurred: {str(e)}"}
+
+    @staticmethod
+    def create_session_audits(db: Session, events: list) -> list:
+        """
+        Handles a batch of SG-Admin events lot by lot, in the order received. The events of a lot are
+        committed together, each in its own savepoint so a failing event does not undo the others.
+        Returns one outcome per event, in the order of the batch.
+        """
+        outcomes = [None] * len(events)
+        grouped_parking_lot = defaultdict(list)
+        for index, event in enumerate(events):
+            grouped_parking_lot[event.parking_lot_id].append((index, event))
+
+        with EventService.batch_scope():
+            for parking_lot_id, lot_events in grouped_parking_lot.items():
+                prefetched = {}
+                for index, event in lot_events:
+                    try:
+                        prefetched[index] = SessionManager.prefetch_event_lookups(db, event)
+                    except Exception as e:
+                        outcomes[index] = {"status": "error", "message": f"An error occurred: {str(e)}"}
+                try:
+                    with unit_of_work(db):
+                        for index, event in lot_events:
+                            if index not in prefetched:
+                                continue
+                            try:
+                                with unit_of_work(db):
+                                    response_message = SessionManager.handle_session_event(db, event,
+                                                                                           prefetched[index])
+                                outcomes[index] = {"status": "success", "message": response_message}
+                            except Exception as e:
+                                outcomes[index] = {"status": "error", "message": f"An error occurred: {str(e)}"}
+                except Exception as e:
+                    logger.critical(f"Batch events of parking lot {parking_lot_id} not saved: {str(e)}")
+                    for index in prefetched:
+                        outcomes[index] = {"status": "error", "message": f"An error occurred: {str(e)}"}
+        return outcomes
+
+    @staticmethod
+    def prefetch_event_lookups(db: Session, events: schema.SgAnprEventSchema) -> dict:
+        """
+        Makes the SG-Admin requests an event needs before its transaction is opened, so that no
+        connection stays in a transaction while SG-Admin answers. The result is passed on to
+        handle_session_event.
+        """
+        prefetched = {}
+        if events.event_key == enum.Event.parking_violations.value:
+            logger.info(f"fetching violation amount for alert id {events.alert_type_id}")
+            prefetched["violation_meta_data"] = fetch_violation_amount(db, events.parking_lot_id,
+                                                                       events.alert_type_id)
+            # ends the read transaction of the lookup
+            db.commit()
+        return prefetched
+
+    @staticmethod
+    def handle_session_event(db: Session, events: schema.SgAnprEventSchema, prefetched: dict):
+
+        # Check if parking lot exists
+        parking_lot = base.ConnectParkinglot.get_connect_parking_lot_id(db, events.parking_lot_id)
+        if not parking_lot:
+            return f"No parking lot found with ID {events.parking_lot_id}"
+
+        session_audit = schema.SgSessionAudit(
+            parking_lot_id=events.parking_lot_id,
+            lpr_number=events.license_plate,
+            spot_id=events.parking_spot_id,
+            parking_spot_name=events.parking_spot_name,
+            session_start_time=events.timestamp
+        )
+
+        # Handle car entry event
+        if events.event_key == enum.Event.lpr_entry.value:
+            session_audit.lpr_record_id = events.lpr_record_id
+            session_exist = SessionManager.check_session_on_car_entry(db,
+                                                                      session_audit.lpr_number,
+                                                                      session_audit.parking_lot_id)
+
+            logger.debug(f'Handle event: {events.event_key} / LPR: {events.license_plate}')
+            if session_exist:
+                attributes_to_update = {"is_active": False,
+                                        "is_waiting_for_payment": False,
+                                        }
+                base.Sessions.update_attributes_in_session_audit(db, session_exist.id, attributes_to_update)
+                base.Task.close_task_with_session_id(db, session_exist.id)
+                task = base.Task.get_task_by_session_id(db, session_exist.id)
+                reason = enum.AlertInactiveReason.SAME_LPR_ENTRY.value
+                if task:
+                    EventService.close_alert(db, task, reason)
+                SessionManager.create_session_logs(db=db,
+                                                   session_id=session_exist.id,
+                                                   action_type=enum.ActionType.SYSTEM_CLOSED.value,
+                                                   description=enum.EventsForSessionLog.LPR_Entry_Description.value
+                                                   )
+
+            session_audit.entry_event = events.json()
+            session_id = base.Sessions.insert_sg_admin_events(db, session_audit).id
+            events.session_id = session_id
+
+            logger.debug(f'Handle event: {events.event_key} / LPR: {events.license_plate} / session id: {session_id}')
+            return EventService.execute_event([events], db)
+
+        # Handle car exit event
+        if events.event_key == enum.Event.lpr_exit.value:
+            session_audit.lpr_record_id = events.lpr_record_id
+            session_audit.exit_event = events.json()
+            session = base.Sessions.get_session_by_plate(db, events.license_plate, events.parking_lot_id)
+
+            logger.debug(f'Handle event: {events.event_key} / LPR: {events.license_plate}')
+
+            if session:
+                attributes_to_update = {"exit_event": events.json(), "is_waiting_for_payment": False}
+                updated_session = SessionManager.update_session_audit(db, session.id, attributes_to_update)
+                events.session_id = updated_session.id
+                logger.debug(f'Handle event: {enum.Event.lpr_exit.value} / LPR: {events.license_plate} / session id: {events.session_id}')
+            else:
+                session_id = base.Sessions.insert_sg_admin_events(db, session_audit)
+                logger.debug(f'Handle event: {enum.Event.lpr_exit.value} / LPR: {session_id.lpr_number} / session id: {session_id.id}')
 
-                logger.debug(f'Handle event: {events.event_key} / LPR: {events.license_plate}')
+            return EventService.execute_event([events], db)
+
+        # Handle spot updates event
+        if events.event_key == enum.Event.parking_spot_updates.value and events.is_unknown == False:
+            events.parking_spot_id = str(events.parking_spot_id)
+
+            if events.spot_status == enum.Event.unavailable.name:
+                events.event_key = enum.Event.unavailable.value
+                session_exist = SessionManager.check_session_on_spot_occupied(db,
+                                                                              str(session_audit.spot_id),
+                                                                              session_audit.parking_lot_id)
+
+                logger.debug(f'Handle event: {events.event_key} / SPOT Name: {session_audit.parking_spot_name}')
                 if session_exist:
                     attributes_to_update = {"is_active": False,
                                             "is_waiting_for_payment": False,
                                             }
                     base.Sessions.update_attributes_in_session_audit(db, session_exist.id, attributes_to_update)
                     base.Task.close_task_with_session_id(db, session_exist.id)
+                    reason = enum.AlertInactiveReason.SAME_OCCUPIED_EVENT.value
                     task = base.Task.get_task_by_session_id(db, session_exist.id)
-                    reason = enum.AlertInactiveReason.SAME_LPR_ENTRY.value
                     if task:
                         EventService.close_alert(db, task, reason)
                     SessionManager.create_session_logs(db=db,
                                                        session_id=session_exist.id,
                                                        action_type=enum.ActionType.SYSTEM_CLOSED.value,
-                                                       description=enum.EventsForSessionLog.LPR_Entry_Description.value
+                                                       description=enum.EventsForSessionLog.Occupied_Description.value
                                                        )
 
                 session_audit.entry_event = events.json()
+                session_audit.is_waiting_for_payment = False if events.disable_spot_payment else None
                 session_id = base.Sessions.insert_sg_admin_events(db, session_audit).id
                 events.session_id = session_id
 
-                logger.debug(f'Handle event: {events.event_key} / LPR: {events.license_plate} / session id: {session_id}')
+                logger.debug(f'Handle event: {events.event_key} / SPOT Name: {session_audit.parking_spot_name} / session id: {session_id}')
                 return EventService.execute_event([events], db)
 
-            # Handle car exit event
-            if events.event_key == enum.Event.lpr_exit.value:
-                session_audit.lpr_record_id = events.lpr_record_id
+            if events.spot_status == enum.Event.available.name:
+                events.event_key = enum.Event.available.value
                 session_audit.exit_event = events.json()
-                session = base.Sessions.get_session_by_plate(db, events.license_plate, events.parking_lot_id)
-
-                logger.debug(f'Handle event: {events.event_key} / LPR: {events.license_plate}')
+                session = base.Sessions.get_session_by_spot(db, str(events.parking_spot_id), events.parking_lot_id)
 
+                logger.debug(f'Handle event: {events.event_key} / SPOT Name: {session_audit.parking_spot_name}')
                 if session:
                     attributes_to_update = {"exit_event": events.json(), "is_waiting_for_payment": False}
                     updated_session = SessionManager.update_session_audit(db, session.id, attributes_to_update)
                     events.session_id = updated_session.id
-                    logger.debug(f'Handle event: {enum.Event.lpr_exit.value} / LPR: {events.license_plate} / session id: {events.session_id}')
+                    logger.debug(f'Handle event: {enum.Event.available.name} / SPOT Name: {session_audit.parking_spot_name} / session id: {events.session_id}')
                 else:
-                    session_id = base.Sessions.insert_sg_admin_events(db, session_audit)
-                    logger.debug(f'Handle event: {enum.Event.lpr_exit.value} / LPR: {session_id.lpr_number} / session id: {session_id.id}')
-
-                return EventService.execute_event([events], db)
-
-            # Handle spot updates event
-            if events.event_key == enum.Event.parking_spot_updates.value and events.is_unknown == False:
-                events.parking_spot_id = str(events.parking_spot_id)
-
-                if events.spot_status == enum.Event.unavailable.name:
-                    events.event_key = enum.Event.unavailable.value
-                    session_exist = SessionManager.check_session_on_spot_occupied(db,
-                                                                                  str(session_audit.spot_id),
-                                                                                  session_audit.parking_lot_id)
-
-                    logger.debug(f'Handle event: {events.event_key} / SPOT Name: {session_audit.parking_spot_name}')
-                    if session_exist:
-                        attributes_to_update = {"is_active": False,
-                                                "is_waiting_for_payment": False,
-                                                }
-                        base.Sessions.update_attributes_in_session_audit(db, session_exist.id, attributes_to_update)
-                        base.Task.close_task_with_session_id(db, session_exist.id)
-                        reason = enum.AlertInactiveReason.SAME_OCCUPIED_EVENT.value
-                        task = base.Task.get_task_by_session_id(db, session_exist.id)
-                        if task:
-                            EventService.close_alert(db, task, reason)
-                        SessionManager.create_session_logs(db=db,
-                                                           session_id=session_exist.id,
-                                                           action_type=enum.ActionType.SYSTEM_CLOSED.value,
-                                                           description=enum.EventsForSessionLog.Occupied_Description.value
-                                                           )
-
-                    session_audit.entry_event = events.json()
-                    session_audit.is_waiting_for_payment = False if events.disable_spot_payment else None
                     session_id = base.Sessions.insert_sg_admin_events(db, session_audit).id
-                    events.session_id = session_id
-
-                    logger.debug(f'Handle event: {events.event_key} / SPOT Name: {session_audit.parking_spot_name} / session id: {session_id}')
-                    return EventService.execute_event([events], db)
-
-                if events.spot_status == enum.Event.available.name:
-                    events.event_key = enum.Event.available.value
-                    session_audit.exit_event = events.json()
-                    session = base.Sessions.get_session_by_spot(db, str(events.parking_spot_id), events.parking_lot_id)
-
-                    logger.debug(f'Handle event: {events.event_key} / SPOT Name: {session_audit.parking_spot_name}')
-                    if session:
-                        attributes_to_update = {"exit_event": events.json(), "is_waiting_for_payment": False}
-                        updated_session = SessionManager.update_session_audit(db, session.id, attributes_to_update)
-                        events.session_id = updated_session.id
-                        logger.debug(f'Handle event: {enum.Event.available.name} / SPOT Name: {session_audit.parking_spot_name} / session id: {events.session_id}')
-                    else:
-                        session_id = base.Sessions.insert_sg_admin_events(db, session_audit).id
-                        logger.debug(f'Handle event: {enum.Event.available.name} / SPOT Name: {session_audit.parking_spot_name} / session id: {session_id}')
+                    logger.debug(f'Handle event: {enum.Event.available.name} / SPOT Name: {session_audit.parking_spot_name} / session id: {session_id}')
 
-                    return EventService.execute_event([events], db)
-
-            if events.event_key == enum.Event.parking_violations.value:
-
-                session = SessionManager.check_session_on_violation(db, events.parking_lot_id,
-                                                                         events.license_plate, events.lpr_record_id)
-                if session:
-                    task = base.Task.fetch_spot_details_by_session_id(db, session.id)
-                    if task and events.parking_spot_id is None:
-                        events.parking_spot_id = task.parking_spot_id
-                        events.parking_spot_name = task.parking_spot_name
-                    events.session_id = session.id
-                else:
-                    session_audit.is_active = False
-                    session = base.Sessions.insert_sg_admin_events(db, session_audit)
-                    events.session_id = session.id
-                response = EventService.execute_event([events], db)
-                logger.info(f"fetching violation amount for alert id {events.alert_type_id}")
-                violation_meta_data = fetch_violation_amount(db, events.parking_lot_id, events.alert_type_id)
-                if response is not None:
-                    violation = schema.Violation(
-                                name=events.alert_title,
-                                status="OPEN",
-                                session="OPEN",
-                                task_id=response.get("task_id", 0),
-                                amount_due=violation_meta_data.get("amount"),
-                                description=events.details,
-                                plate_number=events.license_plate,
-                                parking_spot_id=events.parking_spot_id,
-                                parking_lot_id=events.parking_lot_id,
-                                violation_type=events.event_key,
-                                session_id=session.id,
-                                meta_data=violation_meta_data,
-                                violation_event=events.json(),
-                                timestamp=events.timestamp
-
-                             )
-
-                    Violation.create_violation(db, violation)
-                    return response
-                return {"message": "not connected with any enforcement provider"}
-
-            # Map the Spot id with the existing session whenever there's LPR to spot
-            if events.event_key == enum.Event.lpr_to_spot.value:
-                session_audit.lpr_record_id = events.lpr_record_id
-                session_exist = SessionManager.check_session_to_map_lpr_to_spot(db,
-                                                                          session_audit.lpr_number,
-                                                                          session_audit.lpr_record_id)
-
-                logger.debug(f'Handle event: {events.event_key} / LPR: {session_audit.lpr_number}')
-                if session_exist:
-                    attributes_to_update = {
-                        "spot_id": session_audit.spot_id,
-                        "parking_spot_name":session_audit.parking_spot_name
-                    }
-                    SessionManager.update_session_audit(db, session_exist.id, attributes_to_update)
-                    if session_exist.is_lpr_to_spot:
-                        sg_event_schema = schema.SgAnprEventSchema(**json.loads(session_exist.entry_event))
-                        sg_event_schema.session_id = session_exist.id
-                        sg_event_schema.parking_spot_id = session_audit.spot_id
-                        sg_event_schema.parking_spot_name = session_audit.parking_spot_name
-                        SessionManager.create_session_logs(db=db,session_id=session_exist.id,
-                                                           action_type=enum.EventsForSessionLog.LPR_TO_SPOT.format(spot_name=session_audit.parking_spot_name),
-                                                           description=f"LPR match to Spot name: {str(session_audit.parking_spot_name)}".title().replace('Lpr', 'LPR'),
-                                                           event_at=events.timestamp
-                                                           )
-                        reason = enum.AlertInactiveReason.LPR_SPOT_DETECTED.value
-                        EventService.close_session_tasks_and_alerts(db, session_exist.id, reason)
-                        base.Sessions.update_attributes_in_session_audit(db, session_exist.id, {"has_nph_task": False})
-                        return EventService.execute_event([sg_event_schema], db)
-                    else:
-                        SessionManager.create_session_logs(db=db,
-                                                           session_id=session_exist.id,
-                                                           action_type=enum.EventsForSessionLog.LPR_TO_SPOT.format(spot_name=session_audit.parking_spot_name),
-                                                           description=f"LPR match to Spot name: {str(session_audit.parking_spot_name)}".title().replace('Lpr', 'LPR'),
-                                                           event_at=events.timestamp
-                                                           )
-
-                        attributes_to_update = {"is_lpr_to_spot": True}
-                        SessionManager.update_session_audit(db, session_exist.id, attributes_to_update)
+                return EventService.execute_event([events], db)
 
-                        Task.update_task_by_session_id(db, session_exist.id, session_audit.spot_id, events.parking_spot_name)
-                        return {"message": "spot mapped to session"}
+        if events.event_key == enum.Event.parking_violations.value:
 
-            # Handle lpr to spot free event
-            if events.event_key == enum.Event.lpr_to_spot_free.value:
-                session = base.Sessions.get_session_by_spot(db, str(events.parking_spot_id), events.parking_lot_id)
-                if session:
-                    SessionManager.create_session_logs(db=db, session_id=session.id,
-                                                       action_type=enum.EventsForSessionLog.LPR_TO_SPOT_FREE.format(
-                                                           spot_name=session_audit.parking_spot_name),
-                                                       description=f"LPR match to Spot Free name: {str(session_audit.parking_spot_name)}".title().replace(
-                                                           'Lpr', 'LPR'),
+            session = SessionManager.check_session_on_violation(db, events.parking_lot_id,
+                                                                     events.license_plate, events.lpr_record_id)
+            if session:
+                task = base.Task.fetch_spot_details_by_session_id(db, session.id)
+                if task and events.parking_spot_id is None:
+                    events.parking_spot_id = task.parking_spot_id
+                    events.parking_spot_name = task.parking_spot_name
+                events.session_id = session.id
+            else:
+                session_audit.is_active = False
+                session = base.Sessions.insert_sg_admin_events(db, session_audit)
+                events.session_id = session.id
+            response = EventService.execute_event([events], db)
+            violation_meta_data = prefetched["violation_meta_data"]
+            if response is not None:
+                violation = schema.Violation(
+                            name=events.alert_title,
+                            status="OPEN",
+                            session="OPEN",
+                            task_id=response.get("task_id", 0),
+                            amount_due=violation_meta_data.get("amount"),
+                            description=events.details,
+                            plate_number=events.license_plate,
+                            parking_spot_id=events.parking_spot_id,
+                            parking_lot_id=events.parking_lot_id,
+                            violation_type=events.event_key,
+                            session_id=session.id,
+                            meta_data=violation_meta_data,
+                            violation_event=events.json(),
+                            timestamp=events.timestamp
+
+                         )
+
+                Violation.create_violation(db, violation)
+                return response
+            return {"message": "not connected with any enforcement provider"}
+
+        # Map the Spot id with the existing session whenever there's LPR to spot
+        if events.event_key == enum.Event.lpr_to_spot.value:
+            session_audit.lpr_record_id = events.lpr_record_id
+            session_exist = SessionManager.check_session_to_map_lpr_to_spot(db,
+                                                                      session_audit.lpr_number,
+                                                                      session_audit.lpr_record_id)
+
+            logger.debug(f'Handle event: {events.event_key} / LPR: {session_audit.lpr_number}')
+            if session_exist:
+                attributes_to_update = {
+                    "spot_id": session_audit.spot_id,
+                    "parking_spot_name":session_audit.parking_spot_name
+                }
+                SessionManager.update_session_audit(db, session_exist.id, attributes_to_update)
+                if session_exist.is_lpr_to_spot:
+                    sg_event_schema = schema.SgAnprEventSchema(**json.loads(session_exist.entry_event))
+                    sg_event_schema.session_id = session_exist.id
+                    sg_event_schema.parking_spot_id = session_audit.spot_id
+                    sg_event_schema.parking_spot_name = session_audit.parking_spot_name
+                    SessionManager.create_session_logs(db=db,session_id=session_exist.id,
+                                                       action_type=enum.EventsForSessionLog.LPR_TO_SPOT.format(spot_name=session_audit.parking_spot_name),
+                                                       description=f"LPR match to Spot name: {str(session_audit.parking_spot_name)}".title().replace('Lpr', 'LPR'),
                                                        event_at=events.timestamp
                                                        )
-                    reason = enum.AlertInactiveReason.LPR_TO_SPOT_FREE.value
-                    EventService.close_session_tasks_and_alerts(db, session.id, reason)
-                    attributes_to_update = {
-                        "is_waiting_for_payment": False
-                    }
-                    SessionManager.update_session_audit(db, session.id, attributes_to_update)
-                    return {"message": "spot free mapped to session"}
-
-            if events.is_unknown:
-                session_exist = SessionManager.check_session_on_spot_occupied(db,
-                                                                              str(session_audit.spot_id),
-                                                                              session_audit.parking_lot_id)
-
-                if session_exist:
-                    attributes_to_update = {"is_active": False,
-                                            "is_waiting_for_payment": False,
-                                            }
-                    base.Sessions.update_attributes_in_session_audit(db, session_exist.id, attributes_to_update)
-                    task_ids = base.Task.close_task_with_session_id(db, session_exist.id)
-                    task = base.Task.get_task_by_session_id(db, session_exist.id)
-                    reason = enum.AlertInactiveReason.UNKNOWN_EVENT.value
-                    if task:
-                        EventService.close_alert(db, task, reason)
+                    reason = enum.AlertInactiveReason.LPR_SPOT_DETECTED.value
+                    EventService.close_session_tasks_and_alerts(db, session_exist.id, reason)
+                    base.Sessions.update_attributes_in_session_audit(db, session_exist.id, {"has_nph_task": False})
+                    return EventService.execute_event([sg_event_schema], db)
+                else:
                     SessionManager.create_session_logs(db=db,
                                                        session_id=session_exist.id,
-                                                       action_type=enum.ActionType.SYSTEM_CLOSED.value,
-                                                       description=enum.EventsForSessionLog.Unknown_Event_Description.value
+                                                       action_type=enum.EventsForSessionLog.LPR_TO_SPOT.format(spot_name=session_audit.parking_spot_name),
+                                                       description=f"LPR match to Spot name: {str(session_audit.parking_spot_name)}".title().replace('Lpr', 'LPR'),
+                                                       event_at=events.timestamp
                                                        )
 
-                    return base.SubTask.close_sub_task_with_task_id(db, task_ids)
-                return {"message": "No session found to close"}
+                    attributes_to_update = {"is_lpr_to_spot": True}
+                    SessionManager.update_session_audit(db, session_exist.id, attributes_to_update)
+
+                    Task.update_task_by_session_id(db, session_exist.id, session_audit.spot_id, events.parking_spot_name)
+                    return {"message": "spot mapped to session"}
+
+        # Handle lpr to spot free event
+        if events.event_key == enum.Event.lpr_to_spot_free.value:
+            session = base.Sessions.get_session_by_spot(db, str(events.parking_spot_id), events.parking_lot_id)
+            if session:
+                SessionManager.create_session_logs(db=db, session_id=session.id,
+                                                   action_type=enum.EventsForSessionLog.LPR_TO_SPOT_FREE.format(
+                                                       spot_name=session_audit.parking_spot_name),
+                                                   description=f"LPR match to Spot Free name: {str(session_audit.parking_spot_name)}".title().replace(
+                                                       'Lpr', 'LPR'),
+                                                   event_at=events.timestamp
+                                                   )
+                reason = enum.AlertInactiveReason.LPR_TO_SPOT_FREE.value
+                EventService.close_session_tasks_and_alerts(db, session.id, reason)
+                attributes_to_update = {
+                    "is_waiting_for_payment": False
+                }
+                SessionManager.update_session_audit(db, session.id, attributes_to_update)
+                return {"message": "spot free mapped to session"}
 
-            return {"message": "Invalid event key"}
+        if events.is_unknown:
+            session_exist = SessionManager.check_session_on_spot_occupied(db,
+                                                                          str(session_audit.spot_id),
+                                                                          session_audit.parking_lot_id)
 
-        except Exception as e:
-            return {"message": f"An error occurred: {str(e)}"}
+            if session_exist:
+                attributes_to_update = {"is_active": False,
+                                        "is_waiting_for_payment": False,
+                                        }
+                base.Sessions.update_attributes_in_session_audit(db, session_exist.id, attributes_to_update)
+                task_ids = base.Task.close_task_with_session_id(db, session_exist.id)
+                task = base.Task.get_task_by_session_id(db, session_exist.id)
+                reason = enum.AlertInactiveReason.UNKNOWN_EVENT.value
+                if task:
+                    EventService.close_alert(db, task, reason)
+                SessionManager.create_session_logs(db=db,
+                                                   session_id=session_exist.id,
+                                                   action_type=enum.ActionType.SYSTEM_CLOSED.value,
+                                                   description=enum.EventsForSessionLog.Unknown_Event_Description.value
+                                                   )
+
+                return base.SubTask.close_sub_task_with_task_id(db, task_ids)
+            return {"message": "No session found to close"}
+
+        return {"message": "Invalid event key"}
 
     @staticmethod
     def update_session_audit(db: Session, session_id: int, to_update):
         return base.Sessions.update_attributes_in_session_audit(db, session_id, to_update)
 
+    @staticmethod
+    def providers_by_id(db: Session) -> dict:
+        """Every provider in one query, for the audit views that resolve the provider of each log row."""
+        return {provider.id: provider for provider in base.Provider.get_all_providers(db)}
+
     @staticmethod
     def fetch_session(db: Session,
                       parking_lot_id: int,
@@ -282,10 +364,11 @@ class SessionManager:
         lot_id = base.ConnectParkinglot.get_connect_parking_lot_id(db, parking_lot_id)
         if not lot_id:
             raise HTTPException(status_code=404, detail="Parking lot is not registered")
+        providers_by_id = SessionManager.providers_by_id(db)
         provider_connects = base.ProviderConnect.check_parking_lot_with_provider(db, lot_id.id)
         providers = {}
         for provider in provider_connects:
-            provider_by_id = base.Provider.get_by_id(db, provider.provider_id)
+            provider_by_id = providers_by_id.get(provider.provider_id)
             provider_log = {provider_by_id.name: provider_by_id.logo}
             providers.update(provider_log)
 
@@ -293,12 +376,12 @@ class SessionManager:
                                                           start_date_time, end_date_time)
         stats = schema.Stats(**stats)
         session_list = []
-        for session_audit in sessions_audit:
+        for session_audit, logs in base.SessionLog.iter_logs_by_session(db, sessions_audit,
+                                                                        settings.AUDIT_LOG_BATCH_SIZE):
             try:
-                logs = base.SessionLog.get_session_logs(db, session_audit.id)
                 event_list = []
                 for log in logs:
-                    provider = base.Provider.get_by_id(db, log.provider)
+                    provider = providers_by_id.get(log.provider)
                     if provider is None:
                         events_log = schema.Events(type=log.action_type, description=log.description,
                                                    timestamp=log.created_at)
@@ -336,11 +419,13 @@ class SessionManager:
         lot_id = base.ConnectParkinglot.get_connect_parking_lot_id(db, parking_lot_id)
         if not lot_id:
             raise HTTPException(status_code=404, detail="Parking lot is not registered")
+        providers_by_id = SessionManager.providers_by_id(db)
         provider_connects = base.ProviderConnect.check_parking_lot_with_provider(db, lot_id.id)
+        provider_creds = base.ProviderCreds.get_by_ids(db, [provider_connect.provider_creds_id
+                                                            for provider_connect in provider_connects])
         providers = {}
-        for provider_connect in provider_connects:
-            provider_cred = base.ProviderCreds.get_by_id(db, provider_connect.provider_creds_id)
-            provider_by_id = base.Provider.get_by_id(db, provider_cred.provider_id)
+        for provider_cred in provider_creds:
+            provider_by_id = providers_by_id.get(provider_cred.provider_id)
             provider_log = ""
             if provider_by_id:
                 provider_log = {provider_by_id.name: provider_by_id.logo}
@@ -353,14 +438,13 @@ class SessionManager:
         metadata = schema.Metadata(**metadata)
 
         session_dict = {}
-        for session_audit in sessions_audit:
+        for session_audit, logs in base.SessionLog.iter_logs_by_session(db, sessions_audit,
+                                                                        settings.AUDIT_LOG_BATCH_SIZE):
             try:
-
-                logs = base.SessionLog.get_session_logs(db, session_audit.id)
                 text_to_show = "waiting for grace period" if session_audit.is_waiting_for_payment else None
                 event_list = []
                 for log in logs:
-                    provider = base.Provider.get_by_id(db, log.provider)
+                    provider = providers_by_id.get(log.provider)
                     if provider is None:
                         events_log = schema.SchemaForNUllProviderINSessionLog(type=log.action_type,
                                                                               description=log.description,
@@ -413,6 +497,64 @@ class SessionManager:
                                        providers=json.dumps(providers),
                                        sessions=sessions_grouped_by_date)
 
+    @staticmethod
+    def fetch_audit_stats(db: Session,
+                          parking_lot_id: int,
+                          start_date_time: datetime,
+                          end_date_time: datetime,
+                          session_type,
+                          provider,
+                          plate_number_or_spot,
+                          plate_max_distance: int = None) -> dict:
+        """Audit dashboard counts, reused for AUDIT_STATS_CACHE_TTL_SEC by every page of the same window."""
+        key = (parking_lot_id, start_date_time, end_date_time, session_type, provider, plate_number_or_spot,
+               plate_max_distance)
+        if settings.SESSION_ROLLUP_ENABLED and not (session_type or provider or plate_number_or_spot):
+            return audit_stats.get_or_load(key, lambda: SessionRollup.stats(db,
+                                                                            parking_lot_id,
+                                                                            start_date_time,
+                                                                            end_date_time))
+        return audit_stats.get_or_load(key, lambda: base.Sessions.get_audit_stats(db,
+                                                                                  parking_lot_id,
+                                                                                  start_date_time,
+                                                                                  end_date_time,
+                                                                                  session_type,
+                                                                                  provider,
+                                                                                  plate_number_or_spot,
+                                                                                  plate_max_distance))
+
+    @staticmethod
+    def similar_plate_distance(db: Session, parking_lot_id: int, similar_plates: bool) -> Optional[int]:
+        """Edit distance of the similar plate search, the one the lot uses to match provider plates."""
+        if not similar_plates:
+            return None
+        with SGAdminApis() as sgadmin:
+            return sgadmin.lpr_matching_threshold(db, parking_lot_id)
+
+    @staticmethod
+    def fetch_session_stats(db: Session,
+                            parking_lot_id: int,
+                            start_date_time: datetime,
+                            end_date_time: datetime,
+                            session_type,
+                            provider,
+                            plate_number_or_spot,
+                            similar_plates: bool = False):
+
+        lot_id = base.ConnectParkinglot.get_connect_parking_lot_id(db, parking_lot_id)
+        if not lot_id:
+            raise HTTPException(status_code=404, detail="Parking lot is not registered")
+
+        plate_max_distance = SessionManager.similar_plate_distance(db, parking_lot_id, similar_plates)
+        return schema.Stats(**SessionManager.fetch_audit_stats(db,
+                                                               parking_lot_id,
+                                                               start_date_time,
+                                                               end_date_time,
+                                                               session_type,
+                                                               provider,
+                                                               plate_number_or_spot,
+                                                               plate_max_distance))
+
     @staticmethod
     def fetch_session_v3(db: Session,
                          parking_lot_id: int,
@@ -423,18 +565,34 @@ class SessionManager:
                          session_type,
                          provider,
                          plate_number_or_spot,
-                         time_frame):
+                         time_frame,
+                         cursor: str = None,
+                         similar_plates: bool = False):
 
         lot_id = base.ConnectParkinglot.get_connect_parking_lot_id(db, parking_lot_id)
         if not lot_id:
             raise HTTPException(status_code=404, detail="Parking lot is not registered")
 
+        try:
+            after = base.Sessions.decode_timeline_cursor(cursor) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
         providers_info = base.Provider.get_all_providers(db)
         providers_dict = {provider.id: {
             "name": provider.name,
             "logo": provider.logo
         } for provider in providers_info}
 
+        plate_max_distance = SessionManager.similar_plate_distance(db, parking_lot_id, similar_plates)
+        stats = SessionManager.fetch_audit_stats(db,
+                                                 parking_lot_id,
+                                                 start_date_time,
+                                                 end_date_time,
+                                                 session_type,
+                                                 provider,
+                                                 plate_number_or_spot,
+                                                 plate_max_distance)
         sessions_audit, stats, metadata = base.Sessions.get_by_date_v3(db,
                                                                        parking_lot_id,
                                                                        start_date_time,
@@ -444,6 +602,9 @@ class SessionManager:
                                                                        session_type,
                                                                        provider,
                                                                        plate_number_or_spot,
+                                                                       stats=stats,
+                                                                       after=after,
+                                                                       plate_max_distance=plate_max_distance
                                                                        )
         stats = schema.Stats(**stats)
         metadata = schema.Metadata(**metadata)
@@ -456,38 +617,14 @@ class SessionManager:
             session_id = row.session_id
 
             if session_id not in session_map:
-                session_map[session_id] = {
-                    "sessionStart": row.session_start_time.isoformat(),
-                    "session_id": session_id,
-                    "record_id": row.lpr_record_id,
-                    "spot_id": row.spot_id,
-                    "parking_spot_name": row.parking_spot_name,
-                    "title": row.lpr_number.upper() if row.lpr_number else f"{row.parking_spot_name}",
-                    "isWaitingForPayment": row.is_waiting_for_payment,
-                    "isWaitingForReservation": False,
-                    "text_to_show": "waiting for grace period" if row.is_waiting_for_payment else None,
-                    "total_paid_price": row.total_paid_amount,
-                    "is_active": row.is_active,
-                    "events": []
-                }
+                session_map[session_id] = SessionManager.audit_session_entry(row)
 
-            event = {
-                "type": row.action_type,
-                "description": row.description,
-                "timestamp": row.log_created_at.isoformat()
-            }
+            event = SessionManager.audit_event_entry(row, providers_dict)
 
             provider_data = providers_dict.get(row.provider)
 
             if provider_data is not None:
-                event["provider"] = provider_data.get("name", "")
-
-                if not row.action_type.startswith(enum.EventsForSessionLog.VIOLATION_SENT.value):
-                    price_paid = row.meta_info.get('price_paid') if row.meta_info else None
-                    paid_price = float(price_paid) if price_paid is not None else 0.0
-                    formatted_paid_price = "{:.2f}".format(paid_price)
-                    event["amount"] = formatted_paid_price
-
+                if "amount" in event:
                     event_model = schema.Events(**event)
                 else:
                     # schema without amount
@@ -517,6 +654,121 @@ class SessionManager:
                                        sessions=sessions_grouped_by_date)
 
 
+    @staticmethod
+    def audit_session_entry(row) -> dict:
+        """A session of the audit timeline, without its events, from a get_by_date_v3 style row."""
+        return {
+            "sessionStart": row.session_start_time.isoformat(),
+            "session_id": row.session_id,
+            "record_id": row.lpr_record_id,
+            "spot_id": row.spot_id,
+            "parking_spot_name": row.parking_spot_name,
+            "title": row.lpr_number.upper() if row.lpr_number else f"{row.parking_spot_name}",
+            "isWaitingForPayment": row.is_waiting_for_payment,
+            "isWaitingForReservation": False,
+            "text_to_show": "waiting for grace period" if row.is_waiting_for_payment else None,
+            "total_paid_price": row.total_paid_amount,
+            "is_active": row.is_active,
+            "events": []
+        }
+
+    @staticmethod
+    def audit_event_entry(row, providers_dict: dict) -> dict:
+        """The event of a log row, with its provider and, unless it is a sent violation, the paid amount."""
+        event = {
+            "type": row.action_type,
+            "description": row.description,
+            "timestamp": row.log_created_at.isoformat()
+        }
+
+        provider_data = providers_dict.get(row.provider)
+        if provider_data is not None:
+            event["provider"] = provider_data.get("name", "")
+
+            if not row.action_type.startswith(enum.EventsForSessionLog.VIOLATION_SENT.value):
+                price_paid = row.meta_info.get('price_paid') if row.meta_info else None
+                paid_price = float(price_paid) if price_paid is not None else 0.0
+                event["amount"] = "{:.2f}".format(paid_price)
+
+        return event
+
+    @staticmethod
+    def export_sessions_v3(db: Session,
+                           parking_lot_id: int,
+                           start_date_time: datetime,
+                           end_date_time: datetime,
+                           session_type,
+                           provider,
+                           plate_number_or_spot,
+                           export_format: str,
+                           similar_plates: bool = False):
+        """
+        Checks the request and returns the chunks of the export, produced lazily by iter_export so
+        the sessions are read while the response is being sent.
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported export format: {export_format}")
+
+        lot_id = base.ConnectParkinglot.get_connect_parking_lot_id(db, parking_lot_id)
+        if not lot_id:
+            raise HTTPException(status_code=404, detail="Parking lot is not registered")
+
+        plate_max_distance = SessionManager.similar_plate_distance(db, parking_lot_id, similar_plates)
+        return SessionManager.iter_export(parking_lot_id, start_date_time, end_date_time, session_type, provider,
+                                          plate_number_or_spot, plate_max_distance, export_format)
+
+    @staticmethod
+    def iter_export(parking_lot_id, start_date_time, end_date_time, session_type, provider,
+                    plate_number_or_spot, plate_max_distance, export_format):
+        """
+        One NDJSON line per session with its events, or one CSV row per event. Uses its own database
+        session, the response is still being produced after the request's session is closed.
+        """
+        db = SessionLocal()
+        try:
+            providers_dict = {provider.id: {
+                "name": provider.name,
+                "logo": provider.logo
+            } for provider in base.Provider.get_all_providers(db)}
+
+            rows = base.Sessions.iter_audit_timeline(db,
+                                                     parking_lot_id,
+                                                     start_date_time,
+                                                     end_date_time,
+                                                     session_type,
+                                                     provider,
+                                                     plate_number_or_spot,
+                                                     plate_max_distance,
+                                                     yield_per=settings.AUDIT_EXPORT_YIELD_PER)
+
+            if export_format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(EXPORT_CSV_COLUMNS)
+                yield buffer.getvalue()
+
+            for _, session_rows in groupby(rows, key=attrgetter("session_id")):
+                session = None
+                for row in session_rows:
+                    if session is None:
+                        session = SessionManager.audit_session_entry(row)
+                    session["events"].append(SessionManager.audit_event_entry(row, providers_dict))
+
+                if export_format == "csv":
+                    buffer.seek(0)
+                    buffer.truncate()
+                    for event in session["events"]:
+                        writer.writerow([session["session_id"], session["sessionStart"], session["title"],
+                                         session["record_id"], session["spot_id"], session["parking_spot_name"],
+                                         session["is_active"], session["isWaitingForPayment"],
+                                         session["total_paid_price"], event["type"], event["description"],
+                                         event["timestamp"], event.get("provider"), event.get("amount")])
+                    yield buffer.getvalue()
+                else:
+                    yield json.dumps(session) + "\n"
+        finally:
+            db.close()
+
     @staticmethod
     def check_session_on_car_entry(db: Session, lpr: str, parking_lot: int):
         return base.Sessions.get_session_by_plate(db, lpr, parking_lot)
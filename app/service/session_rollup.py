@@ -0,0 +1,95 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from app.config import settings, redis_client
+from app.models import base
+from app.models.session_stats_hourly import DIRTY_SESSIONS_KEY, DIRTY_LOTS_KEY
+
+logger = logging.getLogger(__name__)
+
+HOUR = timedelta(hours=1)
+STATS_KEYS = ("total_sessions", "active_sessions", "in_grace_period", "violations")
+
+
+def _naive_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def _floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+class SessionRollup:
+    """
+    Audit dashboard counts served from session_stats_hourly.
+
+    A window is answered with the sum of its whole hours from the rollup and the raw counts of the
+    partial hours at both ends, so a month is a sum over about 720 buckets plus two small queries.
+    compact() keeps the buckets current, it runs every minute and recomputes the buckets of the
+    sessions changed since its last run. Changes are only recorded while SESSION_ROLLUP_ENABLED is
+    on, so the rollup is filled with rebuild() (app/scripts/rebuild_session_rollup.py) right after
+    turning it on, the hours not rebuilt yet count as empty until it finishes.
+    """
+
+    @staticmethod
+    def stats(db: Session, parking_lot_id: int, from_date: datetime, to_date: datetime) -> dict:
+        from_date, to_date = _naive_utc(from_date), _naive_utc(to_date)
+        first_hour = _floor_hour(from_date)
+        if first_hour < from_date:
+            first_hour += HOUR
+        last_hour = _floor_hour(to_date)
+
+        if first_hour >= last_hour:
+            return base.Sessions.get_audit_stats(db, parking_lot_id, from_date, to_date, None, None, None)
+
+        parts = [base.SessionStatsHourly.sum_range(db, parking_lot_id, first_hour, last_hour),
+                 # BETWEEN includes to_date, the last partial hour always has to be read
+                 base.Sessions.get_audit_stats(db, parking_lot_id, last_hour, to_date, None, None, None)]
+        if from_date < first_hour:
+            parts.append(base.Sessions.get_audit_stats(db, parking_lot_id, from_date,
+                                                       first_hour - timedelta(microseconds=1), None, None, None))
+
+        return {key: sum(part[key] for part in parts) for key in STATS_KEYS}
+
+    @staticmethod
+    def compact(db: Session) -> int:
+        """Recomputes the buckets of the sessions and lots marked since the last run, returns the session count."""
+        compacted = 0
+        while True:
+            session_ids = [int(session_id) for session_id in
+                           redis_client.spop(DIRTY_SESSIONS_KEY, settings.SESSION_ROLLUP_BATCH_SIZE) or []]
+            if not session_ids:
+                break
+            try:
+                base.SessionStatsHourly.refresh(db, base.SessionStatsHourly.buckets_of_sessions(db, session_ids))
+            except Exception:
+                db.rollback()
+                # picked up again by the next run
+                redis_client.sadd(DIRTY_SESSIONS_KEY, *session_ids)
+                raise
+            compacted += len(session_ids)
+
+        parking_lot_ids = [int(parking_lot_id) for parking_lot_id in
+                           redis_client.spop(DIRTY_LOTS_KEY, settings.SESSION_ROLLUP_BATCH_SIZE) or []]
+        if parking_lot_ids:
+            try:
+                base.SessionStatsHourly.refresh(db, base.SessionStatsHourly.buckets_of_lots(db, parking_lot_ids))
+            except Exception:
+                db.rollback()
+                redis_client.sadd(DIRTY_LOTS_KEY, *parking_lot_ids)
+                raise
+
+        return compacted
+
+    @staticmethod
+    def rebuild(db: Session, since: datetime, until: datetime = None):
+        """Recomputes every bucket of every lot from since to until (now by default), a day at a time."""
+        day_start = _floor_hour(_naive_utc(since))
+        until = _naive_utc(until) if until else datetime.utcnow()
+        while day_start < until:
+            day_end = min(day_start + timedelta(days=1), _floor_hour(until) + HOUR)
+            base.SessionStatsHourly.refresh(db, base.SessionStatsHourly.buckets_between(db, day_start, day_end))
+            logger.info(f"Session rollup rebuilt from {day_start} to {day_end}.")
+            day_start = day_end
@@ -0,0 +1,111 @@
+import logging
+import signal
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from app.config import settings, redis_client
+from app.models.catalog_cache import warm_up_catalog_cache
+from app.models.context_session import get_db_session, remove_db_session, get_pool_metrics
+from app.service.task_service import TaskService
+from app.utils.common import calculate_time_differece
+from app.utils.slack_utils import notify_task_failure
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_KEY = "huey_worker_heartbeat"
+MAX_ERROR_BACKOFF_SEC = 60
+
+
+class TaskDispatcher:
+    """
+    Runs continuously and drains due tasks with a bounded pool of worker threads.
+
+    Each worker claims its own batch through Task.get_task_to_execute (FOR UPDATE SKIP LOCKED),
+    so several dispatcher processes or containers can run side by side without picking the same task.
+    A worker keeps claiming batches until nothing is due and then sleeps for the poll interval,
+    after a failed batch it backs off exponentially up to MAX_ERROR_BACKOFF_SEC. On stop every
+    worker finishes the batch it has claimed. Tasks of a failed partition are put back to PENDING
+    by TaskService, tasks of a worker that died are claimed again after TASK_CLAIM_TIMEOUT_SEC.
+    """
+
+    def __init__(self, workers: int = None, poll_interval: float = None):
+        self.workers = workers or settings.TASK_DISPATCHER_WORKERS
+        self.poll_interval = poll_interval or settings.TASK_DISPATCHER_POLL_INTERVAL_SEC
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def start(self):
+        warm_up_catalog_cache()
+        for worker_id in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, args=(worker_id,),
+                                      name=f"task-dispatcher-{worker_id}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Task dispatcher started with {self.workers} workers.")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+        logger.info("Task dispatcher stopped.")
+
+    def run_forever(self):
+        signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        signal.signal(signal.SIGINT, lambda *_: self.stop())
+        self.start()
+        while not self._stop_event.is_set():
+            self._stop_event.wait(self.poll_interval)
+        self.join()
+
+    def _worker_loop(self, worker_id: int):
+        failures = 0
+        while not self._stop_event.is_set():
+            processed = self._process_batch(worker_id)
+            if processed is None:
+                failures += 1
+                self._stop_event.wait(min(self.poll_interval * 2 ** failures, MAX_ERROR_BACKOFF_SEC))
+                continue
+            failures = 0
+            if not processed:
+                self._stop_event.wait(self.poll_interval)
+
+    def _process_batch(self, worker_id: int) -> Optional[int]:
+        """Returns the number of tasks processed, None when the batch failed."""
+        start_time = time.time()
+        db_session = None
+        processed = None
+
+        try:
+            redis_client.set(HEARTBEAT_KEY, datetime.utcnow().isoformat())
+            db_session = get_db_session()
+            processed = TaskService.process_task(db_session)
+        except Exception as e:
+            logger.error(f"Worker {worker_id}: error processing task: {e}")
+            if db_session is not None:
+                db_session.rollback()
+            try:
+                notify_task_failure(e)
+            except Exception as alert_error:
+                logger.error(f"Worker {worker_id}: failed to send task failure alert: {alert_error}")
+        finally:
+            remove_db_session()
+
+        if processed:
+            total_time = calculate_time_differece(start_time)
+            logger.info(f"Worker {worker_id}: processed {processed} tasks in {total_time:.2f} seconds. "
+                        f"DB pool: {get_pool_metrics()}")
+        return processed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=settings.LOG_LEVEL,
+                        format="%(asctime)s : %(levelname).4s - %(message)s - [%(name)s]")
+    if not settings.TASK_DISPATCHER_ENABLED:
+        # tasks are processed by the one-minute process_task cron instead
+        logger.info("Task dispatcher disabled, TASK_DISPATCHER_ENABLED is off.")
+    else:
+        TaskDispatcher().run_forever()
@@ -1,5 +1,9 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import List
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.utils import enum
 from app.utils.email import send_email
 from app import schema
@@ -9,9 +13,14 @@ from app.models.violation import Violation
 from app.utils.common import car_identification_log
 import time
 from app.utils.common import calculate_time_differece
+from app.models.context_session import get_db_session, remove_db_session
+from app.utils.slack_utils import notify_task_failure
 
 logger = logging.getLogger(__name__)
 
+# partitions of different sessions run concurrently, tasks of one session stay in order
+task_executor = ThreadPoolExecutor(max_workers=settings.TASK_EXECUTOR_WORKERS, thread_name_prefix="task-executor")
+
 
 class TaskService:
 
@@ -19,21 +28,22 @@ class TaskService:
     def create_task(db: Session, task_create_schema: schema.TaskCreateSchema, sub_tasks):
         task = Task.create_task(db, task_create_schema)
         if task.status != enum.TaskStatus.COMPLETED.value:
+            sub_task_schemas = []
             for sub_task in sub_tasks:
                 if isinstance(sub_task, dict):
-                    TaskService.create_sub_task(
-                        db,
-                        task=task,
+                    sub_task_schemas.append(schema.SubTaskCreateSchema(
                         provider_creds_id=sub_task.get('provider_creds_id'),
-                        feature_url_path_id=sub_task.get('feature_url_path_id')
-                    )
+                        feature_url_path=sub_task.get('feature_url_path_id'),
+                        task_id=task.id
+                    ))
                 elif isinstance(sub_task, SubTask):
-                    TaskService.create_sub_task(
-                        db,
-                        task=task,
+                    sub_task_schemas.append(schema.SubTaskCreateSchema(
                         provider_creds_id=sub_task.provider_creds_id,
-                        feature_url_path_id=sub_task.feature_url_path
-                    )
+                        feature_url_path=sub_task.feature_url_path,
+                        task_id=task.id
+                    ))
+            if sub_task_schemas:
+                SubTask.create_sub_tasks(db, sub_task_schemas)
             return task
 
     @staticmethod
@@ -48,37 +58,101 @@ class TaskService:
     def process_task(db: Session):
         """
         function to process all pending tasks scheduled in a defined time frame.
+        Returns the number of tasks processed.
         """
         tasks = Task.get_task_to_execute(db)
+        partitions = TaskService.partition_by_session(tasks)
+
+        if len(partitions) <= 1 or settings.TASK_EXECUTOR_WORKERS <= 1:
+            for partition in partitions:
+                try:
+                    TaskService.execute_partition(db, partition)
+                    db.commit()
+                except Exception as e:
+                    TaskService.release_partition(db, partition, e)
+        else:
+            # a failed partition is released by its own thread, the others are committed
+            wait([task_executor.submit(TaskService.execute_partition_in_thread, partition)
+                  for partition in partitions])
+
+        db.commit()
+        db.expire_all()
+        # close only this session, dispatcher workers share the process
+        db.close()
+        return len(tasks)
+
+    @staticmethod
+    def partition_by_session(tasks: List[Task]) -> List[List[Task]]:
+        """
+        Splits claimed tasks into per-session partitions, keeping the claim order inside each one.
+        Tasks without a session are independent and get a partition of their own.
+        """
+        partitions = {}
         for task in tasks:
+            key = ('session', task.session_id) if task.session_id is not None else ('task', task.id)
+            partitions.setdefault(key, []).append(task)
+        return list(partitions.values())
+
+    @staticmethod
+    def execute_partition_in_thread(tasks: List[Task]):
+        db = get_db_session()
+        try:
+            # attach the already loaded rows to this thread's session without re-selecting them
+            TaskService.execute_partition(db, [db.merge(task, load=False) for task in tasks])
+            db.commit()
+        except Exception as e:
+            TaskService.release_partition(db, tasks, e)
+        finally:
+            remove_db_session()
 
-            car_identification = car_identification_log(task)
+    @staticmethod
+    def release_partition(db: Session, tasks: List[Task], error: Exception):
+        """
+        Rolls back a failed partition and puts its unfinished tasks back to PENDING, retried after
+        TASK_RETRY_BACKOFF_SEC. Tasks of the partition that were closed before the error stay closed.
+        """
+        session_id, task_ids = tasks[0].session_id, [task.id for task in tasks]
+        logger.error(f"Error processing tasks {task_ids} of session {session_id}: {error}")
+        db.rollback()
+        try:
+            Task.release_tasks(db, task_ids, datetime.utcnow() + timedelta(seconds=settings.TASK_RETRY_BACKOFF_SEC))
+        except Exception as release_error:
+            db.rollback()
+            logger.error(f"Tasks {task_ids} not released, reclaimed after the claim timeout: {release_error}")
+        try:
+            notify_task_failure(error)
+        except Exception as alert_error:
+            logger.error(f"Failed to send task failure alert: {alert_error}")
 
-            task_start_time = time.time()
-            logger.debug(f"Task: {task.id} / {car_identification} - Task processing begins.")
+    @staticmethod
+    def execute_partition(db: Session, tasks: List[Task]):
+        for task in tasks:
+            TaskService.execute_task(db, task)
 
-            provider_type = ProviderTypes.get_by_id(db, task.provider_type)
+    @staticmethod
+    def execute_task(db: Session, task):
+        car_identification = car_identification_log(task)
 
-            if provider_type.text_key == enum.ProviderTypes.PROVIDER_RESERVATION.value and task.status != enum.TaskStatus.CLOSED.value:
-                TaskService.process_reservation_task(db, task)
+        task_start_time = time.time()
+        logger.debug(f"Task: {task.id} / {car_identification} - Task processing begins.")
 
-            if provider_type.text_key == enum.ProviderTypes.PAYMENT_PROVIDER.value and task.status != enum.TaskStatus.CLOSED.value:
-                TaskService.process_payment_task(db, task)
+        provider_type = ProviderTypes.get_by_id(db, task.provider_type)
 
-            if provider_type.text_key == enum.ProviderTypes.PROVIDER_ENFORCEMENT.value and task.status != enum.TaskStatus.CLOSED.value:
-                TaskService.process_enforceability_task(db, task)
+        if provider_type.text_key == enum.ProviderTypes.PROVIDER_RESERVATION.value and task.status != enum.TaskStatus.CLOSED.value:
+            TaskService.process_reservation_task(db, task)
 
-            if provider_type.text_key == enum.ProviderTypes.PROVIDER_VIOLATION.value and task.status != enum.TaskStatus.CLOSED.value:
-                TaskService.process_violation_task(db, task)
+        if provider_type.text_key == enum.ProviderTypes.PAYMENT_PROVIDER.value and task.status != enum.TaskStatus.CLOSED.value:
+            TaskService.process_payment_task(db, task)
 
-            Task.close_task(db, task)
-            total_time = calculate_time_differece(task_start_time)
-            logging.info(f"Task: {task.id} / {car_identification} - completed in {total_time:.2f} seconds.")
+        if provider_type.text_key == enum.ProviderTypes.PROVIDER_ENFORCEMENT.value and task.status != enum.TaskStatus.CLOSED.value:
+            TaskService.process_enforceability_task(db, task)
 
-        db.commit()
-        db.expire_all()
-        db.close_all()
+        if provider_type.text_key == enum.ProviderTypes.PROVIDER_VIOLATION.value and task.status != enum.TaskStatus.CLOSED.value:
+            TaskService.process_violation_task(db, task)
 
+        Task.close_task(db, task)
+        total_time = calculate_time_differece(task_start_time)
+        logging.info(f"Task: {task.id} / {car_identification} - completed in {total_time:.2f} seconds.")
 
     @staticmethod
     def process_payment_task(db: Session, task):
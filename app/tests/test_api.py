@@ -1,5 +1,6 @@
+import json
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from app.api.subscribe_api import *
 
 
@@ -26,6 +27,35 @@ class TestSubscribeApi(unittest.TestCase):
         response = subscribe_sg(test_data)
         self.assertEqual(response.status_code, 200)
 
+    @patch.object(config.settings, "SG_EVENT_INGEST_ASYNC", True)
+    @patch.object(EventIngest, "enqueue", side_effect=RedisError("Connection refused"))
+    def test_subscribe_sg_queue_unavailable(self, enqueue):
+        test_data = {
+            "parking_lot_id": 2,
+            "event_key": "lpr_entry",
+            "license_plate": "ABC1",
+            "entry_time": "2024-02-22T08:02:00.488778",
+            "timestamp": "2024-02-22T08:02:00.488778",
+        }
+        response = subscribe_sg(test_data, db=MagicMock())
+        enqueue.assert_called_once()
+        self.assertEqual(response.status_code, 503)
+
+    @patch.object(config.settings, "SG_EVENT_INGEST_ASYNC", True)
+    @patch.object(EventIngest, "enqueue_many", side_effect=RedisError("Connection refused"))
+    def test_subscribe_sg_batch_queue_unavailable(self, enqueue_many):
+        test_data = [{
+            "parking_lot_id": 2,
+            "event_key": "lpr_entry",
+            "license_plate": "ABC1",
+            "entry_time": "2024-02-22T08:02:00.488778",
+            "timestamp": "2024-02-22T08:02:00.488778",
+        }]
+        response = subscribe_sg_batch(test_data, db=MagicMock())
+        enqueue_many.assert_called_once()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(json.loads(response.body), {"message": "Event queue unavailable"})
+
 
 class TestSubscribeArrive(unittest.TestCase):
 
@@ -129,3 +159,26 @@ class TestSubscribeArrive(unittest.TestCase):
         self.assertEqual(response.status_code, 204)
         db_mock.query.assert_called_once_with(base.ProviderCreds)
         db_mock.create.assert_not_called()
+
+
+class TestAuditStatsApi(unittest.TestCase):
+
+    def test_missing_bounds_share_one_window(self):
+        from datetime import datetime
+        import pytz
+        from app.api import session_logs
+
+        now = [datetime(2024, 3, 21, 10, 15, 7, 1837, tzinfo=pytz.utc),
+               datetime(2024, 3, 21, 10, 15, 7, 2000, tzinfo=pytz.utc),
+               datetime(2024, 3, 21, 10, 15, 41, tzinfo=pytz.utc),
+               datetime(2024, 3, 21, 10, 15, 42, tzinfo=pytz.utc)]
+        with patch.object(session_logs, "datetime") as mock_datetime, \
+                patch.object(session_logs.SessionManager, "fetch_session_stats") as fetch_session_stats:
+            mock_datetime.now.side_effect = now
+            session_logs.get_event_session_stats(parking_lot_id=7, db=MagicMock())
+            session_logs.get_event_session_stats(parking_lot_id=7, db=MagicMock())
+
+        first, second = [call.args[1:4] for call in fetch_session_stats.call_args_list]
+        self.assertEqual(first, second)
+        self.assertEqual(first, (7, datetime(2024, 3, 21, 10, 15, tzinfo=pytz.utc),
+                                 datetime(2024, 3, 21, 10, 16, tzinfo=pytz.utc)))
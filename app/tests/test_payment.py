@@ -13,3 +13,23 @@ def test_payment_not_paid(mock_get_db):
     with patch('app.service.payment_service.PaymentService.not_paid') as mock_payment_service_paid:
         TaskService.process_payment_task(mock_get_db, task)
         mock_payment_service_paid.assert_called_once_with(task=task, db=mock_get_db)
+
+
+def test_provider_lookups_leave_the_task_transaction_open():
+    from types import SimpleNamespace
+    from unittest.mock import Mock
+    from app.service.features import check_payment_by_lpr
+
+    db = Mock()
+    lookups = [SimpleNamespace(sub_task=SimpleNamespace(id=sub_task_id), feature=SimpleNamespace(id=2),
+                               provider_creds=SimpleNamespace(id=3), provider=SimpleNamespace(id=4),
+                               response_schema={}) for sub_task_id in (10, 11)]
+
+    with patch.object(check_payment_by_lpr.settings, "PROVIDER_LOOKUP_WORKERS", 2), \
+            patch.object(check_payment_by_lpr, "provider_lookup_executor") as executor:
+        pending = CheckPaymentByLPR.submit_provider_lookups(db, SimpleNamespace(id=460), SimpleNamespace(id=1),
+                                                            lookups, 2)
+
+    assert len(pending) == 2
+    assert [call.args[3][0] for call in executor.submit.call_args_list] == [10, 11]
+    db.commit.assert_not_called()
@@ -1,8 +1,14 @@
 import unittest
-from unittest.mock import Mock
+from unittest.mock import MagicMock, Mock, patch
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.orm import Session
-from app.models.base import Task, SubTask
+from app.models.base import Task, SubTask, ProviderConnect
+from app.models.context_session import unit_of_work, commit_or_flush, after_commit
+from app.config import settings
+from app.service.event_ingest import EventIngest, EventConsumer
+from app.service.event_service import EventService
 from app.service import TaskService
+from app.service.task_dispatcher import TaskDispatcher
 from app import schema
 from app.utils.enum import TaskStatus
 
@@ -25,3 +31,558 @@ class TestTaskService(unittest.TestCase):
 
         self.assertEqual(result, task)
         Task.create_task.assert_called_with(db, task_create_schema)
+
+
+class TestTaskExecutionOrder(unittest.TestCase):
+
+    def test_order_by_execution_priority(self):
+        payment = Task(id=1, session_id=7, feature_text_key="payment.check.lpr")
+        reservation = Task(id=2, session_id=7, feature_text_key="reservation.check.lpr")
+        notify = Task(id=3, session_id=7, feature_text_key="notify.sg.admin")
+        other_session = Task(id=4, session_id=5, feature_text_key="payment.check.lpr")
+        no_session = Task(id=5, session_id=None, feature_text_key="payment.check.spot")
+
+        result = Task.order_by_execution_priority([no_session, payment, reservation, notify, other_session])
+
+        self.assertEqual([task.id for task in result], [4, 3, 2, 1, 5])
+
+    def test_partition_by_session(self):
+        first = Task(id=1, session_id=7, feature_text_key="reservation.check.lpr")
+        second = Task(id=2, session_id=7, feature_text_key="payment.check.lpr")
+        other_session = Task(id=3, session_id=5, feature_text_key="payment.check.lpr")
+        no_session = Task(id=4, session_id=None, feature_text_key="payment.check.spot")
+
+        partitions = TaskService.partition_by_session([first, second, other_session, no_session])
+
+        self.assertEqual([[task.id for task in partition] for partition in partitions], [[1, 2], [3], [4]])
+
+    @patch.object(settings, "TASK_EXECUTOR_WORKERS", 2)
+    @patch("app.service.task_service.notify_task_failure")
+    @patch("app.service.task_service.remove_db_session")
+    @patch("app.service.task_service.get_db_session")
+    def test_failed_partition_is_released(self, get_db_session, remove_db_session, notify_task_failure):
+        failing = Task(id=1, session_id=7, feature_text_key="payment.check.lpr")
+        other_session = Task(id=2, session_id=5, feature_text_key="payment.check.lpr")
+        thread_db = Mock(spec=Session)
+        thread_db.merge.side_effect = lambda task, load: task
+        get_db_session.return_value = thread_db
+        db = Mock(spec=Session)
+
+        def execute_task(db, task):
+            if task.id == 1:
+                raise ValueError("provider down")
+
+        with patch.object(Task, "get_task_to_execute", return_value=[failing, other_session]), \
+                patch.object(TaskService, "execute_task", side_effect=execute_task), \
+                patch.object(Task, "release_tasks") as release_tasks:
+            processed = TaskService.process_task(db)
+
+        self.assertEqual(processed, 2)
+        release_tasks.assert_called_once()
+        self.assertEqual(release_tasks.call_args[0][1], [1])
+        thread_db.rollback.assert_called_once()
+        notify_task_failure.assert_called_once()
+
+
+class TestTaskClaim(unittest.TestCase):
+
+    def test_stale_in_progress_tasks_are_reclaimed(self):
+        from sqlalchemy.dialects import postgresql
+
+        db = Mock(spec=Session)
+        db.expire_on_commit = True
+        db.scalars.return_value.all.return_value = []
+
+        Task.get_task_to_execute(db)
+
+        claim_sql = str(db.scalars.call_args[0][0].compile(dialect=postgresql.dialect()))
+        self.assertIn("FOR UPDATE SKIP LOCKED", claim_sql)
+        self.assertIn("coalesce(task.claimed_at, task.updated_at) < now() -", claim_sql)
+        self.assertIn("claimed_at=now()", claim_sql)
+        db.commit.assert_called_once()
+        self.assertTrue(db.expire_on_commit)
+
+
+class TestTaskDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = TaskDispatcher(workers=2, poll_interval=0.5)
+
+    @patch("app.service.task_dispatcher.warm_up_catalog_cache")
+    def test_start_and_stop(self, warm_up_catalog_cache):
+        with patch.object(TaskDispatcher, "_process_batch", return_value=0) as process_batch:
+            self.dispatcher.start()
+            self.assertTrue(all(thread.is_alive() for thread in self.dispatcher._threads))
+
+            self.dispatcher.stop()
+            self.dispatcher.join()
+
+        warm_up_catalog_cache.assert_called_once()
+        self.assertEqual(len(self.dispatcher._threads), 2)
+        self.assertFalse(any(thread.is_alive() for thread in self.dispatcher._threads))
+        self.assertGreaterEqual(process_batch.call_count, 2)
+
+    def test_stop_lets_the_claimed_batch_finish(self):
+        def process_batch(worker_id):
+            self.dispatcher.stop()
+            return 5
+
+        with patch.object(TaskDispatcher, "_process_batch", side_effect=process_batch) as batch:
+            self.dispatcher._worker_loop(0)
+
+        batch.assert_called_once_with(0)
+
+    def test_idle_and_error_backoff(self):
+        results = iter([None, None, None, 3, 0, None])
+        waits = []
+
+        def wait(timeout):
+            waits.append(timeout)
+            if len(waits) == 5:
+                self.dispatcher.stop()
+
+        with patch.object(TaskDispatcher, "_process_batch", side_effect=lambda worker_id: next(results)), \
+                patch.object(self.dispatcher._stop_event, "wait", side_effect=wait):
+            self.dispatcher._worker_loop(0)
+
+        # 3 failures back off exponentially, a full batch is followed at once by the next claim
+        self.assertEqual(waits, [1.0, 2.0, 4.0, 0.5, 1.0])
+
+    @patch("app.service.task_dispatcher.notify_task_failure")
+    @patch("app.service.task_dispatcher.remove_db_session")
+    @patch("app.service.task_dispatcher.redis_client")
+    @patch("app.service.task_dispatcher.get_db_session")
+    def test_failed_batch_is_rolled_back(self, get_db_session, redis_client, remove_db_session,
+                                         notify_task_failure):
+        with patch.object(TaskService, "process_task", side_effect=OperationalError("UPDATE", {}, Exception())):
+            processed = self.dispatcher._process_batch(0)
+
+        self.assertIsNone(processed)
+        get_db_session.return_value.rollback.assert_called_once()
+        remove_db_session.assert_called_once()
+        notify_task_failure.assert_called_once()
+
+
+class TestUnitOfWork(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Mock(spec=Session)
+        self.db.info = {}
+        self.db.in_transaction.return_value = False
+
+    def test_commits_once(self):
+        update_alert = Mock()
+
+        with unit_of_work(self.db):
+            commit_or_flush(self.db)
+            after_commit(self.db, update_alert, "alert")
+            commit_or_flush(self.db)
+            update_alert.assert_not_called()
+
+        self.db.begin.assert_called_once()
+        self.assertEqual(self.db.flush.call_count, 2)
+        self.db.commit.assert_called_once()
+        self.db.rollback.assert_not_called()
+        update_alert.assert_called_once_with("alert")
+        self.assertEqual(self.db.info, {})
+
+    def test_rolls_back_on_error(self):
+        update_alert = Mock()
+
+        with self.assertRaises(ValueError):
+            with unit_of_work(self.db):
+                commit_or_flush(self.db)
+                after_commit(self.db, update_alert, "alert")
+                raise ValueError("failed")
+
+        self.db.commit.assert_not_called()
+        self.db.rollback.assert_called_once()
+        update_alert.assert_not_called()
+
+    def test_failed_nested_block_drops_its_calls(self):
+        kept, dropped = Mock(), Mock()
+        self.db.begin_nested.return_value = MagicMock()
+        self.db.begin_nested.return_value.__exit__.return_value = False
+
+        with unit_of_work(self.db):
+            after_commit(self.db, kept)
+            with self.assertRaises(ValueError):
+                with unit_of_work(self.db):
+                    after_commit(self.db, dropped)
+                    raise ValueError("failed")
+
+        self.db.begin_nested.assert_called_once()
+        kept.assert_called_once()
+        dropped.assert_not_called()
+
+    def test_helpers_commit_outside_a_unit_of_work(self):
+        update_alert = Mock()
+
+        commit_or_flush(self.db)
+        after_commit(self.db, update_alert, "alert")
+
+        self.db.commit.assert_called_once()
+        self.db.flush.assert_not_called()
+        update_alert.assert_called_once_with("alert")
+
+
+class TestEventIngest(unittest.TestCase):
+
+    def test_events_of_a_lot_share_a_partition(self):
+        partitions = {EventIngest.partition_for(lot_id) for lot_id in range(100)}
+
+        self.assertEqual(EventIngest.partition_for(42), EventIngest.partition_for("42"))
+        self.assertTrue(partitions <= set(range(settings.SG_EVENT_PARTITIONS)))
+        self.assertGreater(len(partitions), 1)
+
+    @patch("app.service.event_ingest.send_slack_notification")
+    @patch("app.service.event_ingest.redis_client")
+    def test_queue_depth_alert_is_suppressed_after_limit(self, redis_client, send_slack_notification):
+        redis_client.incr.side_effect = range(1, 10)
+
+        for _ in range(settings.SLACK_ALERT_LIMIT + 2):
+            EventIngest.alert_queue_depth(settings.SG_EVENT_QUEUE_DEPTH_ALERT)
+        EventIngest.alert_queue_depth(0)
+
+        self.assertEqual(send_slack_notification.call_count, settings.SLACK_ALERT_LIMIT)
+        redis_client.delete.assert_called_once()
+
+    @patch("app.service.event_ingest.redis_client")
+    def test_enqueue_does_not_trim_the_stream(self, redis_client):
+        EventIngest.enqueue_many([({"event_key": "car.entry"}, 3)])
+
+        args, kwargs = redis_client.pipeline.return_value.xadd.call_args
+        self.assertNotIn("maxlen", kwargs)
+
+
+class TestEventConsumer(unittest.TestCase):
+
+    def setUp(self):
+        self.consumer = EventConsumer()
+        self.fields = {"payload": "{}"}
+
+    def handle(self, redis_client, times_delivered=1):
+        redis_client.xpending_range.return_value = [{"message_id": "1-0", "times_delivered": times_delivered}]
+        self.consumer._handle("sg_events:0", "worker", 0, "1-0", self.fields)
+
+    @patch("app.service.event_ingest.redis_client")
+    def test_transient_error_is_retried_and_counted(self, redis_client):
+        with patch.object(EventConsumer, "_apply", side_effect=OperationalError("SELECT 1", {}, Exception())):
+            with self.assertRaises(OperationalError):
+                self.handle(redis_client)
+
+        redis_client.xclaim.assert_called_once_with("sg_events:0", "sg_event_consumers", "worker", 0, ["1-0"])
+        redis_client.xadd.assert_not_called()
+
+    @patch("app.service.event_ingest.redis_client")
+    def test_other_error_is_dead_lettered(self, redis_client):
+        with patch.object(EventConsumer, "_apply", side_effect=IntegrityError("INSERT", {}, Exception())):
+            self.handle(redis_client)
+
+        redis_client.xclaim.assert_not_called()
+        stream, fields = redis_client.xadd.call_args[0]
+        self.assertEqual(stream, "sg_events:dead")
+        self.assertEqual(fields["payload"], "{}")
+
+    @patch("app.service.event_ingest.redis_client")
+    def test_event_dead_lettered_after_max_deliveries(self, redis_client):
+        with patch.object(EventConsumer, "_apply") as apply:
+            self.handle(redis_client, times_delivered=settings.SG_EVENT_MAX_DELIVERIES + 1)
+
+        apply.assert_not_called()
+        self.assertEqual(redis_client.xadd.call_args[0][0], "sg_events:dead")
+
+    @patch("app.service.event_ingest.renew_lease")
+    @patch("app.service.event_ingest.redis_client")
+    def test_partition_left_when_lease_is_lost(self, redis_client, renew_lease):
+        redis_client.set.return_value = True
+        redis_client.xinfo_consumers.return_value = []
+        redis_client.xreadgroup.return_value = [["sg_events:0", [("1-0", self.fields), ("2-0", self.fields)]]]
+        renew_lease.side_effect = lambda keys, args: self.consumer._stop_event.set()
+
+        with patch.object(EventConsumer, "_handle") as handle:
+            self.consumer._partition_loop(0)
+
+        handle.assert_not_called()
+        redis_client.xack.assert_not_called()
+
+    @patch("app.service.event_ingest.redis_client")
+    def test_stale_entries_claimed_before_new_ones(self, redis_client):
+        redis_client.xreadgroup.return_value = [["sg_events:0", []]]
+        redis_client.xautoclaim.return_value = ["0-0", [("1-0", self.fields)], []]
+
+        self.assertEqual(self.consumer._read("sg_events:0", "worker"), [("1-0", self.fields)])
+        self.assertEqual(redis_client.xreadgroup.call_count, 1)
+
+        redis_client.xautoclaim.return_value = ["0-0", [], []]
+        redis_client.xpending.return_value = {"pending": 1}
+        with patch.object(self.consumer._stop_event, "wait"):
+            self.assertEqual(self.consumer._read("sg_events:0", "worker"), [])
+        self.assertEqual(redis_client.xreadgroup.call_count, 2)
+
+
+class TestEventBatchScope(unittest.TestCase):
+
+    def test_routing_resolved_once_per_lot_and_event(self):
+        event = Mock(event_key="car.entry")
+        routing = {"payment.check.lpr": [{"provider_creds_id": 1}]}
+
+        with patch.object(ProviderConnect, "find_providers_by_event_type_and_lot", return_value=routing) as lookup:
+            with EventService.batch_scope():
+                first = EventService.providers_for_event(None, event, 3)
+                second = EventService.providers_for_event(None, event, 3)
+            EventService.providers_for_event(None, event, 3)
+
+        self.assertEqual(first, routing)
+        self.assertEqual(second, routing)
+        self.assertIsNot(first, second)
+        self.assertEqual(lookup.call_count, 2)
+
+
+class TestPaymentSnapshot(unittest.TestCase):
+
+    def test_exact_valid_payment_answered_from_one_pull(self):
+        from app.models.base import FeatureUrlPath
+        from app.service import payment_snapshot
+        from app.service.payment_snapshot import PaymentSnapshot
+
+        feature = Mock(id=91, updated_at=None,
+                       response_schema='{"plate_number": "Code", "paid_date": "Start", "expiry_date": "End"}')
+        response = {"Payments": [
+            {"Code": "abc123", "Start": "2024-01-01T00:00:00", "End": "2099-01-01T00:00:00"},
+            {"Code": "OLD111", "Start": "2020-01-01T00:00:00", "End": "2020-01-02T00:00:00"},
+        ]}
+        lookup = Mock(provider_creds=Mock(id=5), provider=Mock(id=2))
+        lot = Mock(id=7)
+
+        with patch.object(settings, "PAYMENT_SNAPSHOT_ENABLED", True), \
+                patch.object(ProviderConnect, "get_provider_connect", return_value=Mock(facility_id="F1")), \
+                patch.object(FeatureUrlPath, "get_by_provider_and_feature", return_value=feature), \
+                patch.object(payment_snapshot.ProcessRequest, "process", return_value=response) as process:
+            payment_snapshot.payment_snapshots.invalidate()
+            paid = PaymentSnapshot.lookup(None, Mock(id=1, plate_number="ABC123"), lot, lookup)
+            expired = PaymentSnapshot.lookup(None, Mock(id=2, plate_number="OLD111"), lot, lookup)
+            unknown = PaymentSnapshot.lookup(None, Mock(id=3, plate_number="XYZ999"), lot, lookup)
+
+        self.assertEqual(paid[0]["match_lpr"], "abc123")
+        self.assertIsNone(expired)
+        self.assertIsNone(unknown)
+        self.assertEqual(process.call_count, 1)
+
+
+class TestPushPayment(unittest.TestCase):
+
+    def lookup_sql(self, lookup, value):
+        from sqlalchemy.dialects import postgresql
+
+        db = Mock(spec=Session)
+        lookup(db, value, 3)
+        query = db.query.return_value.filter.call_args[0][0]
+        return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    def test_plate_and_spot_lookups_use_lower(self):
+        from app.models.push_payment import PushPayment
+
+        plate_sql = self.lookup_sql(PushPayment.check_payment, "AbC123")
+        spot_sql = self.lookup_sql(PushPayment.check_payment_by_spot, "A-12")
+
+        self.assertIn("lower(push_payment.plate_number) = 'abc123'", plate_sql)
+        self.assertIn("lower(push_payment.spot_id) = 'a-12'", spot_sql)
+        self.assertIsNone(PushPayment.check_payment(Mock(spec=Session), None, 3))
+        self.assertIsNone(PushPayment.check_payment_by_spot(Mock(spec=Session), None, 3))
+
+    def test_archive_moves_batches_with_explicit_columns(self):
+        from datetime import datetime
+        from app.models.push_payment import PushPayment
+
+        db = Mock(spec=Session)
+        db.execute.side_effect = [Mock(rowcount=2), Mock(rowcount=2), Mock(rowcount=1)]
+
+        archived = PushPayment.archive_checked(db, datetime(2026, 1, 1), batch_size=2)
+
+        self.assertEqual(archived, 5)
+        self.assertEqual(db.commit.call_count, 3)
+        archive_sql = " ".join(str(db.execute.call_args[0][0]).split())
+        columns = ", ".join(column.name for column in PushPayment.__table__.columns)
+        self.assertIn(f"RETURNING {columns} )", archive_sql)
+        self.assertIn(f"INSERT INTO push_payment_archive ({columns}) SELECT {columns} FROM moved", archive_sql)
+        self.assertNotIn("*", archive_sql)
+
+
+class TestProviderTypes(unittest.TestCase):
+
+    @patch("app.models.catalog_cache.CatalogCache._sync")
+    def test_get_by_text_key_requires_exactly_one_row(self, _sync):
+        from sqlalchemy.exc import MultipleResultsFound, NoResultFound
+        from app.models.base import ProviderTypes
+
+        db = Mock(spec=Session)
+        for error in (NoResultFound, MultipleResultsFound):
+            db.query.return_value.filter.return_value.one.side_effect = error
+            with self.assertRaises(error):
+                ProviderTypes.get_by_text_key(db, "provider.missing")
+
+
+class TestAuditStats(unittest.TestCase):
+
+    def test_pages_of_a_window_share_one_count(self):
+        from app.models.base import Sessions
+        from app.service import session_manager
+        from app.service.session_manager import SessionManager
+
+        counts = {"total_sessions": 12, "active_sessions": 3, "in_grace_period": 1, "violations": 4}
+        window = (7, "2024-01-01T00:00:00", "2024-01-02T00:00:00", None, "2,3", None)
+
+        with patch.object(Sessions, "get_audit_stats", return_value=counts) as get_audit_stats:
+            session_manager.audit_stats.invalidate()
+            first = SessionManager.fetch_audit_stats(Mock(), *window)
+            second = SessionManager.fetch_audit_stats(Mock(), *window)
+            other_lot = SessionManager.fetch_audit_stats(Mock(), 8, *window[1:])
+
+        self.assertEqual(first, counts)
+        self.assertIs(second, first)
+        self.assertEqual(other_lot, counts)
+        self.assertEqual(get_audit_stats.call_count, 2)
+
+
+class TestSimilarPlates(unittest.TestCase):
+
+    def filter_sql(self, plate_max_distance):
+        from sqlalchemy.dialects import postgresql
+        from app.models.base import Sessions
+
+        condition = Sessions.plate_or_spot_filter(Sessions, "ab12", plate_max_distance)
+        return str(condition.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    def test_filter_adds_edit_distance_only_with_a_threshold(self):
+        similar_sql = self.filter_sql(2)
+        self.assertIn("sessions.lpr_number ILIKE '%%ab12%%'", similar_sql)
+        self.assertIn("sessions.parking_spot_name ILIKE '%%ab12%%'", similar_sql)
+        self.assertIn("levenshtein_less_equal(upper(sessions.lpr_number), 'AB12', 2) <= 2", similar_sql)
+        for plate_max_distance in (None, 0):
+            self.assertNotIn("levenshtein_less_equal", self.filter_sql(plate_max_distance))
+
+    def test_distance_is_the_lot_threshold(self):
+        from app.service.session_manager import SessionManager
+        from app.utils.sg_admin_apis import SGAdminApis
+
+        with patch.object(SGAdminApis, "lot_status") as lot_status:
+            lot_status.side_effect = [{"lpr_number_plate_text_matching_distance_thresh": 2}, None]
+            self.assertIsNone(SessionManager.similar_plate_distance(None, 7, False))
+            self.assertEqual(SessionManager.similar_plate_distance(None, 7, True), 2)
+            # no lot status, exact matches only
+            self.assertEqual(SessionManager.similar_plate_distance(None, 7, True), 0)
+        self.assertEqual(lot_status.call_count, 2)
+
+    def test_stats_cached_per_distance(self):
+        from app.models.base import Sessions
+        from app.service import session_manager
+        from app.service.session_manager import SessionManager
+
+        counts = {"total_sessions": 2, "active_sessions": 1, "in_grace_period": 0, "violations": 0}
+        window = (7, "2024-01-01T00:00:00", "2024-01-02T00:00:00", None, None, "AB12")
+
+        with patch.object(Sessions, "get_audit_stats", return_value=counts) as get_audit_stats:
+            session_manager.audit_stats.invalidate()
+            SessionManager.fetch_audit_stats(Mock(), *window)
+            SessionManager.fetch_audit_stats(Mock(), *window, 2)
+            SessionManager.fetch_audit_stats(Mock(), *window, 2)
+
+        self.assertEqual(get_audit_stats.call_count, 2)
+        self.assertEqual([call.args[-1] for call in get_audit_stats.call_args_list], [None, 2])
+
+
+class TestSessionLogBatches(unittest.TestCase):
+
+    def test_logs_loaded_once_per_batch_of_sessions(self):
+        from types import SimpleNamespace
+        from app.models.base import SessionLog
+
+        sessions = [SimpleNamespace(id=session_id) for session_id in (3, 1, 2)]
+        logs = {3: [SimpleNamespace(session_id=3, id=30)],
+                1: [SimpleNamespace(session_id=1, id=10), SimpleNamespace(session_id=1, id=11)],
+                2: []}
+        db = Mock()
+        db.query.return_value.filter.return_value.order_by.side_effect = [
+            logs[3] + logs[1], logs[2]]
+
+        batches = list(SessionLog.iter_logs_by_session(db, sessions, batch_size=2))
+
+        self.assertEqual([(session.id, [log.id for log in session_logs]) for session, session_logs in batches],
+                         [(3, [30]), (1, [10, 11]), (2, [])])
+        self.assertEqual(db.query.call_count, 2)
+
+
+class TestSessionExport(unittest.TestCase):
+
+    def test_rows_streamed_one_session_per_chunk(self):
+        import csv
+        import json
+        from datetime import datetime
+        from types import SimpleNamespace
+        from app.models.base import Provider, Sessions
+        from app.service import session_manager
+        from app.service.session_manager import SessionManager
+
+        def row(session_id, action_type, provider=None, meta_info=None):
+            return SimpleNamespace(session_id=session_id, lpr_number="abc123", spot_id=None, parking_spot_name=None,
+                                   lpr_record_id=9, is_active=True, session_start_time=datetime(2024, 1, 1, 10),
+                                   session_end_time=None, total_paid_amount=None, is_waiting_for_payment=False,
+                                   action_type=action_type, description=action_type, provider=provider,
+                                   meta_info=meta_info, log_created_at=datetime(2024, 1, 1, 10, 5))
+
+        rows = [row(2, "Entry"), row(2, "Paid", provider=4, meta_info={"price_paid": "3"}), row(1, "Entry")]
+        db = Mock()
+        with patch.object(session_manager, "SessionLocal", return_value=db), \
+                patch.object(Provider, "get_all_providers", return_value=[SimpleNamespace(id=4, name="ParkCo", logo=None)]), \
+                patch.object(Sessions, "iter_audit_timeline", side_effect=lambda *args, **kwargs: iter(rows)):
+            ndjson = list(SessionManager.iter_export(7, None, None, None, None, None, None, "ndjson"))
+            csv_chunks = list(SessionManager.iter_export(7, None, None, None, None, None, None, "csv"))
+
+        sessions = [json.loads(line) for line in ndjson]
+        self.assertEqual([(session["session_id"], len(session["events"])) for session in sessions], [(2, 2), (1, 1)])
+        self.assertEqual(sessions[0]["events"][1]["amount"], "3.00")
+        csv_rows = list(csv.reader("".join(csv_chunks).splitlines()))
+        self.assertEqual(len(csv_chunks), 3)
+        self.assertEqual([csv_row[0] for csv_row in csv_rows], ["session_id", "2", "2", "1"])
+        self.assertEqual(db.close.call_count, 2)
+
+
+class TestSessionRollup(unittest.TestCase):
+
+    def test_whole_hours_from_rollup_and_partial_hours_from_sessions(self):
+        from datetime import datetime, timedelta, timezone
+        from app.models.base import Sessions, SessionStatsHourly
+        from app.service.session_rollup import SessionRollup
+
+        def counts(total):
+            return {"total_sessions": total, "active_sessions": 1, "in_grace_period": 0, "violations": 2}
+
+        with patch.object(SessionStatsHourly, "sum_range", return_value=counts(100)) as sum_range, \
+                patch.object(Sessions, "get_audit_stats", side_effect=[counts(3), counts(5)]) as get_audit_stats:
+            stats = SessionRollup.stats(None, 7, datetime(2024, 1, 1, 8, 30, tzinfo=timezone.utc),
+                                        datetime(2024, 1, 31, 17, 45, tzinfo=timezone.utc))
+
+        self.assertEqual(stats, {"total_sessions": 108, "active_sessions": 3, "in_grace_period": 0, "violations": 6})
+        sum_range.assert_called_once_with(None, 7, datetime(2024, 1, 1, 9), datetime(2024, 1, 31, 17))
+        windows = [call.args[2:4] for call in get_audit_stats.call_args_list]
+        self.assertEqual(windows, [(datetime(2024, 1, 31, 17), datetime(2024, 1, 31, 17, 45)),
+                                   (datetime(2024, 1, 1, 8, 30), datetime(2024, 1, 1, 9) - timedelta(microseconds=1))])
+
+    def test_changes_recorded_only_while_enabled(self):
+        from types import SimpleNamespace
+        from app.models import session_stats_hourly
+        from app.models.base import Sessions, SessionStatsHourly
+
+        for enabled in (False, True):
+            session = SimpleNamespace(info={}, new=[Sessions(id=5)], dirty=[], deleted=[])
+            with patch.object(settings, "SESSION_ROLLUP_ENABLED", enabled), \
+                    patch.object(session_stats_hourly, "redis_client") as redis_client:
+                session_stats_hourly._collect_rollup_changes(session, None)
+                SessionStatsHourly.mark_lots_dirty([7])
+                session_stats_hourly._mark_rollup_changes(session)
+
+            self.assertEqual(redis_client.sadd.call_count, 2 if enabled else 0)
+            if enabled:
+                redis_client.sadd.assert_any_call(session_stats_hourly.DIRTY_SESSIONS_KEY, 5)
+                redis_client.sadd.assert_any_call(session_stats_hourly.DIRTY_LOTS_KEY, 7)
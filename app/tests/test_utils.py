@@ -110,3 +110,221 @@ def test_map_key_values():
     original_dict = {"location_id": "location_id", "license_plate": "plate_number"}
     task = Task(id=460, plate_number="ABC123", event_type='car.entry', created_at='2024-03-21 00:04:11.461')
     assert RequestHandler.map_key_values(original_dict, task)
+
+
+def test_http_client_reuses_host_pool_and_applies_host_timeout():
+    from unittest.mock import patch
+    import requests
+    from app.utils.http_client import HttpClient
+
+    client = HttpClient(pool_maxsize=5, host_pool_sizes={}, host_timeouts={"api.example.com": 5}, default_timeout=30)
+    with patch.object(requests.Session, "request") as mock_request:
+        client.get("https://api.example.com/permits", timeout=60)
+        client.post("https://api.example.com/permits")
+        client.get("https://other.example.com/permits")
+
+    assert mock_request.call_args_list[0].kwargs["timeout"] == 5
+    assert mock_request.call_args_list[1].kwargs["timeout"] == 5
+    assert mock_request.call_args_list[2].kwargs["timeout"] == 30
+    assert set(client._sessions) == {"api.example.com", "other.example.com"}
+
+
+def test_ttl_cache_single_flight_load():
+    import threading
+    import time
+    from app.utils.ttl_cache import TTLCache
+
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"lpr_number_plate_text_matching_distance_thresh": 2}
+
+    threads = [threading.Thread(target=cache.get_or_load, args=(1837, loader)) for _ in range(5)]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+
+    assert len(calls) == 1
+    assert cache.get(1837)["lpr_number_plate_text_matching_distance_thresh"] == 2
+    cache.invalidate(1837)
+    assert cache.get(1837) is None
+
+
+def test_ttl_cache_drops_load_raced_by_invalidate():
+    from app.utils.ttl_cache import TTLCache
+
+    cache = TTLCache(ttl=60)
+
+    def loader():
+        # the row changes and is invalidated while the old value is being read
+        cache.invalidate(1837)
+        return {"lpr_number_plate_text_matching_distance_thresh": 2}
+
+    assert cache.get_or_load(1837, loader)["lpr_number_plate_text_matching_distance_thresh"] == 2
+    assert cache.get(1837) is None
+
+    cache.get_or_load(1837, lambda: {"lpr_number_plate_text_matching_distance_thresh": 3})
+    assert cache.get(1837)["lpr_number_plate_text_matching_distance_thresh"] == 3
+
+
+def test_compiled_payment_schedule_matches_window_scan():
+    from datetime import datetime, time, timedelta
+    from app.models.base import ParkingTime
+    from app.utils.parking_window import ParkingWindow
+
+    slots = [ParkingTime(start_time=time(8, 0), end_time=time(12, 0)),
+             ParkingTime(start_time=time(14, 0), end_time=time(20, 30))]
+    lot = ConnectParkinglot(id=1)
+    day = datetime(2024, 3, 21)
+    schedule = ParkingWindow.compile_schedule(lot, slots, day=day.date())
+
+    for minute in range(0, 24 * 60, 15):
+        current_time = day + timedelta(minutes=minute)
+        is_paid, next_start, window_end, next_free_start = ParkingWindow.lookup_payment_window(current_time, schedule)
+        assert (is_paid, next_start, window_end) == ParkingWindow.is_in_payment_window(current_time, slots)
+        if is_paid:
+            assert next_free_start == min(
+                (datetime.combine(day.date(), slot.end_time) for slot in slots if slot.end_time > current_time.time()),
+                default=datetime.combine(day.date() + timedelta(days=1), slots[0].end_time))
+
+
+def test_render_plan_matches_placeholder_walk():
+    import json
+    from types import SimpleNamespace
+    from app.utils.render_plan import RenderPlan
+
+    template = json.dumps({
+        "plate": "{task.plate_number}",
+        "lot": "lot-{task.parking_lot_id}-{connect_parkinglot.grace_period}",
+        "date": "current_utc",
+        "static": "no placeholders",
+        "unknown": "{missing.value}",
+        "nested": {"facility": "{provider_connect.facility_id}", "items": [{"spot": "{task.parking_spot_id}"}, "{task.id}"]},
+        "meta": "{provider_creds.meta_data.tags}",
+        "fields": [{"key": "zone", "value": "{provider_creds.meta_data}"}],
+    })
+    models = {
+        "task": Task(id=7, plate_number="ABC123", parking_lot_id=12, parking_spot_id="S1"),
+        "connect_parkinglot": ConnectParkinglot(grace_period=5),
+        "provider_connect": SimpleNamespace(facility_id="F-9"),
+        "provider_creds": SimpleNamespace(meta_data={"tags": ["SG"], "requestDict": {"zone": "Z1"}}),
+    }
+
+    expected = SchemaMapping.replace_json_placeholder_with_mapped_pointers(json.loads(template), models)
+    plan = RenderPlan.from_text(template)
+
+    assert plan.render(models) == expected
+    assert plan.render(models) is not plan.render(models)
+
+
+def test_response_extractor_maps_every_record():
+    from app.utils.response_extractor import ResponseExtractor
+
+    response = {"Result": {"Status": "OK", "Permits": [
+        {"Vehicle": {"LicensePlate": None}, "Plate": {"LicensePlate": "AB1"}, "ValidTo": "2024-01-02",
+         "Zone": {"Name": "North"}},
+        {"Vehicle": {"LicensePlate": "AB2"}, "ValidTo": None, "Price": {"ValidTo": "2024-01-03"}},
+        {"LicensePlate": None, "Plate": {"LicensePlate": "AB3"}, "Other": "x"},
+        {"Other": "no mapped keys"},
+    ]}}
+    mapping = {"plate_number": "LicensePlate", "expiry_date": "ValidTo", "station": ["Zone", "Name"],
+               "action_type": "Valid_PERMIT"}
+
+    assert ResponseExtractor(mapping).extract(response) == [
+        {"plate_number": "AB1", "expiry_date": "2024-01-02", "station": [{"Name": "North"}, "North"],
+         "action_type": None},
+        {"plate_number": "AB2", "expiry_date": None, "station": [None, None], "action_type": None},
+        {"plate_number": None, "expiry_date": None, "station": [None, None], "action_type": None},
+        {"plate_number": None, "expiry_date": None, "station": [None, None], "action_type": None},
+    ] == ResponseHandler.replace_json_values_v2(response, mapping)
+    assert ResponseExtractor({"plate_number": "LicensePlate"}).extract({"Result": {"Permits": []}}) is None
+
+
+def test_parse_xml_streams_records_and_stops_early():
+    record = """<ValidParkingData><Amount>{amount}</Amount><Article><Id>100</Id><Name>APBS1</Name></Article>
+        <Code>{plate}</Code><ParkingSpace i:nil="true"/><EndDateUtc>2031-04-08T03:59:37</EndDateUtc></ValidParkingData>"""
+    xml_string = ('<ArrayOfValidParkingData xmlns="http://schema.caleaccess.com/cwo2exportservice/Enforcement/5/" '
+                  'xmlns:i="http://www.w3.org/2001/XMLSchema-instance"><Count>3</Count>'
+                  + "".join(record.format(amount=i, plate=f"ALB25{i}") for i in range(3))
+                  + '</ArrayOfValidParkingData>').encode()
+    chunks = [xml_string[i:i + 50] for i in range(0, len(xml_string), 50)]
+
+    expected = ResponseHandler.xml_to_dict(ET.fromstring(xml_string))
+    assert ResponseHandler.parse_xml(iter(chunks)) == expected
+    assert ResponseHandler.parse_xml(xml_string.decode()) == expected
+
+    seen = []
+    partial = ResponseHandler.parse_xml(iter(chunks), lambda tag, value: seen.append(tag) or
+                                        isinstance(value, dict) and value["Code"] == "ALB251")
+    assert seen == ["Count", "ValidParkingData", "ValidParkingData"]
+    assert partial == {"Count": "3", "ValidParkingData": expected["ValidParkingData"][:2]}
+
+
+def test_parse_xml_streams_soap_records_and_stops_early():
+    record = "<ValidParkingData><Amount>{amount}</Amount><Code>{plate}</Code></ValidParkingData>"
+    xml_string = ('<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/"><s:Header/><s:Body>'
+                  '<GetValidParkingDataResponse xmlns="http://schema.caleaccess.com/cwo2exportservice/">'
+                  '<GetValidParkingDataResult><Count>5</Count>'
+                  + "".join(record.format(amount=i, plate=f"ALB25{i}") for i in range(5))
+                  + '</GetValidParkingDataResult></GetValidParkingDataResponse></s:Body></s:Envelope>').encode()
+    chunk_size = len(xml_string) // 12 + 1
+    chunks = [xml_string[i:i + chunk_size] for i in range(0, len(xml_string), chunk_size)]
+    assert len(chunks) == 12
+    read = []
+
+    def iter_chunks():
+        for chunk in chunks:
+            read.append(chunk)
+            yield chunk
+
+    expected = ResponseHandler.xml_to_dict(ET.fromstring(xml_string))
+    assert ResponseHandler.parse_xml(iter(chunks)) == expected
+
+    seen = []
+    partial = ResponseHandler.parse_xml(iter_chunks(), lambda tag, value: seen.append(tag) or
+                                        isinstance(value, dict) and value["Code"] == "ALB251")
+    assert seen == ["Header", "Count", "ValidParkingData", "ValidParkingData"]
+    assert len(read) < 12
+    records = expected["Body"]["GetValidParkingDataResponse"]["GetValidParkingDataResult"]["ValidParkingData"]
+    assert partial == {"Header": None, "Body": {"GetValidParkingDataResponse": {"GetValidParkingDataResult": {
+        "Count": "5", "ValidParkingData": records[:2]}}}}
+
+
+def test_find_closest_match_prefers_exact_then_nearest_active_plate():
+    from types import SimpleNamespace
+    from app.utils.data_filter import DataFilter
+
+    task = SimpleNamespace(id=1, plate_number="ABC123")
+    active = {"paid_date": "2024-01-01 10:00:00", "expiry_date": "2099-01-01T00:00:00.000Z"}
+    records = [
+        {"plate_number": "ABC123", "paid_date": "2020-01-01T00:00:00", "expiry_date": "2020-01-02T00:00:00"},
+        dict(active, plate_number="ABD124"),
+        dict(active, plate_number=["XYZ999", "ABC124"]),
+        dict(active, plate_number="ABD123"),
+    ]
+
+    closest = DataFilter.find_closest_match([dict(record) for record in records], task, max_distance=2)
+    assert closest["closest_match_plate"] == "ABC124"
+    assert closest["closest_match_record"]["paid_date"] == "2024-01-01T10:00:00"
+    assert closest["closest_match_record"]["expiry_date"] == "2099-01-01T00:00:00"
+    assert DataFilter.find_closest_match([dict(record) for record in records], task)["closest_match_record"] is None
+
+    records.append(dict(active, plate_number="abc123"))
+    exact = DataFilter.find_closest_match(records, task, max_distance=2)
+    assert exact["closest_match_plate"] == "ABC123" and exact["closest_match_record"]["match_lpr"] == "abc123"
+
+
+def test_timeline_cursor_round_trip():
+    from datetime import datetime
+    from app.models.base import Sessions
+
+    cursor = Sessions.encode_timeline_cursor(datetime(2024, 5, 1, 10, 30, 0, 250), 42)
+    assert Sessions.decode_timeline_cursor(cursor) == (datetime(2024, 5, 1, 10, 30, 0, 250), 42)
+    for invalid in ("", "not a cursor", cursor[:-4]):
+        try:
+            Sessions.decode_timeline_cursor(invalid)
+        except ValueError:
+            continue
+        raise AssertionError(f"{invalid!r} was accepted")
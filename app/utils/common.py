@@ -1,7 +1,6 @@
 import copy
 import json
 import logging
-import requests
 import re
 from datetime import datetime, timezone, timedelta
 from typing import Any, Dict, List, Union, Optional
@@ -20,12 +19,51 @@ from app.models.provider_creds import ProviderCreds
 from app.service.event_service import EventService
 from app.utils import enum
 from app.utils.image_utils import ImageUtils
+from app.utils.http_client import http_client
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 import time
+from app.models.context_session import commit_or_flush
 
 logger = logging.getLogger(__name__)
 
+# already in the format convert_to_iso_format returns
+ISO_SECONDS_PATTERN = re.compile(r'[1-9]\d{3}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}', re.ASCII)
+
+# List of possible date formats
+DATE_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%d-%m-%YT%H:%M:%S',
+    '%Y/%m/%d %H:%M:%S',
+    '%d-%m-%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M:%S',
+    '%d-%b-%Y %H:%M:%S',
+    '%d %b %Y %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%fZ',
+    '%Y%m%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%f'
+]
+
+# loose form of each strptime directive, anything strptime accepts for it matches
+_DIRECTIVE_SHAPES = {'Y': r'\d{4}', 'm': r'\d{1,2}', 'd': r' ?\d{1,2}', 'H': r'\d{1,2}', 'M': r'\d{1,2}',
+                     'S': r'\d{1,2}', 'f': r'\d{1,6}', 'b': r'\S+'}
+
+
+def _date_format_shape(date_format: str) -> re.Pattern:
+    pattern = ''
+    for part in re.split(r'(%.|\s+)', date_format):
+        if part.startswith('%'):
+            pattern += _DIRECTIVE_SHAPES[part[1]]
+        elif part.isspace():
+            pattern += r'\s+'
+        else:
+            pattern += re.escape(part)
+    return re.compile(pattern, re.IGNORECASE)
+
+
+DATE_FORMAT_SHAPES = [(date_format, _date_format_shape(date_format)) for date_format in DATE_FORMATS]
+
 
 class DateTimeUtils:
 
@@ -78,21 +116,6 @@ class DateTimeUtils:
         if date_str is None:
             return date_str
 
-        # List of possible date formats
-        date_formats = [
-            '%Y-%m-%d %H:%M:%S',
-            '%Y-%m-%dT%H:%M:%S',
-            '%d-%m-%YT%H:%M:%S',
-            '%Y/%m/%d %H:%M:%S',
-            '%d-%m-%Y %H:%M:%S',
-            '%d/%m/%Y %H:%M:%S',
-            '%d-%b-%Y %H:%M:%S',
-            '%d %b %Y %H:%M:%S',
-            '%Y-%m-%dT%H:%M:%S.%fZ',
-            '%Y%m%d %H:%M:%S',
-            '%Y-%m-%dT%H:%M:%S.%f'
-        ]
-
         # If the date string has a 'Z' at the end (UTC time), remove it for parsing
         if date_str.endswith('Z'):
             date_str = date_str[:-1]
@@ -101,7 +124,14 @@ class DateTimeUtils:
         if '.' in date_str:
             date_str = date_str.split('.')[0] + '.' + date_str.split('.')[1][:6]  # Truncate to 6 digits if needed
 
-        for date_format in date_formats:
+        # no other format can parse it, an invalid date is returned unchanged as well
+        if ISO_SECONDS_PATTERN.fullmatch(date_str):
+            return date_str
+
+        for date_format, shape in DATE_FORMAT_SHAPES:
+            # strptime keeps only a few compiled formats, trying all of them recompiles each time
+            if not shape.fullmatch(date_str):
+                continue
             try:
                 parsed_date = datetime.strptime(date_str, date_format)
                 return parsed_date.strftime('%Y-%m-%dT%H:%M:%S')
@@ -583,12 +613,12 @@ def fetch_violation_amount(db,
                 "client_id": credentials.client_id,
                 "client_secret": credentials.client_secret,
             }
-            token_response = requests.post(f"{settings.SPOT_GENIUS_API_BASE_URL}/api/oauth/token", data=form_data)
+            token_response = http_client.post(f"{settings.SPOT_GENIUS_API_BASE_URL}/api/oauth/token", data=form_data)
             if token_response.status_code == 200:
                 # Extract and save the new token
                 token = token_response.text.strip('"')
                 credentials.token = token
-                db.commit()
+                commit_or_flush(db)
             else:
                 raise RuntimeError("Failed to retrieve initial token. Check client credentials.")
 
@@ -598,7 +628,7 @@ def fetch_violation_amount(db,
             "Content-Type": "application/json",
         }
 
-        response = requests.get(
+        response = http_client.get(
             f"{settings.SPOT_GENIUS_API_BASE_URL}/api/external/v1/parking_lot/{parking_lot_id}/alert_type/{alert_id}/violation",
             headers=headers
         )
@@ -609,12 +639,12 @@ def fetch_violation_amount(db,
                 "client_id": credentials.client_id,
                 "client_secret": credentials.client_secret,
             }
-            token_response = requests.post(f"{settings.SPOT_GENIUS_API_BASE_URL}/api/oauth/token", data=form_data)
+            token_response = http_client.post(f"{settings.SPOT_GENIUS_API_BASE_URL}/api/oauth/token", data=form_data)
             if token_response.status_code == 200:
                 # Extract and save the new token
                 token = token_response.text.strip('"')
                 credentials.token = token
-                db.commit()
+                commit_or_flush(db)
             else:
                 raise RuntimeError("Failed to refresh token. Check client credentials.")
         elif response.status_code != 401:
@@ -1,6 +1,6 @@
 import logging
 import os
-import requests
+from app.utils.http_client import http_client
 from app.schema import CreateAlert, UpdateAlert
 
 logger = logging.getLogger(__name__)
@@ -19,7 +19,7 @@ class AlertSgadmin:
         }
         response = None
         try:
-            response = requests.post(
+            response = http_client.post(
                 os.getenv("SPOT_GENIUS_API_BASE_URL") + "/api/external/v1/create_alert",
                 json=CreateAlert(**alert_details.dict()).model_dump(),
                 headers=headers,
@@ -41,7 +41,7 @@ class AlertSgadmin:
             "Content-Type": "application/json",
         }
 
-        response = requests.get(
+        response = http_client.get(
             os.getenv("SPOT_GENIUS_API_BASE_URL") + f"/api/external/v1/get_alert/{alert_id}",
             headers=headers,
         )
@@ -54,7 +54,7 @@ class AlertSgadmin:
             "Content-Type": "application/json",
         }
 
-        response = requests.put(
+        response = http_client.put(
             os.getenv("SPOT_GENIUS_API_BASE_URL") + f"/api/external/v1/update_alert",
             json=UpdateAlert(**alert_details.dict()).model_dump(),
             headers=headers,
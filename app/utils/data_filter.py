@@ -2,9 +2,11 @@ from app.utils import enum
 from datetime import datetime, timezone
 import logging
 import json
-from app.utils.common import car_identification_log, DateTimeUtils
+from app.utils.common import car_identification_log, DateTimeUtils, ISO_SECONDS_PATTERN
 from app.models.task import Task
-from Levenshtein import distance as levenshtein_distance
+from app.utils.response_extractor import ResponseExtractor
+from rapidfuzz import process
+from rapidfuzz.distance import Levenshtein
 from urllib.parse import unquote
 
 logger = logging.getLogger(__name__)
@@ -55,11 +57,41 @@ class DataFilter:
             secondary_lpr) > 0 else False
 
 
+    @staticmethod
+    def stop_at_exact_match(task, feature):
+        """
+        stop_when for ResponseHandler.parse_xml: true for the first provider record that
+        find_closest_match returns as a valid exact match of the task's plate. Records after it
+        cannot change what filter returns, so they are not read.
+        """
+        if not task.plate_number:
+            return None
+        extractor = ResponseExtractor.for_feature(feature)
+
+        def stop_when(tag, record):
+            if not isinstance(record, dict):
+                return False
+            records = extractor.extract({tag: [record]})
+            return bool(records) and DataFilter.find_closest_match(records, task)["closest_match_record"] is not None
+
+        return stop_when
+
+    @staticmethod
+    def parse_timestamp(value: str) -> datetime:
+        # same result as strptime for this exact format, several times faster
+        if ISO_SECONDS_PATTERN.fullmatch(value):
+            return datetime.fromisoformat(value)
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")
+
     @staticmethod
     def find_closest_match(records, task, max_distance=0):
         """
         Finds the closest match for the given target_plate from the list of records.
 
+        Records are read once in order. The first record active now that holds the plate itself is
+        returned right away. Plates of the other active records are then scored together with an
+        edit distance bounded by max_distance, the lowest distance wins and the earliest one on a tie.
+
         Parameters:
             records (list of dicts): List of objects containing 'plate_number' or a list of plate numbers.
             target_plate (str): The plate number to match.
@@ -72,9 +104,10 @@ class DataFilter:
             "closest_match_record": None,
             "closest_match_plate": None # this needs for Tiba monthly pass checks
         }
+        candidates, candidate_plates = [], []
 
         try:
-            min_distance = float("inf")
+            target_plate = task.plate_number.upper()
             current_date = datetime.utcnow()
 
             for record in records:
@@ -85,18 +118,18 @@ class DataFilter:
                 if 'expiry_date' in record:
                     record['expiry_date'] = DateTimeUtils.convert_to_iso_format(record['expiry_date'])
 
-                # Normalize to a list (if it's a single string, convert it to a list)
-                start = datetime.strptime(record.get("paid_date", "1990-01-01T12:00:00"), "%Y-%m-%dT%H:%M:%S")
-                end = datetime.strptime(record.get("expiry_date", "1990-01-01T12:00:00"), "%Y-%m-%dT%H:%M:%S")
+                start = DataFilter.parse_timestamp(record.get("paid_date", "1990-01-01T12:00:00"))
+                end = DataFilter.parse_timestamp(record.get("expiry_date", "1990-01-01T12:00:00"))
 
                 if start <= current_date <= end and plate_numbers:
+                    # Normalize to a list (if it's a single string, convert it to a list)
                     if isinstance(plate_numbers, str):
                         plate_numbers = [plate_numbers]
 
                     for plate in plate_numbers:
-                        distance = levenshtein_distance(plate.upper(), task.plate_number.upper())
+                        normalized_plate = plate.upper()
                         # If exact match, return immediately
-                        if distance == 0:
+                        if normalized_plate == target_plate:
                             logger.info(
                                 f"Task: {task.id} / LPR: {task.plate_number} / Exact matched plate: {plate}")
                             record.update({"match_lpr": plate})
@@ -105,16 +138,25 @@ class DataFilter:
                                 "closest_match_record": record,
                                 "closest_match_plate": task.plate_number
                             }
+                        candidates.append((record, plate))
+                        candidate_plates.append(normalized_plate)
 
-                        # Check if the distance is within the allowed threshold
-                        if 0 < distance <= max_distance and distance < min_distance:
-                            logger.info(
-                                f"Task: {task.id} / LPR: {task.plate_number} / matched plate: {plate} / distance: {distance}")
-                            record.update({"match_lpr": plate})
+        except Exception as e:
+            logger.error(f"Task: {task.id} / LPR: {task.plate_number} / Error in distance matching: {str(e)}")
 
-                            output["closest_match_record"] = record
-                            output["closest_match_plate"] = plate # this needs for Tiba monthly pass checks
-                            min_distance = distance
+        try:
+            if candidate_plates and max_distance > 0:
+                matches = process.extract(target_plate, candidate_plates, scorer=Levenshtein.distance,
+                                          score_cutoff=max_distance, limit=None)
+                if matches:
+                    _, distance, index = min(matches, key=lambda match: (match[1], match[2]))
+                    record, plate = candidates[index]
+                    logger.info(
+                        f"Task: {task.id} / LPR: {task.plate_number} / matched plate: {plate} / distance: {distance}")
+                    record.update({"match_lpr": plate})
+
+                    output["closest_match_record"] = record
+                    output["closest_match_plate"] = plate # this needs for Tiba monthly pass checks
 
         except Exception as e:
             logger.error(f"Task: {task.id} / LPR: {task.plate_number} / Error in distance matching: {str(e)}")
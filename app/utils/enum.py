@@ -96,6 +96,7 @@ class RequestMethod(str, Enum):
 class Feature(str, Enum):
     PAYMENT_CHECK_LPR = 'payment.check.lpr'
     PAYMENT_CHECK_SPOT = 'payment.check.spot'
+    PAYMENT_SNAPSHOT_LPR = 'payment.snapshot.lpr'
     PAYMENT_MAKE_LPR = 'payment.make.lpr'
     ENFORCEMENT_CITATION = 'enforcement.citation'
     RESERVATION_CHECK_LPR = 'reservation.check.lpr'
@@ -0,0 +1,100 @@
+import json
+import logging
+import threading
+from http import cookiejar
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _BlockAllCookies(cookiejar.CookiePolicy):
+    """
+    Pooled sessions are shared by every provider credential of a host,
+    so cookies of one response must never be replayed on another call.
+    Cookies are still available on response.cookies.
+    """
+    netscape = True
+    rfc2965 = hide_cookie2 = False
+
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+    def domain_return_ok(self, domain, request):
+        return False
+
+    def path_return_ok(self, path, request):
+        return False
+
+
+class HttpClient:
+    """
+    Process-wide HTTP client with one keep-alive connection pool per host.
+
+    Mirrors the requests.get/post/put/request API so wrappers can switch over without
+    changing how they read responses. Timeouts and pool sizes can be overridden per host
+    through HTTP_CLIENT_HOST_TIMEOUTS / HTTP_CLIENT_HOST_POOL_SIZES, a host override wins
+    over the timeout passed by the caller.
+    """
+
+    def __init__(self, pool_maxsize: int = None, host_pool_sizes: dict = None,
+                 host_timeouts: dict = None, default_timeout: float = None):
+        self.pool_maxsize = pool_maxsize or settings.HTTP_CLIENT_POOL_MAXSIZE
+        self.host_pool_sizes = host_pool_sizes if host_pool_sizes is not None \
+            else json.loads(settings.HTTP_CLIENT_HOST_POOL_SIZES or "{}")
+        self.host_timeouts = host_timeouts if host_timeouts is not None \
+            else json.loads(settings.HTTP_CLIENT_HOST_TIMEOUTS or "{}")
+        self.default_timeout = default_timeout or settings.DEFAULT_EXTERNAL_API_REQUEST_TIMEOUT_SEC
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _build_session(self, host: str) -> requests.Session:
+        pool_size = int(self.host_pool_sizes.get(host, self.pool_maxsize))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False)
+
+        session = requests.Session()
+        session.cookies.set_policy(_BlockAllCookies())
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        logger.debug(f"HTTP connection pool created for {host} with size {pool_size}")
+        return session
+
+    def _session_for(self, host: str) -> requests.Session:
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = self._build_session(host)
+                    self._sessions[host] = session
+        return session
+
+    def request(self, method: str, url: str, timeout=None, **kwargs) -> requests.Response:
+        host = (urlsplit(url).hostname or "").lower()
+        timeout = self.host_timeouts.get(host, timeout or self.default_timeout)
+        return self._session_for(host).request(method=method, url=url, timeout=timeout, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+http_client = HttpClient()
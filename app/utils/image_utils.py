@@ -1,6 +1,6 @@
 import os
 import logging
-import requests
+from app.utils.http_client import http_client
 import base64
 
 
@@ -12,7 +12,7 @@ class ImageUtils:
     @staticmethod
     def image_url_to_base64(url):
         try:
-            response = requests.get(url)
+            response = http_client.get(url)
             response.raise_for_status()
             encoded_image = base64.b64encode(response.content)
             base64_string = encoded_image.decode('utf-8')
@@ -29,7 +29,7 @@ class ImageUtils:
         }
         response = None
         try:
-            response = requests.post(
+            response = http_client.post(
                 os.getenv("SPOT_GENIUS_API_BASE_URL") + "/api/external/v1/download_image",
                 json={"image_url": image_url},
                 headers=headers,
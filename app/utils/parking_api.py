@@ -9,6 +9,7 @@ from app.schema import CreateOrganizationSchema, CreateParkinglotSchema, Parking
 from app.utils.common import convert_time_to_utc_by_timezone, convert_max_park_time_to_minutes
 from app.models.base import ParkingTime
 from app.utils.enum import Scope, ViolationType, ParkingOperations
+from app.models.context_session import commit_or_flush
 
 
 class ParkingAPI:
@@ -123,7 +124,7 @@ class ParkingAPI:
             connect_parkinglot.parking_operations = parking_timing_schema.parking_operations
             if parking_timing_schema.max_park_time:
                 connect_parkinglot.maximum_park_time_in_minutes = convert_max_park_time_to_minutes(parking_timing_schema.max_park_time)
-            db.commit()
+            commit_or_flush(db)
         return connect_parkinglot
 
     @staticmethod
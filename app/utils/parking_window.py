@@ -1,8 +1,27 @@
-from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, date
+from typing import NamedTuple, List
+from app.models.catalog_cache import catalog_cache
 from app.utils.common import parkinglot_overstay_limit
 from app.utils.enum import ParkingOperations
+from app.utils.ttl_cache import TTLCache
 from app.config import settings
 
+
+class PaymentSchedule(NamedTuple):
+    """Paid windows of a lot for one day and the next, as sorted UTC datetimes."""
+    day: date
+    starts: List[datetime]
+    ends: List[datetime]
+    start_ends: List[datetime]  # end of the window at the same position in starts
+    max_ends: List[datetime]  # latest end among the windows starting at or before each position
+
+
+# compiled schedules per connect parking lot, dropped in every worker when parking_time changes
+payment_schedules = TTLCache(ttl=settings.PAYMENT_SCHEDULE_CACHE_TTL_SEC, maxsize=10000)
+catalog_cache.register(("parking_time",), payment_schedules)
+
+
 class ParkingWindow:
 
 #     @staticmethod
@@ -69,6 +88,52 @@ class ParkingWindow:
 
 #         return status, next_at
 
+    @staticmethod
+    def compile_schedule(connect_parkinglot, parking_time_slots=None, day: date = None) -> PaymentSchedule:
+        day = day or datetime.utcnow().date()
+        slots = connect_parkinglot.parking_time_slots if parking_time_slots is None else parking_time_slots
+
+        windows = sorted(
+            (datetime.combine(window_day, slot.start_time), datetime.combine(window_day, slot.end_time))
+            for window_day in (day, day + timedelta(days=1))
+            for slot in slots
+        )
+        max_ends = []
+        for _, end in windows:
+            max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+
+        schedule = PaymentSchedule(day=day,
+                                   starts=[start for start, _ in windows],
+                                   ends=sorted(end for _, end in windows),
+                                   start_ends=[end for _, end in windows],
+                                   max_ends=max_ends)
+        payment_schedules.set(connect_parkinglot.id, schedule)
+        return schedule
+
+    @staticmethod
+    def get_schedule(connect_parkinglot, current_time: datetime) -> PaymentSchedule:
+        schedule = payment_schedules.get(connect_parkinglot.id)
+        if schedule is None or schedule.day != current_time.date():
+            schedule = ParkingWindow.compile_schedule(connect_parkinglot, day=current_time.date())
+        return schedule
+
+    @staticmethod
+    def lookup_payment_window(current_time: datetime, schedule: PaymentSchedule):
+        """
+        Same answer as is_in_payment_window, plus the start of the next free window, from bisect lookups:
+        (is_paid, next_window_start, window_end, next_free_window_start)
+        """
+        position = bisect_right(schedule.starts, current_time) - 1
+        if position >= 0 and current_time <= schedule.max_ends[position]:
+            end_position = bisect_right(schedule.ends, current_time)
+            next_free_window_start = schedule.ends[end_position] if end_position < len(schedule.ends) else None
+            return True, None, schedule.ends[bisect_left(schedule.ends, current_time)], next_free_window_start
+
+        next_position = position + 1
+        if next_position < len(schedule.starts):
+            return False, schedule.starts[next_position], schedule.start_ends[next_position], None
+        return False, None, None, None
+
     @staticmethod
     def is_in_payment_window(current_time: datetime, windows: list):
         start_time, end_time = None, None
@@ -103,7 +168,6 @@ class ParkingWindow:
     def check_payment_window(connect_parkinglot) -> dict:
         current_time = datetime.utcnow()
         overstay_limit = parkinglot_overstay_limit(connect_parkinglot, current_time)
-        payment_windows = connect_parkinglot.parking_time_slots
         configured_time = timedelta(minutes=settings.VIOLATION_GRACE_PERIOD)
         window_operation_type = connect_parkinglot.parking_operations
         next_free_window_start = None
@@ -119,9 +183,9 @@ class ParkingWindow:
             end_time = next_at + timedelta(hours=24)
 
         elif window_operation_type == ParkingOperations.specify_lpr_based_paid_parking_time.value:
-            is_paid, next_window_start, current_window_end = ParkingWindow.is_in_payment_window(
-                current_time, payment_windows
-            )
+            is_paid, next_window_start, current_window_end, next_free_window_start = \
+                ParkingWindow.lookup_payment_window(current_time, ParkingWindow.get_schedule(connect_parkinglot,
+                                                                                             current_time))
 
             if not is_paid:  # Non-payment window
                 if current_time + overstay_limit <= next_window_start:
@@ -131,15 +195,6 @@ class ParkingWindow:
                 status = False
                 end_time = next_window_start
             else:  # Payment window
-                # Find the next non-payment window's start time
-                next_free_window_start = min(
-                    (
-                        datetime.combine(current_time.date(), window.end_time)
-                        for window in payment_windows if window.end_time > current_time.time()
-                    ),
-                    default=datetime.combine(current_time.date() + timedelta(days=1), payment_windows[0].end_time)
-                )
-
                 if current_time + configured_time <= next_free_window_start:
                     next_at = current_time + configured_time
                 else:
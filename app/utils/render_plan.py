@@ -0,0 +1,157 @@
+import json
+import re
+from datetime import datetime, timezone
+from typing import NamedTuple, Tuple, Any
+
+from app.config import settings
+from app.models.catalog_cache import catalog_cache
+from app.utils import common
+from app.utils.image_utils import ImageUtils
+from app.utils.schema_mapping import SchemaMapping
+from app.utils.ttl_cache import TTLCache
+
+PLACEHOLDER_PATTERN = re.compile(r'\{([^{}]*)}')
+
+CURRENT_UTC = "current_utc"
+TEXT = "text"
+BASE64 = "base64"
+
+# compiled plans, keyed by feature url path row or by template text
+render_plans = TTLCache(ttl=settings.RENDER_PLAN_CACHE_TTL_SEC, maxsize=4096)
+catalog_cache.register(("feature_url_path",), render_plans)
+
+
+class Placeholder(NamedTuple):
+    token: str
+    model: str
+    attr: str
+    is_path: bool
+
+
+class Slot(NamedTuple):
+    path: Tuple[Any, ...]
+    key: Any
+    kind: str
+    template: Any
+    placeholders: Tuple[Placeholder, ...]
+
+
+def parse_placeholders(text: str) -> Tuple[Placeholder, ...]:
+    placeholders = []
+    for placeholder in PLACEHOLDER_PATTERN.findall(text):
+        model = common.split_first_dot(placeholder)
+        if isinstance(model, tuple):
+            placeholders.append(Placeholder(f"{{{placeholder}}}", model[0], model[1], '.' in model[1]))
+    return tuple(placeholders)
+
+
+def _clone(node):
+    if isinstance(node, dict):
+        return {key: _clone(value) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_clone(item) for item in node]
+    return node
+
+
+class RenderPlan:
+    """
+    A JSON template (request schema, headers, query params) compiled once into the list of slots
+    that need a value, each with its placeholders already parsed.
+
+    render() gives the same result as SchemaMapping.replace_json_placeholder_with_mapped_pointers on a
+    fresh json.loads of the template, without walking the template or running the regex again.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.slots = []
+        self._compile(template, ())
+
+    @staticmethod
+    def for_feature(feature, field: str) -> "RenderPlan":
+        """Plan of a FeatureUrlPath JSON column, rebuilt when the row's updated_at changes."""
+        return render_plans.get_or_load((feature.id, field, feature.updated_at),
+                                        lambda: RenderPlan(json.loads(getattr(feature, field))))
+
+    @staticmethod
+    def from_text(text: str) -> "RenderPlan":
+        return render_plans.get_or_load(("json", text), lambda: RenderPlan(json.loads(text)))
+
+    def _compile(self, node, path):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if isinstance(value, str):
+                    if value == CURRENT_UTC:
+                        self.slots.append(Slot(path, key, CURRENT_UTC, value, ()))
+                    placeholders = parse_placeholders(value)
+                    if placeholders:
+                        self.slots.append(Slot(path, key, TEXT, value, placeholders))
+                elif isinstance(value, dict) and 'type' in value and value['type'] == 'base64':
+                    self.slots.append(Slot(path, key, BASE64, value['value'], parse_placeholders(value['value'])))
+                elif isinstance(value, (dict, list)):
+                    self._compile(value, path + (key,))
+        elif isinstance(node, list):
+            for index, item in enumerate(node):
+                self._compile(item, path + (index,))
+
+    def render(self, models: dict):
+        output = _clone(self.template)
+        for slot in self.slots:
+            container = output
+            for step in slot.path:
+                container = container[step]
+
+            if slot.kind == CURRENT_UTC:
+                container[slot.key] = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            elif slot.kind == TEXT:
+                RenderPlan.resolve(container, slot.key, slot.template, slot.placeholders, models)
+            elif slot.kind == BASE64:
+                url = RenderPlan.resolve(container, slot.key, slot.template, slot.placeholders, models)
+                if url is not None and url != '' and url != 'None':
+                    container[slot.key] = ImageUtils.image_url_to_base64(url)
+                else:
+                    container[slot.key] = ""
+        return output
+
+    @staticmethod
+    def resolve(container: dict, key, val, placeholders, models: dict):
+        """Substitutes the placeholders of one value exactly as resolve_placeholder does."""
+        for placeholder in placeholders:
+            if placeholder.model not in models:
+                continue
+            obj = models[placeholder.model]
+            if hasattr(obj, placeholder.attr):
+                replaced_data = SchemaMapping.original_value(placeholder.attr, getattr(obj, placeholder.attr))
+                if isinstance(replaced_data, dict):
+                    request_dict = replaced_data.get('requestDict', {})
+                    if isinstance(request_dict, dict) and container.get("key", "") in request_dict:
+                        val = request_dict[container.get("key", "")]
+                        container[key] = val
+                val = val.replace(placeholder.token, str(replaced_data))
+                container[key] = val if val else replaced_data
+            elif placeholder.is_path:
+                replaced_data = SchemaMapping.get_key_path_mapping_values(obj, placeholder.attr)
+                val = val.replace(placeholder.token, str(replaced_data))
+                container[key] = val if val else replaced_data
+        return val
+
+
+class UrlTemplate:
+    """Path params of a URL, compiled once per distinct URL text, see RequestHandler.replace_path_params."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.placeholders = parse_placeholders(text)
+
+    @staticmethod
+    def from_text(text: str) -> "UrlTemplate":
+        return render_plans.get_or_load(("url", text), lambda: UrlTemplate(text))
+
+    def render(self, models: dict):
+        val = self.text
+        for placeholder in self.placeholders:
+            if placeholder.model in models and hasattr(models[placeholder.model], placeholder.attr):
+                replaced_data = SchemaMapping.original_value(placeholder.attr,
+                                                             getattr(models[placeholder.model], placeholder.attr))
+                val = val.replace(placeholder.token, str(replaced_data)) if replaced_data else replaced_data
+        return val
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta, timezone
 from app.schema.common_schema import CommonSchema
 from app.models import base
 from app.utils.schema_mapping import SchemaMapping
+from app.utils.render_plan import RenderPlan, UrlTemplate
 from app.utils import common, enum
 
 logger = logging.getLogger(__name__)
@@ -48,7 +49,7 @@ class RequestHandler:
     def replace_json_values(db, schema, task, sub_task, connect_parkinglot, provider_creds, alert_body):
 
         try:
-            schema_dict = json.loads(schema)
+            schema_dict = json.loads(schema) if isinstance(schema, str) else schema
             violation = base.Violation.get_violation_by_session_id(db, task.session_id, violation_type=enum.EventTypes.PAYMENT_VIOLATION.value)
         except Exception as e:
             logger.critical(f"Exception: {str(e)}")
@@ -137,7 +138,7 @@ class RequestHandler:
     @staticmethod
     def map_request_params(models):
 
-        query_params = SchemaMapping.replace_json_placeholder_with_mapped_pointers(json.loads(models['feature'].query_params), models)
+        query_params = RenderPlan.for_feature(models['feature'], 'query_params').render(models)
 
         params = {}
         for data in query_params:
@@ -208,22 +209,12 @@ class RequestHandler:
         mapped_header_data = {
             "provider_creds": provider_creds
         }
-        return SchemaMapping.replace_json_placeholder_with_mapped_pointers(json.loads(feature_headers), mapped_header_data)
+        return RenderPlan.from_text(feature_headers).render(mapped_header_data)
 
     @staticmethod
     def replace_path_params(val, replace_from):
         """Helper function to resolve a placeholder string with actual data."""
-        placeholders = re.findall(r'\{([^{}]*)}', val)
-        for placeholder in placeholders:
-            if isinstance(placeholder, str):
-                model = common.split_first_dot(placeholder)
-                if isinstance(model, tuple) and model[0] in replace_from:
-                    # Check for simple attributes or nested attributes with key paths
-                    if hasattr(replace_from[model[0]], model[1]):
-                        replaced_data = SchemaMapping.original_value(model[1],
-                                                                     getattr(replace_from[model[0]],
-                                                                             model[1]))
-
-                        val = val.replace(f"{{{placeholder}}}", str(replaced_data)) if replaced_data else replaced_data
-        return val
+        if '{' not in val:
+            return val
+        return UrlTemplate.from_text(val).render(replace_from)
 
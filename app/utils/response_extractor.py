@@ -0,0 +1,125 @@
+import json
+from typing import Hashable, Optional, List, Dict, Union
+
+from app.config import settings
+from app.models.catalog_cache import catalog_cache
+from app.utils.ttl_cache import TTLCache
+
+# compiled response schemas, keyed by feature url path row
+response_extractors = TTLCache(ttl=settings.RESPONSE_EXTRACTOR_CACHE_TTL_SEC, maxsize=4096)
+catalog_cache.register(("feature_url_path",), response_extractors)
+
+UNMATCHED = object()
+
+
+class ResponseExtractor:
+    """
+    A feature's response_schema mapping ({new_key: provider_key or [provider_keys]}) compiled once.
+
+    extract() gives the same result as the per key search of replace_json_values_v2, but reads each
+    record in a single walk that looks for all mapped keys at once and stops when they are all found,
+    instead of one recursive search per mapped key.
+    """
+
+    def __init__(self, mapping: dict):
+        self.mapping = mapping
+        # the record locator matches keys against the text of the mapping values
+        self.mapping_text = str(mapping.values())
+        self.keys = set()
+        self.fields = [(new_key, isinstance(old_key, list), self._compile_key(old_key))
+                       for new_key, old_key in mapping.items()]
+
+    @staticmethod
+    def for_feature(feature) -> "ResponseExtractor":
+        """Extractor of a FeatureUrlPath response_schema, rebuilt when the row's updated_at changes."""
+        return response_extractors.get_or_load((feature.id, feature.updated_at),
+                                               lambda: ResponseExtractor(json.loads(feature.response_schema)))
+
+    def _compile_key(self, old_key):
+        if isinstance(old_key, list):
+            return [self._compile_key(item) for item in old_key]
+        if not isinstance(old_key, Hashable):
+            # never equal to a response key
+            return UNMATCHED
+        self.keys.add(old_key)
+        return old_key
+
+    def extract(self, input_json: Union[dict, list]) -> Optional[List[Dict]]:
+        records = self._records(input_json)
+        if not records:
+            return None
+        if isinstance(records, dict):
+            records = [records]
+
+        result = []
+        for record in records:
+            found = {}
+            if self.mapping:
+                ResponseExtractor._collect(record, set(self.keys), found)
+
+            transformed_item = {}
+            for new_key, is_list, key in self.fields:
+                value = ResponseExtractor._value(key, record, found)
+                if is_list:
+                    # Merge multiple fields into a single list under new_key
+                    transformed_item[new_key] = value if value else None
+                else:
+                    transformed_item[new_key] = value
+
+            if any(transformed_item.values()):
+                result.append(transformed_item)
+
+        return result if result else None
+
+    def _records(self, data):
+        """The first non-empty list, or the first dict holding a mapped key, in the response."""
+        if isinstance(data, list):
+            return data if data else None
+        elif isinstance(data, dict):
+            if any(key in self.mapping_text for key in data.keys()):
+                return [data]
+            for value in data.values():
+                records = self._records(value)
+                if records:
+                    return records
+            return data if data else None
+        return None
+
+    @staticmethod
+    def _collect(data: dict, pending: set, found: dict):
+        """
+        Walks data once, keeping the first non-None value of each pending key in the order a depth
+        first search per key visits them. A key holding None ends the search of that key within its
+        dict only, its parent goes on with the next siblings, as the per key search did.
+        """
+        # shared with the caller until a None value ends a key's search in this dict
+        own_pending = False
+        for key, value in data.items():
+            if key in pending:
+                if value is not None:
+                    found[key] = value
+                elif not own_pending:
+                    pending, own_pending = set(pending), True
+                pending.discard(key)
+            if not pending:
+                return
+
+            if isinstance(value, dict):
+                found_count = len(found)
+                ResponseExtractor._collect(value, pending, found)
+                if len(found) != found_count:
+                    pending.difference_update(found)
+            elif isinstance(value, list):
+                for item in value:
+                    found_count = len(found)
+                    ResponseExtractor._collect(item, pending, found)
+                    if len(found) != found_count:
+                        pending.difference_update(found)
+                    if not pending:
+                        return
+
+    @staticmethod
+    def _value(key, record: dict, found: dict):
+        if type(key) is list:
+            return [ResponseExtractor._value(item, record, found) for item in key] if record else None
+        return found.get(key)
@@ -1,10 +1,15 @@
 import logging
 import xml.etree.ElementTree as ET
 import json
-from typing import Union, List, Dict, Optional
+from itertools import chain
+from typing import Union, List, Dict, Optional, Iterable, Iterator, Tuple, Any, Callable
+from app.utils.response_extractor import ResponseExtractor
 
 logger = logging.getLogger(__name__)
 
+# read size when a streamed XML response is parsed
+XML_CHUNK_SIZE = 64 * 1024
+
 
 class ResponseHandler:
 
@@ -28,13 +33,90 @@ class ResponseHandler:
 
     @staticmethod
     def xml_to_json(response):
-        root = ET.fromstring(response)
-        data_dict = ResponseHandler.xml_to_dict(root)
+        data_dict = ResponseHandler.parse_xml(response)
         json_result = json.dumps(data_dict, indent=2, ensure_ascii=False)
         '''comment this because json_result have single quote values and after converting it was like "Joe"s Auto Park" '''
         # json_result = json_result.replace("'", '"')
         return json_result
 
+    @staticmethod
+    def is_record_wrapper(parent_tag: str, tag: str) -> bool:
+        """
+        True for the single elements a SOAP response wraps its records in,
+        Envelope > Body > {operation}Response > {operation}Result > ArrayOf{record}.
+        """
+        return (parent_tag == "Envelope" and tag == "Body"
+                or parent_tag == "Body" and tag.endswith("Response")
+                or parent_tag.endswith("Response") and tag.endswith("Result")
+                or parent_tag.endswith("Result") and tag.startswith("ArrayOf"))
+
+    @staticmethod
+    def iter_xml_records(content: Union[str, bytes, Iterable]) -> Iterator[Tuple[tuple, str, Any]]:
+        """
+        Yields (path, tag, value) for every record as soon as it is complete, value being what
+        xml_to_dict builds for it and path the tags of the wrappers between the root and the record.
+        Records are the children of the root, or of the innermost SOAP wrapper (see is_record_wrapper).
+        content is the document or an iterable of its chunks, such as response.iter_content().
+        A record is dropped from the tree once yielded, so only one is held as elements at a time.
+        """
+        parser = ET.XMLPullParser(events=("start", "end"))
+        chunks = chain([content] if isinstance(content, (str, bytes)) else content, [None])
+        # open elements as [element, tag, is_wrapper, records yielded from it]
+        stack = []
+
+        for chunk in chunks:
+            if chunk is None:
+                parser.close()
+            else:
+                parser.feed(chunk)
+
+            for event, element in parser.read_events():
+                tag = ResponseHandler.strip_namespace(element.tag)
+                if event == "start":
+                    is_wrapper = not stack or stack[-1][2] and ResponseHandler.is_record_wrapper(stack[-1][1], tag)
+                    stack.append([element, tag, is_wrapper, 0])
+                    continue
+
+                _, _, is_wrapper, records = stack.pop()
+                if not stack or not stack[-1][2]:
+                    continue
+
+                parent = stack[-1]
+                parent[3] += 1
+                if is_wrapper and records:
+                    continue
+                value = ResponseHandler.xml_to_dict(element) if len(element) else element.text
+                parent[0].remove(element)
+                yield tuple(wrapper_tag for _, wrapper_tag, _, _ in stack[1:]), tag, value
+
+    @staticmethod
+    def parse_xml(content: Union[str, bytes, Iterable], stop_when: Callable[[str, Any], bool] = None) -> dict:
+        """
+        Same dict as xml_to_dict on the root element, built while the document is read.
+
+        stop_when(tag, value) is called after every record, when it returns True the rest of the
+        document is not read and the result holds the records read so far.
+        """
+        result = {}
+        for path, tag, value in ResponseHandler.iter_xml_records(content):
+            target = result
+            for wrapper_tag in path:
+                if not isinstance(target.get(wrapper_tag), dict):
+                    target[wrapper_tag] = {}
+                target = target[wrapper_tag]
+
+            if tag in target:
+                if type(target[tag]) is list:
+                    target[tag].append(value)
+                else:
+                    target[tag] = [target[tag], value]
+            else:
+                target[tag] = value
+
+            if stop_when is not None and stop_when(tag, value):
+                break
+        return result
+
     @staticmethod
     def strip_namespace(tag):
         # Function to strip XML namespace from the tag
@@ -77,71 +159,5 @@ class ResponseHandler:
 
     @staticmethod
     def replace_json_values_v2(input_json: Union[dict, list], mapping: dict) -> Optional[List[Dict]]:
-        def find_first_list_or_dict(data):
-            """Find the first occurrence of a non-empty list or dictionary in the JSON structure."""
-            if isinstance(data, list):
-                return data if data else None  # Return None for empty lists
-            elif isinstance(data, dict):
-                if any(k in str(mapping.values()) for k in data.keys()):
-                    return [data]
-
-                for key, value in data.items():
-                    for value in data.values():
-                        result = find_first_list_or_dict(value)
-                        if result:
-                            return result
-                return None if not data else data  # Return None for empty dictionaries
-            return None  # Return None for any unexpected type
-
-        def find_nested_value(data, target_key):
-            for key, value in data.items():
-                if isinstance(target_key, list):
-                    return [find_nested_value(data, item) for item in target_key]
-
-                if key == target_key:
-                    return value
-                elif isinstance(value, dict):
-                    nested_result = find_nested_value(value, target_key)
-                    if nested_result is not None:
-                        return nested_result
-
-                elif isinstance(value, list):
-                    for item in value:
-                        nested_result = find_nested_value(item, target_key)
-                        if nested_result is not None:
-                            return nested_result
-
-        # Find the first non-empty list or dictionary dynamically
-        data_list = find_first_list_or_dict(input_json)
-
-        # Return None if extracted data is None or an empty list/dictionary
-        if not data_list:
-            return None
-
-        # Ensure data_list is iterable (wrap a dictionary in a list)
-        if isinstance(data_list, dict):
-            data_list = [data_list]
-
-        result = []
-        for item in data_list:
-            transformed_item = {}
-            
-            for new_key, old_key in mapping.items():
-                value = find_nested_value(item, old_key)
-                if isinstance(old_key, list):
-                    # Merge multiple fields into a single list under new_key
-                    transformed_item[new_key] = value if value else None
-                else:
-                    transformed_item[new_key] = value
-
-            # Ensure we only append non-empty transformed dictionaries
-            if any(transformed_item.values()):
-                result.append(transformed_item)
-
-        return result if result else None  # Return None if the result list is empty
-
-
-
-
-
-
+        """Maps every record of a provider response, see ResponseExtractor.for_feature for the cached form."""
+        return ResponseExtractor(mapping).extract(input_json)
@@ -1,10 +1,25 @@
-import requests
+from app.utils.http_client import http_client
 import logging
-from app.config import settings
+import threading
+from app.config import settings, redis_client
 from app.models.users import User
+from app.utils.ttl_cache import TTLCache
+from app.models.context_session import commit_or_flush
 
 logger = logging.getLogger(__name__)
 
+SG_CONNECT_ADMIN_CLIENT = 'sg-connect-admin-api-client'
+TOKEN_CACHE_KEY = "sg_admin_api_token"
+_NO_CLIENT = object()
+
+# bearer token shared by every SGAdminApis instance of the process, Redis shares it across workers
+_token_state = {"token": None}
+_token_refresh_lock = threading.Lock()
+
+# lot settings such as the LPR matching distance rarely change, permits are cached briefly per plate
+lot_status_cache = TTLCache(ttl=settings.SG_ADMIN_LOT_STATUS_CACHE_TTL_SEC)
+privilege_permit_cache = TTLCache(ttl=settings.SG_ADMIN_PRIVILEGE_PERMIT_CACHE_TTL_SEC, maxsize=10000)
+
 
 class SGAdminApis:
 
@@ -18,20 +33,10 @@ class SGAdminApis:
 
     def vehicle_privilege_permit(self, db, parking_lot_id, lpr):
         try:
-            privilege_permit_response = None
-            sg_connect_admin_client = User.get_by_user_name(db, 'sg-connect-admin-api-client')
-
-            if sg_connect_admin_client:
-                response = self.__call_vehicle_privilege_permit(sg_connect_admin_client.token, parking_lot_id, lpr)
-
-                if response.status_code == 200:
-                    privilege_permit_response = response.json()
-                elif response.status_code == 401:
-                    token = self.__authenticate(db, sg_connect_admin_client)
-                    response = self.__call_vehicle_privilege_permit(token, parking_lot_id, lpr)
-
-                    if response.status_code == 200:
-                        privilege_permit_response = response.json()
+            privilege_permit_response = privilege_permit_cache.get_or_load(
+                (parking_lot_id, lpr),
+                lambda: self.__call_with_token(db, self.__call_vehicle_privilege_permit, parking_lot_id, lpr)
+            )
 
             logger.info(f"Privilege Permit response - LPR: {lpr} - {privilege_permit_response}")
 
@@ -44,20 +49,8 @@ class SGAdminApis:
 
     def lpr_exit_status(self, db, parking_lot_id, lpr_record_id):
         try:
-            lpr_exit_status_response = None
-            sg_connect_admin_client = User.get_by_user_name(db, 'sg-connect-admin-api-client')
-
-            if sg_connect_admin_client:
-                response = self.__get_lpr_exit_status(sg_connect_admin_client.token, parking_lot_id, lpr_record_id)
-
-                if response.status_code == 200:
-                    lpr_exit_status_response = response.json()
-                elif response.status_code == 401:
-                    token = self.__authenticate(db, sg_connect_admin_client)
-                    response = self.__get_lpr_exit_status(token, parking_lot_id, lpr_record_id)
-
-                    if response.status_code == 200:
-                        lpr_exit_status_response = response.json()
+            lpr_exit_status_response = self.__call_with_token(db, self.__get_lpr_exit_status,
+                                                              parking_lot_id, lpr_record_id)
 
             logger.info(f"LPR status response - LPR: {lpr_record_id} - {lpr_exit_status_response}")
 
@@ -70,20 +63,7 @@ class SGAdminApis:
 
     def spot_status(self, db, parking_lot_id, spot_name):
         try:
-            spot_status_response = None
-            sg_connect_admin_client = User.get_by_user_name(db, 'sg-connect-admin-api-client')
-
-            if sg_connect_admin_client:
-                response = self.__get_spot_status(sg_connect_admin_client.token, parking_lot_id, spot_name)
-
-                if response.status_code == 200:
-                    spot_status_response = response.json()
-                elif response.status_code == 401:
-                    token = self.__authenticate(db, sg_connect_admin_client)
-                    response = self.__get_spot_status(token, parking_lot_id, spot_name)
-
-                    if response.status_code == 200:
-                        spot_status_response = response.json()
+            spot_status_response = self.__call_with_token(db, self.__get_spot_status, parking_lot_id, spot_name)
 
             if spot_status_response:
                 logger.info(
@@ -103,20 +83,10 @@ class SGAdminApis:
 
     def lot_status(self, db, parking_lot_id):
         try:
-            lot_status_response = None
-            sg_connect_admin_client = User.get_by_user_name(db, 'sg-connect-admin-api-client')
-
-            if sg_connect_admin_client:
-                response = self.__get_lot_status(sg_connect_admin_client.token, parking_lot_id)
-
-                if response.status_code == 200:
-                    lot_status_response = response.json()
-                elif response.status_code == 401:
-                    token = self.__authenticate(db, sg_connect_admin_client)
-                    response = self.__get_lot_status(token, parking_lot_id)
-
-                    if response.status_code == 200:
-                        lot_status_response = response.json()
+            lot_status_response = lot_status_cache.get_or_load(
+                parking_lot_id,
+                lambda: self.__call_with_token(db, self.__get_lot_status, parking_lot_id)
+            )
 
             logger.info(f"Lot status response - lot: {parking_lot_id} - {lot_status_response}")
 
@@ -127,13 +97,79 @@ class SGAdminApis:
             return None
 
 
+    def lpr_matching_threshold(self, db, parking_lot_id) -> int:
+        """Edit distance allowed between two plates of the lot, 0 (exact) when the lot status is unavailable."""
+        lot_status = self.lot_status(db, parking_lot_id)
+        if lot_status:
+            return lot_status['lpr_number_plate_text_matching_distance_thresh']
+        return 0
+
+    def __call_with_token(self, db, request, *args):
+        """Calls SG-Admin with the cached bearer token, refreshing it once on a 401."""
+        token = self.__get_token(db)
+        if token is _NO_CLIENT:
+            return None
+
+        response = request(token, *args)
+        if response.status_code == 401:
+            token = self.__refresh_token(db, token)
+            if token is None:
+                return None
+            response = request(token, *args)
+
+        if response.status_code == 200:
+            return response.json()
+        return None
+
+
+    def __get_token(self, db):
+        token = _token_state["token"]
+        if token:
+            return token
+
+        try:
+            token = redis_client.get(TOKEN_CACHE_KEY)
+        except Exception as e:
+            logger.warning(f"SG-Admin token cache unavailable: {str(e)}")
+            token = None
+
+        if not token:
+            sg_connect_admin_client = User.get_by_user_name(db, SG_CONNECT_ADMIN_CLIENT)
+            if not sg_connect_admin_client:
+                return _NO_CLIENT
+            token = sg_connect_admin_client.token
+
+        _token_state["token"] = token
+        return token
+
+
+    def __refresh_token(self, db, stale_token):
+        with _token_refresh_lock:
+            # another thread already refreshed the token that was rejected
+            if _token_state["token"] and _token_state["token"] != stale_token:
+                return _token_state["token"]
+
+            sg_connect_admin_client = User.get_by_user_name(db, SG_CONNECT_ADMIN_CLIENT)
+            if not sg_connect_admin_client:
+                return None
+
+            token = self.__authenticate(db, sg_connect_admin_client)
+            _token_state["token"] = token
+            if token:
+                try:
+                    redis_client.set(TOKEN_CACHE_KEY, token, ex=settings.SG_ADMIN_TOKEN_CACHE_TTL_SEC)
+                except Exception as e:
+                    logger.warning(f"SG-Admin token cache unavailable: {str(e)}")
+            return token
+
+
     def __get_lot_status(self, token, parking_lot_id):
         headers = {
             "Authorization": "Bearer {}".format(token),
             "Content-Type": "application/json",
         }
 
-        response = requests.get(
+        response = http_client.get(
             f"{settings.SPOT_GENIUS_API_BASE_URL}/api/external/v1/parking_lot/{parking_lot_id}/lot_status",
             headers=headers,
             timeout=settings.SG_ADMIN_API_REQUEST_TIMEOUT
@@ -148,7 +184,7 @@ class SGAdminApis:
             "Content-Type": "application/json",
         }
 
-        response = requests.get(
+        response = http_client.get(
             f"{settings.SPOT_GENIUS_API_BASE_URL}/api/external/v1/parking_lot/{parking_lot_id}/check_permit/{lpr}",
             headers=headers,
             timeout=settings.SG_ADMIN_API_REQUEST_TIMEOUT
@@ -163,7 +199,7 @@ class SGAdminApis:
             "Content-Type": "application/json",
         }
 
-        response = requests.get(
+        response = http_client.get(
             f"{settings.SPOT_GENIUS_API_BASE_URL}/api/external/v1/parking_lot/{parking_lot_id}/check_lpr_exit/{lpr_record_id}",
             headers=headers,
             timeout=settings.SG_ADMIN_API_REQUEST_TIMEOUT
@@ -178,7 +214,7 @@ class SGAdminApis:
             "Content-Type": "application/json",
         }
 
-        response = requests.get(
+        response = http_client.get(
             f"{settings.SPOT_GENIUS_API_BASE_URL}/api/external/v1/parking_lot/{parking_lot_id}/{spot_name}/spot_status",
             headers=headers,
             timeout=settings.SG_ADMIN_API_REQUEST_TIMEOUT
@@ -193,7 +229,7 @@ class SGAdminApis:
             "client_secret": sg_connect_admin_client.client_secret
         }
 
-        response = requests.post(
+        response = http_client.post(
             f"{settings.SPOT_GENIUS_API_BASE_URL}/api/oauth/token",
             data=form_data,
             timeout=settings.SG_ADMIN_API_REQUEST_TIMEOUT
@@ -204,7 +240,7 @@ class SGAdminApis:
             token = token.replace('"', '')
 
             sg_connect_admin_client.token = token
-            db.commit()
+            commit_or_flush(db)
 
             return token
 
@@ -1,8 +1,12 @@
 import json
+import logging
 import requests
 import hashlib
 import traceback
-from app.config import settings
+from app.config import settings, redis_client
+
+
+logger = logging.getLogger(__name__)
 
 
 def send_slack_notification(title, message, mention_members=None, is_important=False):
@@ -41,3 +45,22 @@ def get_error_fingerprint(error):
     tb_str = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
     error_hash = hashlib.md5(tb_str.encode()).hexdigest()
     return f"huey_alert:{error_hash[:10]}"
+
+
+def notify_task_failure(error):
+    """Send a Slack alert for a failed task run, suppressing repeats of the same error."""
+    alert_key = get_error_fingerprint(error)
+
+    alert_count = redis_client.incr(alert_key)
+    if alert_count == 1:
+        redis_client.expire(alert_key, settings.SLACK_ALERT_EXPIRY)
+
+    logger.critical(f"[Redis] Alert count for '{alert_key}': {alert_count}")
+
+    if alert_count <= settings.SLACK_ALERT_LIMIT:
+        send_slack_notification(
+            f"🚨 Huey Task Failure",
+            f"Task failed with error:\n```{str(error)}```"
+        )
+    else:
+        logger.critical(f"Alert for '{alert_key}' already sent {alert_count} times. Suppressing.")
@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    """
+    Small thread-safe in-process cache with a per-entry time to live.
+
+    get_or_load is single-flight: concurrent callers asking for the same missing key wait for
+    one loader call instead of all hitting the backend. None results are not cached, nor is a
+    value whose load overlapped an invalidate(), it may have been read before the change.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        # bumped by every invalidate(), a load that saw another generation is not stored
+        self._generation = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return default
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # another caller may have loaded it while we were waiting
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+
+            generation = self._generation
+            try:
+                value = loader()
+                if value is not None:
+                    with self._lock:
+                        if generation == self._generation:
+                            self._store(key, value)
+                return value
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def invalidate(self, key: Hashable = None):
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _store(self, key: Hashable, value: Any):
+        if len(self._entries) >= self.maxsize and key not in self._entries:
+            self._evict()
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        if len(self._entries) >= self.maxsize:
+            # drop the entry closest to expiry
+            del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
@@ -97,7 +97,7 @@ class ViolationRule:
 
     @staticmethod
     def close_overstay_violation(db, task, reason):
-        provider_type = db.query(ProviderTypes).filter(ProviderTypes.text_key == enum.ProviderTypes.PROVIDER_VIOLATION.value).first()
+        provider_type = ProviderTypes.get_by_text_key(db, enum.ProviderTypes.PROVIDER_VIOLATION.value)
         opened_violation_task = Task.get_pending_overstay_violation(db, provider_type.id, task.session_id)
 
         if opened_violation_task:
@@ -118,7 +118,7 @@ class ViolationRule:
 
     @staticmethod
     def close_payment_violation(db, task, reason):
-        provider_type = db.query(ProviderTypes).filter(ProviderTypes.text_key == enum.ProviderTypes.PROVIDER_VIOLATION.value).first()
+        provider_type = ProviderTypes.get_by_text_key(db, enum.ProviderTypes.PROVIDER_VIOLATION.value)
         opened_violation_task = base.Task.get_pending_payment_violation(db, provider_type.id, task.session_id)
         alert_id_list = opened_violation_task.sgadmin_alerts_ids if opened_violation_task else None
 
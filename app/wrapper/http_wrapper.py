@@ -1,5 +1,4 @@
 import logging
-import requests
 import json
 import httpx
 import asyncio
@@ -12,9 +11,10 @@ from app.models.provider_connect import ProviderConnect
 from app.models.provider_creds import ProviderCreds
 from app.utils import enum
 from app.utils.request_handler import RequestHandler
-from app.utils.response_handler import ResponseHandler
+from app.utils.response_handler import ResponseHandler, XML_CHUNK_SIZE
 from app.config import settings
-from app.utils.schema_mapping import SchemaMapping
+from app.utils.render_plan import RenderPlan
+from app.utils.http_client import http_client
 from app.utils.security import decrypt_encrypted_value
 from app.service import JCookie
 from app.utils.common import car_identification_log, configure_alert_body, sanitize_logged_data, map_provider_action
@@ -27,16 +27,17 @@ logger = logging.getLogger(__name__)
 class HttpWrapper:
 
     @staticmethod
-    def check_request_method(db, task, sub_task, feature, provider_creds, connect_parkinglot, violation=None):
+    def check_request_method(db, task, sub_task, feature, provider_creds, connect_parkinglot, violation=None,
+                             stop_when=None):
         if feature.request_method == enum.RequestMethod.POST.value:
             return HttpWrapper.post(db=db, task=task, sub_task=sub_task, feature=feature, provider_creds=provider_creds,
                                     connect_parkinglot=connect_parkinglot, violation=violation)
         if feature.request_method == enum.RequestMethod.GET.value:
             return HttpWrapper.get(db=db, task=task, sub_task=sub_task, feature=feature, provider_creds=provider_creds,
-                                   connect_parkinglot=connect_parkinglot, violation=violation)
+                                   connect_parkinglot=connect_parkinglot, violation=violation, stop_when=stop_when)
 
     @staticmethod
-    def get(db, task, sub_task, feature, provider_creds, connect_parkinglot, violation=None):
+    def get(db, task, sub_task, feature, provider_creds, connect_parkinglot, violation=None, stop_when=None):
         provider = Provider.get_by_id(db, provider_creds.provider_id)
         provider_connect = ProviderConnect.get_provider_connect(db, connect_id=connect_parkinglot.id,
                                                                 provider_creds_id=provider_creds.id)
@@ -87,10 +88,12 @@ class HttpWrapper:
 
             try:
 
+                # streamed, an XML body is parsed while it is read
                 if provider.auth_type == enum.AuthType.OAUTH.value:
-                    response = requests.get(url, headers=headers, timeout=settings.REQUEST_TIMEOUT)
+                    response = http_client.get(url, headers=headers, timeout=settings.REQUEST_TIMEOUT, stream=True)
                 else:
-                    response = requests.get(url, auth=auth, headers=headers, timeout=settings.REQUEST_TIMEOUT)
+                    response = http_client.get(url, auth=auth, headers=headers, timeout=settings.REQUEST_TIMEOUT,
+                                               stream=True)
 
                 if response.status_code == 200:
                     logger.debug(f"Task: {task.id} / LPR: {task.plate_number} - "
@@ -98,14 +101,13 @@ class HttpWrapper:
                                  f"Status Received: {response.status_code}")
 
                     content_type = response.headers.get('content-type')
-                    if 'xml' in content_type:
-                        json_result = ResponseHandler.xml_to_json(response.text)
-                        data = json.loads(json_result)
-                        response = data
-                    else:
-                        response = response.json()
-                    return response
+                    with response:
+                        if 'xml' in content_type:
+                            return ResponseHandler.parse_xml(response.iter_content(chunk_size=XML_CHUNK_SIZE),
+                                                             stop_when)
+                        return response.json()
                 else:
+                    response.close()
                     logger.error(f"Task: {task.id} / LPR: {task.plate_number} - "
                                  f"API request for {provider.name} Attempted {attempts}, "
                                  f"Status Received: {response.status_code}")
@@ -113,7 +115,7 @@ class HttpWrapper:
                     if response.status_code == 401 and provider.auth_type == enum.AuthType.OAUTH.value:
                         auth_url = provider.api_endpoint + provider.oauth_path
                         form_data = provider.meta_data.get('oauth_info')
-                        oauth_response = requests.post(auth_url, data=form_data)
+                        oauth_response = http_client.post(auth_url, data=form_data)
                         auth_response = oauth_response.json()
                         access_token = auth_response.get('access_token')
                         headers.update({'Authorization': f'Bearer {access_token}'})
@@ -167,8 +169,7 @@ class HttpWrapper:
 
         # Replace placeholders in feature request schema with the specific data from specific table
         # e.g if we need a created_at date from xyz table will set value to {xyz.created_at}
-        mapped_data = json.dumps(SchemaMapping.replace_json_placeholder_with_mapped_pointers(
-            json.loads(feature.request_schema), models_dict))
+        mapped_data = RenderPlan.for_feature(feature, 'request_schema').render(models_dict)
 
         mapped_data = RequestHandler.replace_json_values(db, mapped_data, task, sub_task,
                                                          connect_parkinglot,
@@ -202,13 +203,13 @@ class HttpWrapper:
             logger.info(f'Request to {provider.name} with data {sanitize_logged_data(mapped_data, ["image_base64s"])}')
             try:
                 if provider.auth_type == "Token":
-                    response = requests.post(url, data=json.dumps(mapped_data), headers=headers, timeout=settings.REQUEST_TIMEOUT)
+                    response = http_client.post(url, data=json.dumps(mapped_data), headers=headers, timeout=settings.REQUEST_TIMEOUT)
                     logger.debug(f"Task: {task.id} / {car_identification} - "
                                  f"API request for {provider.name} Attempted {attempts}, "
                                  f"Status Received: {response.status_code}, "
                                  f"Response Received: {response.json()}")
                 else:
-                    response = requests.post(url, auth=auth, data=json.dumps(mapped_data), headers=headers, timeout=settings.REQUEST_TIMEOUT)
+                    response = http_client.post(url, auth=auth, data=json.dumps(mapped_data), headers=headers, timeout=settings.REQUEST_TIMEOUT)
 
                 if response.status_code == 200 and 'Error' not in response.json():
                     logger.debug(f"Task: {task.id} / {car_identification} - "
@@ -10,8 +10,10 @@ logger = logging.getLogger(__name__)
 class ProcessRequest:
 
     @staticmethod
-    def process(db, task, sub_task, feature, provider_creds, connect_parkinglot, violation=None) -> ResponseIntegrationSchema:
+    def process(db, task, sub_task, feature, provider_creds, connect_parkinglot, violation=None,
+                stop_when=None) -> ResponseIntegrationSchema:
         if feature.api_type == enum.ApiType.REST.value:
-            return HttpWrapper.check_request_method(db, task, sub_task, feature, provider_creds, connect_parkinglot, violation)
+            return HttpWrapper.check_request_method(db, task, sub_task, feature, provider_creds, connect_parkinglot, violation,
+                                                   stop_when)
         if feature.api_type == enum.ApiType.SOAP.value:
-            return SoapWrapper.check_request_method(db, task, feature, provider_creds, connect_parkinglot)
+            return SoapWrapper.check_request_method(db, task, feature, provider_creds, connect_parkinglot, stop_when)
@@ -1,9 +1,9 @@
-import requests
+from app.utils.http_client import http_client
 import json
 
 from app.models.provider import Provider
 from app.schema.response_integration_schema import ResponseIntegrationSchema
-from app.utils.response_handler import ResponseHandler
+from app.utils.response_handler import ResponseHandler, XML_CHUNK_SIZE
 from app.utils.request_handler import RequestHandler
 from app.utils import enum
 from app.config import settings
@@ -19,14 +19,15 @@ logger = logging.getLogger(__name__)
 class SoapWrapper:
 
     @staticmethod
-    def check_request_method(db, task, feature, provider_creds, connect_parkinglot) -> ResponseIntegrationSchema:
+    def check_request_method(db, task, feature, provider_creds, connect_parkinglot,
+                             stop_when=None) -> ResponseIntegrationSchema:
         if feature.request_method == enum.RequestMethod.POST.value:
-            return SoapWrapper.post(db, task, feature, provider_creds, connect_parkinglot)
+            return SoapWrapper.post(db, task, feature, provider_creds, connect_parkinglot, stop_when)
         if feature.request_method == enum.RequestMethod.GET.value:
-            return SoapWrapper.get(db, task, feature, provider_creds, connect_parkinglot)
+            return SoapWrapper.get(db, task, feature, provider_creds, connect_parkinglot, stop_when)
 
     @staticmethod
-    def get(db, task, feature, provider_creds, connect_parkinglot):
+    def get(db, task, feature, provider_creds, connect_parkinglot, stop_when=None):
         provider = Provider.get_by_id(db, provider_creds.provider_id)
         url = provider.api_endpoint + feature.path
         attempts = settings.CURRENT_ATTEMPTS
@@ -43,14 +44,16 @@ class SoapWrapper:
 
         while attempts <= settings.REQUEST_ATTEMPTS:
             try:
-                requests_post = requests.get(url, auth=(username, password), timeout=settings.REQUEST_TIMEOUT)
+                requests_post = http_client.get(url, auth=(username, password), timeout=settings.REQUEST_TIMEOUT,
+                                                stream=True)
                 if requests_post.status_code == 200:
                     logger.debug(
                         f"Task: {task.id} / LPR: {task.plate_number} - API request for {provider.name} Attempted {attempts}, Status Received: {requests_post.status_code}")
-                    json_result = ResponseHandler.xml_to_json(requests_post.text)
-                    data = json.loads(json_result)
-                    return data
+                    with requests_post:
+                        return ResponseHandler.parse_xml(requests_post.iter_content(chunk_size=XML_CHUNK_SIZE),
+                                                         stop_when)
                 else:
+                    requests_post.close()
                     logger.error(
                         f"Task: {task.id} / LPR: {task.plate_number} - API request for {provider.name} Attempted {attempts}, Status Received: {requests_post.status_code}")
                 attempts += 1
@@ -65,7 +68,7 @@ class SoapWrapper:
         return None
 
     @staticmethod
-    def post(db, task, feature, provider_creds, connect_parkinglot):
+    def post(db, task, feature, provider_creds, connect_parkinglot, stop_when=None):
         provider = Provider.get_by_id(db, provider_creds.provider_id)
         request_data = feature.request_schema.replace('{{', '{').replace('}}', '}')
         mapped_data = RequestHandler.map_value(request_data, provider_creds.meta_data, task)
@@ -80,14 +83,16 @@ class SoapWrapper:
 
         while attempts <= settings.REQUEST_ATTEMPTS:
             try:
-                requests_post = requests.post(url, data=mapped_data, headers=headers_dict, timeout=settings.REQUEST_TIMEOUT)
+                requests_post = http_client.post(url, data=mapped_data, headers=headers_dict, timeout=settings.REQUEST_TIMEOUT,
+                                                 stream=True)
                 if requests_post.status_code == 200:
                     logger.debug(
                         f"Task: {task.id} / LPR: {task.plate_number} - API request for {provider.name} Attempted {attempts}, Status Received: {requests_post.status_code}")
-                    json_result = ResponseHandler.xml_to_json(requests_post.text)
-                    data = json.loads(json_result)
-                    return data
+                    with requests_post:
+                        return ResponseHandler.parse_xml(requests_post.iter_content(chunk_size=XML_CHUNK_SIZE),
+                                                         stop_when)
                 else:
+                    requests_post.close()
                     logger.error(
                         f"Task: {task.id} / LPR: {task.plate_number} - API request for {provider.name} Attempted {attempts}, Status Received: {requests_post.status_code}")
                 attempts += 1
@@ -0,0 +1,158 @@
+"""
+Micro-benchmark of DataFilter.find_closest_match on 10k-record provider responses, against the
+implementation it replaced (Levenshtein distance per plate, strptime over every date format).
+
+Run from the repository root. No database is needed, but the app settings are imported, so
+SQLALCHEMY_DATABASE_URI has to be set:
+    python -m scripts.benchmark_find_closest_match [--records 10000] [--active 0.6] [--repeat 5]
+"""
+import argparse
+import logging
+import random
+import string
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from Levenshtein import distance as levenshtein_distance
+
+import app.service  # noqa: F401, app.utils.common cannot be imported first
+from app.utils.data_filter import DataFilter
+
+logger = logging.getLogger(__name__)
+
+OLD_DATE_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%d-%m-%YT%H:%M:%S',
+    '%Y/%m/%d %H:%M:%S',
+    '%d-%m-%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M:%S',
+    '%d-%b-%Y %H:%M:%S',
+    '%d %b %Y %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%fZ',
+    '%Y%m%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%f'
+]
+
+# formats providers send, the first one is what convert_to_iso_format returns
+RESPONSE_DATE_FORMATS = [
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+    '%d/%m/%Y %H:%M:%S',
+    '%d-%b-%Y %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%fZ',
+]
+
+
+def old_convert_to_iso_format(date_str):
+    if date_str is None:
+        return date_str
+    if date_str.endswith('Z'):
+        date_str = date_str[:-1]
+    if '.' in date_str:
+        date_str = date_str.split('.')[0] + '.' + date_str.split('.')[1][:6]
+    for date_format in OLD_DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, date_format).strftime('%Y-%m-%dT%H:%M:%S')
+        except ValueError:
+            continue
+    return date_str
+
+
+def old_find_closest_match(records, task, max_distance=0):
+    output = {"closest_match_record": None, "closest_match_plate": None}
+    try:
+        min_distance = float("inf")
+        current_date = datetime.utcnow()
+
+        for record in records:
+            plate_numbers = record["plate_number"]
+            if 'paid_date' in record:
+                record['paid_date'] = old_convert_to_iso_format(record['paid_date'])
+            if 'expiry_date' in record:
+                record['expiry_date'] = old_convert_to_iso_format(record['expiry_date'])
+
+            start = datetime.strptime(record.get("paid_date", "1990-01-01T12:00:00"), "%Y-%m-%dT%H:%M:%S")
+            end = datetime.strptime(record.get("expiry_date", "1990-01-01T12:00:00"), "%Y-%m-%dT%H:%M:%S")
+
+            if start <= current_date <= end and plate_numbers:
+                if isinstance(plate_numbers, str):
+                    plate_numbers = [plate_numbers]
+
+                for plate in plate_numbers:
+                    distance = levenshtein_distance(plate.upper(), task.plate_number.upper())
+                    if distance == 0:
+                        record.update({"match_lpr": plate})
+                        return {"closest_match_record": record, "closest_match_plate": task.plate_number}
+
+                    if 0 < distance <= max_distance and distance < min_distance:
+                        record.update({"match_lpr": plate})
+                        output["closest_match_record"] = record
+                        output["closest_match_plate"] = plate
+                        min_distance = distance
+    except Exception as e:
+        logger.error(f"Error in distance matching: {str(e)}")
+    return output
+
+
+def random_plate(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_uppercase + string.digits, k=rng.randint(5, 8)))
+
+
+def generate_records(count: int, active_ratio: float, date_formats: list, near_plate: str,
+                     seed: int = 1837) -> list:
+    """
+    Provider records, active_ratio of them paid now. None holds the benchmark plate, the last one
+    holds near_plate so the whole response is read and the fuzzy pass has a winner.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    records = []
+    for _ in range(count):
+        if rng.random() < active_ratio:
+            paid, expiry = now - timedelta(hours=rng.randint(1, 5)), now + timedelta(hours=rng.randint(1, 5))
+        else:
+            paid = now - timedelta(days=rng.randint(2, 30))
+            expiry = paid + timedelta(hours=rng.randint(1, 5))
+        plate_number = random_plate(rng) if rng.random() < 0.9 else [random_plate(rng), random_plate(rng)]
+        records.append({
+            "plate_number": plate_number,
+            "paid_date": paid.strftime(rng.choice(date_formats)),
+            "expiry_date": expiry.strftime(rng.choice(date_formats)),
+        })
+    records[-1].update(plate_number=near_plate,
+                       paid_date=(now - timedelta(hours=1)).strftime(date_formats[0]),
+                       expiry_date=(now + timedelta(hours=1)).strftime(date_formats[0]))
+    return records
+
+
+def measure(find_closest_match, records, task, max_distance, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        # the matcher normalizes the dates in place, every run starts from the raw response
+        response = [dict(record) for record in records]
+        start = time.perf_counter()
+        result = find_closest_match(response, task, max_distance)
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--active", type=float, default=0.6)
+    parser.add_argument("--max-distance", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    task = SimpleNamespace(id=0, plate_number="QX7Z2PL")
+    for label, date_formats in (("mixed date formats", RESPONSE_DATE_FORMATS),
+                                ("ISO timestamps", RESPONSE_DATE_FORMATS[:1])):
+        records = generate_records(args.records, args.active, date_formats, near_plate="QX7Z2PI")
+        old_timings, old_result = measure(old_find_closest_match, records, task, args.max_distance, args.repeat)
+        new_timings, new_result = measure(DataFilter.find_closest_match, records, task, args.max_distance,
+                                          args.repeat)
+        assert old_result == new_result and new_result["closest_match_plate"] == "QX7Z2PI", f"{label}: results differ"
+        print(f"{label:<20} old {min(old_timings) * 1000:8.1f}-{max(old_timings) * 1000:.1f} ms"
+              f"  ->  new {min(new_timings) * 1000:8.1f}-{max(new_timings) * 1000:.1f} ms")